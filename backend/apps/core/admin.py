@@ -3,6 +3,7 @@ from django.contrib import admin
 from apps.core.models import (
     BreezeAccount,
     Candle,
+    CandleRollup,
     Exchanges,
     Instrument,
     Percentage,
@@ -31,5 +32,6 @@ admin.site.register(Instrument, InstrumentAdmin)
 admin.site.register(BreezeAccount)
 admin.site.register(SubscribedInstruments)
 admin.site.register(Candle)
+admin.site.register(CandleRollup)
 admin.site.register(Percentage)
 admin.site.register(PercentageInstrument)
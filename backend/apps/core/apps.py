@@ -1,6 +1,14 @@
 from django.apps import AppConfig
+from django.conf import settings
 
 
 class CoreConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "apps.core"
+
+    def ready(self):
+        if settings.BREEZE_STANDIN_URL:
+            # Imported only then; it loads breeze_connect
+            from apps.core.breeze_rest import use_breeze_standin
+
+            use_breeze_standin(settings.BREEZE_STANDIN_URL)
@@ -0,0 +1,133 @@
+from datetime import datetime, timedelta
+
+from django.db.models import DurationField, ExpressionWrapper, F, Max, Min, Window
+from django.db.models.functions import Lag
+from pytz import timezone
+
+from apps.core.models import Candle
+from apps.core.trading_calendar import TradingCalendar, get_calendar
+from main import const
+
+india_tz = timezone("Asia/Kolkata")
+
+
+def coverage_index(
+    instrument_id: int,
+    start: datetime,
+    end: datetime,
+    gap_tolerance: timedelta = const.BACKFILL_GAP_TOLERANCE,
+) -> list:
+    """
+    Computes the spans of stored 1-minute candles for an instrument.
+
+    Consecutive candles at most ``gap_tolerance`` apart belong to the same span.
+    Only the span boundaries leave the database: one aggregate query for the
+    first/last candle and one window query for the gaps between candles.
+
+    Returns:
+        list: Sorted ``(first, last)`` datetimes of each covered span.
+    """
+    candles = Candle.objects.filter(
+        instrument_id=instrument_id, date__gte=start, date__lte=end
+    )
+    bounds = candles.aggregate(first=Min("date"), last=Max("date"))
+    if bounds["first"] is None:
+        return []
+
+    gaps = (
+        candles.annotate(previous=Window(Lag("date"), order_by=F("date").asc()))
+        .annotate(
+            gap=ExpressionWrapper(
+                F("date") - F("previous"), output_field=DurationField()
+            )
+        )
+        .filter(gap__gt=gap_tolerance)
+        .order_by("date")
+        .values_list("previous", "date")
+    )
+
+    spans = []
+    span_start = bounds["first"]
+    for previous, current in gaps:
+        spans.append((span_start, previous))
+        span_start = current
+    spans.append((span_start, bounds["last"]))
+    return spans
+
+
+def missing_ranges(
+    instrument_id: int,
+    start: datetime,
+    end: datetime,
+    calendar: TradingCalendar | None = None,
+    gap_tolerance: timedelta = const.BACKFILL_GAP_TOLERANCE,
+) -> list:
+    """
+    Finds the parts of the trading sessions between ``start`` and ``end`` that
+    have no stored candles. Only sessions of ``calendar`` (NSE by default) are
+    considered, and holes shorter than ``gap_tolerance`` are ignored since
+    illiquid contracts legitimately skip minutes.
+
+    Returns:
+        list: Sorted ``(start, end)`` datetimes of each missing range.
+    """
+    calendar = calendar or get_calendar()
+    spans = coverage_index(instrument_id, start, end, gap_tolerance)
+    ranges = []
+    span_index = 0
+    for cursor, session_end in calendar.sessions_between(start, end):
+        while span_index < len(spans) and spans[span_index][1] < cursor:
+            span_index += 1
+
+        index = span_index
+        while cursor < session_end:
+            if index < len(spans) and spans[index][0] <= session_end:
+                span_first, span_last = spans[index]
+                if span_first - cursor > gap_tolerance:
+                    ranges.append((cursor, span_first))
+                cursor = max(cursor, span_last)
+                index += 1
+                continue
+            if session_end - cursor > gap_tolerance:
+                ranges.append((cursor, session_end))
+            break
+    return ranges
+
+
+def plan_backfill(
+    instrument_id: int,
+    start: datetime,
+    end: datetime,
+    calendar: TradingCalendar | None = None,
+    sessions_per_chunk: int = 2,
+    gap_tolerance: timedelta = const.BACKFILL_GAP_TOLERANCE,
+) -> list:
+    """
+    Plans the Breeze requests needed to fill the holes of an instrument's history.
+
+    Missing ranges are packed into chunks touching at most ``sessions_per_chunk``
+    trading days of ``calendar``, which keeps each 1-minute request under Breeze's
+    per-call limit while never spending a request on a weekend or a holiday alone.
+
+    Returns:
+        list: ``(start, end)`` datetimes of each request, oldest first.
+    """
+    chunks = []
+    chunk_start = chunk_end = None
+    chunk_days = set()
+    for range_start, range_end in missing_ranges(
+        instrument_id, start, end, calendar, gap_tolerance
+    ):
+        day = range_start.astimezone(india_tz).date()
+        if chunk_start is not None and (
+            day in chunk_days or len(chunk_days) < sessions_per_chunk
+        ):
+            chunk_end = range_end
+            chunk_days.add(day)
+            continue
+        if chunk_start is not None:
+            chunks.append((chunk_start, chunk_end))
+        chunk_start, chunk_end, chunk_days = range_start, range_end, {day}
+    if chunk_start is not None:
+        chunks.append((chunk_start, chunk_end))
+    return chunks
@@ -1,17 +1,131 @@
+import hashlib
+import json
 import logging
+import threading
+import time
 
 from breeze_connect import BreezeConnect
 from django.shortcuts import get_object_or_404
+import redis
 
+from apps.core.breeze_rest import PooledApification
 from apps.core.models import BreezeAccount
+from main import const, utils
 
 logger = logging.getLogger(__name__)
 
 
+def _client() -> redis.Redis | None:
+    try:
+        return utils.get_redis_client("default")
+    except ValueError:
+        # Not running against Redis (tests, local settings)
+        return None
+
+
+def credentials_fingerprint(account: BreezeAccount) -> str:
+    """
+    Fingerprint of the credentials a session was generated from, so sessions
+    of replaced credentials are never restored.
+    """
+    return hashlib.sha256(
+        f"{account.api_key}:{account.session_token}".encode()
+    ).hexdigest()
+
+
+# Token bucket kept in a Redis hash: refills it for the time passed, then takes
+# a token and returns 0, or returns the milliseconds until one is due. The
+# Redis server's clock is used so processes on other hosts agree on it.
+TOKEN_BUCKET_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local time = redis.call("TIME")
+local now = tonumber(time[1]) * 1000 + math.floor(tonumber(time[2]) / 1000)
+local bucket = redis.call("HMGET", KEYS[1], "tokens", "updated_at")
+local tokens = tonumber(bucket[1]) or capacity
+local updated_at = tonumber(bucket[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - updated_at) * rate)
+local wait = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+else
+    wait = math.ceil((1 - tokens) / rate)
+end
+redis.call("HSET", KEYS[1], "tokens", tokens, "updated_at", now)
+redis.call("PEXPIRE", KEYS[1], math.ceil(capacity / rate))
+return wait
+"""
+
+
+class RateLimiter:
+    """
+    Thread-safe token bucket. Holds up to ``capacity`` tokens and refills them
+    evenly over ``period`` seconds, so bursts are allowed but the long-run rate
+    never exceeds ``capacity`` calls per ``period``.
+
+    With a ``key`` the bucket lives in Redis and is shared by every process
+    limiting under that key. Without Redis, or while it is unreachable, each
+    process keeps its own bucket.
+    """
+
+    def __init__(self, capacity: int, period: float = 60.0, key: str | None = None):
+        self.capacity = capacity
+        self.rate = capacity / period
+        self.key = key
+        self.tokens = float(capacity)
+        self.updated_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(
+            self.capacity, self.tokens + (now - self.updated_at) * self.rate
+        )
+        self.updated_at = now
+
+    def _take_local(self) -> float:
+        with self.lock:
+            self._refill()
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0
+            return (1 - self.tokens) / self.rate
+
+    def _take_shared(self) -> float | None:
+        client = _client() if self.key else None
+        if client is None:
+            return None
+        try:
+            wait = client.eval(
+                TOKEN_BUCKET_SCRIPT, 1, self.key, self.capacity, self.rate / 1000
+            )
+        except redis.RedisError as e:
+            logger.warning(f"Could not use the shared rate limit {self.key}: {e}")
+            return None
+        return int(wait) / 1000
+
+    def acquire(self):
+        """
+        Blocks until a token is available and takes it.
+        """
+        while True:
+            wait = self._take_shared()
+            if wait is None:
+                wait = self._take_local()
+            if not wait:
+                return
+            time.sleep(wait)
+
+
 class BreezeSessionManager:
     """
     Class to manage BreezeConnect sessions for multiple users.
-    Sessions are stored in a dictionary keyed by user ID.
+
+    Sessions are kept in a dictionary keyed by user ID. The material of a
+    generated session (Breeze user ID and session key) is shared through Redis,
+    so other web and Celery processes rebuild the session without calling
+    ``generate_session`` again. The verdict of the last health check is cached
+    there too and refreshed by the ``probe_breeze_sessions`` task.
     """
 
     def __init__(self):
@@ -19,6 +133,42 @@ class BreezeSessionManager:
         Initializes the BreezeSessionManager instance.
         """
         self.sessions = {}
+        self.rate_limiters = {}
+        self.request_slots = {}
+        self.rate_limiters_lock = threading.Lock()
+
+    def get_rate_limiter(self, user_id):
+        """
+        Returns the API rate limiter shared by every call made for a user's
+        Breeze account, matching Breeze's per-minute API quota. Its bucket is
+        kept in Redis, so the quota holds across web, Celery and feed processes.
+
+        Args:
+            user_id (int): The ID of the user.
+
+        Returns:
+            RateLimiter: The user's rate limiter.
+        """
+        with self.rate_limiters_lock:
+            if user_id not in self.rate_limiters:
+                self.rate_limiters[user_id] = RateLimiter(
+                    const.BREEZE_API_CALLS_PER_MINUTE,
+                    period=60,
+                    key=const.breeze_rate_limit_key(user_id),
+                )
+            return self.rate_limiters[user_id]
+
+    def get_request_slots(self, user_id) -> threading.Semaphore:
+        """
+        Returns the semaphore capping the requests of a user's Breeze account in
+        flight at once in this process, at ``BREEZE_MAX_CONCURRENT_REQUESTS``.
+        """
+        with self.rate_limiters_lock:
+            if user_id not in self.request_slots:
+                self.request_slots[user_id] = threading.BoundedSemaphore(
+                    const.BREEZE_MAX_CONCURRENT_REQUESTS
+                )
+            return self.request_slots[user_id]
 
     def refresh_session(self, user_id):
         """
@@ -36,36 +186,107 @@ class BreezeSessionManager:
         # Initialize a new session
         return self.initialize_session(user_id)
 
-    def initialize_session(self, user_id):
+    def initialize_session(self, user_id, script_master: bool = False):
         """
         Initializes or retrieves a session for the specified user.
 
+        The session of this process is reused while it matches the one shared in
+        Redis; otherwise it is rebuilt from the shared material, and only when
+        there is none is a new session generated.
+
         Args:
             user_id (int): The ID of the user for whom the session is being initialized.
+            script_master (bool, optional): Make sure Breeze's script master is
+                loaded, which websocket feeds need to decode ticks. Restored
+                sessions skip the download otherwise. Defaults to False.
 
         Returns:
             BreezeConnect: The BreezeConnect session for the user.
         """
-        if user_id in self.sessions:
+        client = _client()
+        material = self._load_material(client, user_id)
+        breeze = self.sessions.get(user_id)
+
+        if breeze is not None and (
+            client is None
+            or (material is not None and material["session_key"] == breeze.session_key)
+        ):
             logger.info(f"Reusing existing BreezeSession for user {user_id}.")
-            return self.sessions[user_id]
+        else:
+            acc = get_object_or_404(BreezeAccount, user__id=user_id)
+            fingerprint = credentials_fingerprint(acc)
+            if material is not None and material["credentials"] == fingerprint:
+                breeze = self._restore_session(acc, material)
+                logger.info(f"BreezeSession restored for user {user_id}.")
+            else:
+                breeze = self._generate_session(acc, client)
+                logger.info(f"BreezeSession initialized for user {user_id}.")
+            self.sessions[user_id] = breeze
 
-        # Initialize a new session for the user
-        acc = get_object_or_404(BreezeAccount, user__id=user_id)
-        breeze = BreezeConnect(api_key=acc.api_key)
+        if script_master and not breeze.stock_script_dict_list:
+            breeze.get_stock_script_list()
+        return breeze
 
+    def _load_material(self, client: redis.Redis | None, user_id) -> dict | None:
+        if client is None:
+            return None
+        try:
+            material = client.get(const.breeze_session_key(user_id))
+        except redis.RedisError as e:
+            logger.warning(f"Could not read the BreezeSession of user {user_id}: {e}")
+            return None
+        return json.loads(material) if material else None
+
+    def _generate_session(self, acc: BreezeAccount, client: redis.Redis | None):
+        breeze = BreezeConnect(api_key=acc.api_key)
         try:
             breeze.generate_session(
                 api_secret=acc.api_secret, session_token=acc.session_token
             )
-            self.sessions[user_id] = breeze
-            logger.info(f"BreezeSession initialized for user {user_id}.")
-            return breeze
         except Exception as e:
-            logger.error(f"Failed to initialize BreezeSession for user {user_id}: {e}")
+            logger.error(
+                f"Failed to initialize BreezeSession for user {acc.user_id}: {e}"
+            )
             # Clear any potentially corrupted session
-            self.clear_session(user_id)
+            self.clear_session(acc.user_id)
             raise e
+        # Later calls go over the pooled connections
+        breeze.api_handler = PooledApification(
+            breeze, self.get_request_slots(acc.user_id)
+        )
+
+        if client is not None:
+            material = {
+                "user_id": breeze.user_id,
+                "session_key": breeze.session_key,
+                "credentials": credentials_fingerprint(acc),
+            }
+            try:
+                client.set(
+                    const.breeze_session_key(acc.user_id),
+                    json.dumps(material),
+                    ex=const.BREEZE_SESSION_TTL,
+                )
+            except redis.RedisError as e:
+                logger.warning(
+                    f"Could not share the BreezeSession of user {acc.user_id}: {e}"
+                )
+        return breeze
+
+    def _restore_session(self, acc: BreezeAccount, material: dict):
+        """
+        Rebuilds a session from shared material the way ``generate_session``
+        would, without its customer details call and script master download.
+        Its requests go over the pooled connections, see ``breeze_rest``.
+        """
+        breeze = BreezeConnect(api_key=acc.api_key)
+        breeze.user_id = material["user_id"]
+        breeze.session_key = material["session_key"]
+        breeze.secret_key = acc.api_secret
+        breeze.api_handler = PooledApification(
+            breeze, self.get_request_slots(acc.user_id)
+        )
+        return breeze
 
     def get_session(self, user_id):
         """
@@ -81,7 +302,8 @@ class BreezeSessionManager:
 
     def clear_session(self, user_id):
         """
-        Clears the session for a specified user.
+        Clears the session for a specified user, in this process and in Redis,
+        along with its cached health.
 
         Args:
             user_id (int): The ID of the user whose session is to be cleared.
@@ -89,6 +311,16 @@ class BreezeSessionManager:
         if user_id in self.sessions:
             del self.sessions[user_id]
             logger.info(f"Session cleared for user {user_id}.")
+        client = _client()
+        if client is not None:
+            try:
+                client.delete(
+                    const.breeze_session_key(user_id), const.breeze_health_key(user_id)
+                )
+            except redis.RedisError as e:
+                logger.warning(
+                    f"Could not clear the shared BreezeSession of user {user_id}: {e}"
+                )
 
     def clear_all_sessions(self):
         """
@@ -97,6 +329,89 @@ class BreezeSessionManager:
         self.sessions.clear()
         logger.info("All sessions cleared.")
 
+    def store_health(self, user_id, healthy: bool, error: str | None = None) -> dict:
+        """
+        Caches the verdict of a session check for ``BREEZE_HEALTH_TTL`` seconds.
+
+        Returns:
+            dict: The verdict, with ``healthy``, ``error`` and ``checked_at``.
+        """
+        verdict = {"healthy": healthy, "error": error, "checked_at": time.time()}
+        client = _client()
+        if client is not None:
+            try:
+                client.set(
+                    const.breeze_health_key(user_id),
+                    json.dumps(verdict),
+                    ex=const.BREEZE_HEALTH_TTL,
+                )
+            except redis.RedisError as e:
+                logger.warning(f"Could not cache the health of user {user_id}: {e}")
+        return verdict
+
+    def probe(self, user_id) -> dict:
+        """
+        Checks a user's session with a live ``get_funds`` call and caches the
+        verdict.
+
+        Returns:
+            dict: The verdict, see ``store_health``.
+        """
+        try:
+            session = self.initialize_session(user_id)
+            self.get_rate_limiter(user_id).acquire()
+            response = session.get_funds() or {}
+        except Exception as e:
+            logger.warning(f"Breeze session check failed for user {user_id}: {e}")
+            return self.store_health(user_id, False, str(e))
+
+        if response.get("Status") == 200:
+            return self.store_health(user_id, True)
+        logger.error(f"Breeze session check failed for user {user_id}: {response}")
+        return self.store_health(user_id, False, response.get("Error"))
+
+    def health(self, user_id) -> dict:
+        """
+        Returns the cached health of a user's session, probing it only when no
+        verdict is cached. Users asking are kept probed in the background for
+        ``BREEZE_HEALTH_WATCH_WINDOW`` seconds.
+
+        Returns:
+            dict: The verdict, see ``store_health``.
+        """
+        client = _client()
+        if client is None:
+            return self.probe(user_id)
+        try:
+            pipe = client.pipeline(transaction=False)
+            pipe.get(const.breeze_health_key(user_id))
+            pipe.zadd(const.BREEZE_WATCHED_USERS_KEY, {user_id: time.time()})
+            verdict, _ = pipe.execute()
+        except redis.RedisError as e:
+            logger.warning(f"Could not read the health of user {user_id}: {e}")
+            verdict = None
+        return json.loads(verdict) if verdict else self.probe(user_id)
+
+    def watched_users(self) -> list:
+        """
+        Returns the users whose session health was asked for recently or who
+        have a live feed, forgetting those who stopped asking.
+        """
+        client = _client()
+        if client is None:
+            return []
+        since = time.time() - const.BREEZE_HEALTH_WATCH_WINDOW
+        try:
+            pipe = client.pipeline(transaction=False)
+            pipe.zremrangebyscore(const.BREEZE_WATCHED_USERS_KEY, "-inf", since)
+            pipe.zrange(const.BREEZE_WATCHED_USERS_KEY, 0, -1)
+            pipe.smembers(const.FEED_USERS_KEY)
+            _, watched, feeds = pipe.execute()
+        except redis.RedisError as e:
+            logger.warning(f"Could not read the watched Breeze sessions: {e}")
+            return []
+        return sorted({int(user_id) for user_id in (*watched, *feeds)})
+
 
 # Instantiate a global BreezeSessionManager
 breeze_session_manager = BreezeSessionManager()
@@ -0,0 +1,192 @@
+from collections import defaultdict
+import logging
+import threading
+import time
+
+from breeze_connect.breeze_connect import ApificationBreeze, api_endpoint, config
+import requests
+from requests.adapters import HTTPAdapter
+
+from main import const
+
+logger = logging.getLogger(__name__)
+
+# breeze_connect sends every REST call with a bare ``requests.get``, paying DNS,
+# TCP and TLS setup each time. Sessions built by BreezeSessionManager use
+# PooledApification instead: one keep-alive pool per process, shared by every
+# account and chunk.
+
+# Paths of the Breeze hosts, as served by the local stand-in
+API_PREFIX = "/breezeapi/api/v1/"
+HISTORICAL_PREFIX = "/api/v2/"
+SCRIPT_MASTER_PATH = "/scripts.csv"
+
+
+class RequestMetrics:
+    """
+    Thread-safe counters of the Breeze requests made by this process, per
+    endpoint: requests, errors and their total and slowest durations.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.endpoints = defaultdict(
+            lambda: {"requests": 0, "errors": 0, "seconds": 0.0, "max_seconds": 0.0}
+        )
+
+    def record(self, endpoint: str, seconds: float, error: bool = False):
+        with self.lock:
+            stats = self.endpoints[endpoint]
+            stats["requests"] += 1
+            stats["errors"] += int(error)
+            stats["seconds"] += seconds
+            stats["max_seconds"] = max(stats["max_seconds"], seconds)
+
+    def snapshot(self) -> dict:
+        """
+        Returns a copy of the counters with each endpoint's mean duration.
+        """
+        with self.lock:
+            return {
+                endpoint: {
+                    **stats,
+                    "mean_seconds": stats["seconds"] / stats["requests"],
+                }
+                for endpoint, stats in self.endpoints.items()
+            }
+
+    def reset(self):
+        with self.lock:
+            self.endpoints.clear()
+
+
+breeze_metrics = RequestMetrics()
+
+
+def pooled_http_session(pool_size: int = const.BREEZE_HTTP_POOL_SIZE):
+    """
+    Builds a ``requests`` session keeping up to ``pool_size`` connections alive
+    per host. Callers beyond that wait for a free connection instead of opening
+    throwaway ones.
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_maxsize=pool_size, pool_block=True)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+# Connections are opened lazily, so forked Celery children never share sockets
+http_session = pooled_http_session()
+
+
+def use_breeze_standin(base_url: str):
+    """
+    Sends every Breeze call of this process, REST and tick stream, to the local
+    stand-in at ``base_url`` (see ``apps.core.breeze_standin``). Sessions
+    created earlier keep their hosts.
+    """
+    base_url = base_url.rstrip("/")
+    config.API_URL = base_url + API_PREFIX
+    config.BREEZE_NEW_URL = base_url + HISTORICAL_PREFIX
+    config.LIVE_STREAM_URL = base_url
+    config.LIVE_FEEDS_URL = base_url
+    config.LIVE_OHLC_STREAM_URL = base_url
+    config.STOCK_SCRIPT_CSV_URL = base_url + SCRIPT_MASTER_PATH
+    logger.warning(f"Breeze calls go to the stand-in at {base_url}.")
+
+
+class PooledApification(ApificationBreeze):
+    """
+    Breeze's REST handler sending its requests over the pooled ``http_session``,
+    at most as many at a time as ``slots`` allows, with a timeout and with
+    every request timed in ``breeze_metrics``.
+    """
+
+    def __init__(
+        self,
+        breeze_instance,
+        slots: threading.Semaphore | None = None,
+        session: requests.Session | None = None,
+    ):
+        super().__init__(breeze_instance)
+        self.slots = slots or threading.BoundedSemaphore(
+            const.BREEZE_MAX_CONCURRENT_REQUESTS
+        )
+        self.http = session or http_session
+
+    def request(self, method: str, url: str, endpoint: str, **kwargs):
+        """
+        Sends a request, holding one of the account's slots while it runs.
+
+        Returns:
+            requests.Response: The response, whatever its status.
+        """
+        with self.slots:
+            start = time.monotonic()
+            error = True
+            try:
+                response = self.http.request(
+                    method, url, timeout=const.BREEZE_HTTP_TIMEOUT, **kwargs
+                )
+                error = not response.ok
+                return response
+            finally:
+                seconds = time.monotonic() - start
+                breeze_metrics.record(endpoint, seconds, error)
+                logger.debug(f"Breeze {method} {endpoint} took {seconds:.3f}s")
+
+    def make_request(self, method, endpoint, body, headers):
+        url = self.hostname + endpoint
+        try:
+            return self.request(method.value, url, endpoint, data=body, headers=headers)
+        except Exception as e:
+            self.error_exception(f"{method.value} {url}", e)
+
+    def get_historical_data_v2(
+        self,
+        interval="",
+        from_date="",
+        to_date="",
+        stock_code="",
+        exchange_code="",
+        product_type="",
+        expiry_date="",
+        right="",
+        strike_price="",
+    ):
+        """
+        Same request as breeze_connect's, over the pool. Its argument checks are
+        skipped; ``historical_data_params`` builds complete arguments.
+        """
+        params = {
+            "interval": interval,
+            "from_date": from_date,
+            "to_date": to_date,
+            "stock_code": stock_code,
+            "exch_code": exchange_code,
+        }
+        for name, value in (
+            ("product_type", product_type),
+            ("expiry_date", expiry_date),
+            ("strike_price", strike_price),
+            ("right", right),
+        ):
+            if value not in ("", None):
+                params[name] = value
+        headers = {
+            "Content-Type": "application/json",
+            "X-SessionToken": self.base64_session_token,
+            "apikey": self.breeze.api_key,
+        }
+        endpoint = api_endpoint.HIST_CHART.value
+        try:
+            return self.request(
+                "GET",
+                config.BREEZE_NEW_URL + endpoint,
+                endpoint,
+                params=params,
+                headers=headers,
+            ).json()
+        except Exception as e:
+            self.error_exception(self.get_historical_data_v2.__name__, e)
@@ -0,0 +1,412 @@
+import base64
+from collections import defaultdict, deque
+import csv
+from datetime import datetime, timedelta
+from functools import lru_cache
+import io
+import json
+import logging
+import random
+import time
+from typing import NamedTuple
+from urllib.parse import parse_qs
+import zlib
+
+from asgiref.sync import sync_to_async
+import numpy as np
+import socketio
+
+from apps.core.breeze_rest import API_PREFIX, HISTORICAL_PREFIX, SCRIPT_MASTER_PATH
+from apps.core.models import SubscribedInstruments
+from apps.core.trading_calendar import get_calendar, india_tz
+from main import const
+
+logger = logging.getLogger(__name__)
+
+# A local stand-in for the parts of Breeze the app uses: customer details
+# (session generation), funds (health probes), 1-minute historical charts and
+# the socket.io tick stream. Prices are synthetic but deterministic, so
+# repeated backfills of a range fetch the same bars. Run it with
+# `manage.py breeze_standin` and point the app at it with BREEZE_STANDIN_URL.
+
+STATS_PATH = "/standin/stats"
+BREEZE_DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+class StandinOptions(NamedTuple):
+    """
+    How the stand-in behaves: ``tick_rate`` ticks per second for every
+    subscribed token unless ``symbol_rates`` says otherwise, ``latency`` plus
+    up to ``jitter`` seconds before each REST response, at most
+    ``calls_per_minute`` REST calls per API key (0 for no limit), and a share
+    ``error_rate`` of REST calls failing. ``clock_offset`` seconds are added to
+    tick times, to replay market hours at any time of day.
+    """
+
+    tick_rate: float = 1.0
+    symbol_rates: dict = {}
+    latency: float = 0.0
+    jitter: float = 0.0
+    calls_per_minute: int = const.BREEZE_STANDIN_CALLS_PER_MINUTE
+    error_rate: float = 0.0
+    clock_offset: float = 0.0
+    seed: int | None = None
+
+
+def breeze_response(success=None, status: int = 200, error: str | None = None):
+    return {"Success": success, "Status": status, "Error": error}
+
+
+def base_price(symbol: str) -> float:
+    """
+    A stable starting price of a symbol, between 100 and 3,000.
+    """
+    return float(100 + zlib.crc32(symbol.encode()) % 2900)
+
+
+def tick_size_round(price: float) -> float:
+    return round(round(price * 20) / 20, 2)
+
+
+@lru_cache(maxsize=1024)
+def day_bars(stock_code: str, day) -> tuple:
+    """
+    The 1-minute bars of a symbol over the NSE sessions of ``day``: their
+    epoch-second times and open, high, low, close and volume arrays. The same
+    symbol and day always give the same bars.
+    """
+    sessions = get_calendar().sessions(day)
+    if not sessions:
+        empty = np.empty(0)
+        return empty, empty, empty, empty, empty, empty
+    times = np.concatenate(
+        [
+            np.arange(int(session.open.timestamp()), int(session.close.timestamp()), 60)
+            for session in sessions
+        ]
+    )
+    rng = np.random.default_rng(zlib.crc32(f"{stock_code}:{day}".encode()))
+    start = base_price(stock_code) * (1 + rng.normal(0, 0.01))
+    closes = start * np.exp(np.cumsum(rng.normal(0, 0.0008, len(times))))
+    opens = np.concatenate(([start], closes[:-1]))
+    spread = closes * rng.random(len(times)) * 0.0006
+    highs = np.maximum(opens, closes) + spread
+    lows = np.minimum(opens, closes) - spread
+    volumes = rng.integers(100, 10_000, len(times))
+    return times, opens, highs, lows, closes, volumes
+
+
+def historical_bars(
+    stock_code: str,
+    exchange_code: str,
+    start: datetime,
+    end: datetime,
+    limit: int = const.BREEZE_HISTORICAL_MAX_BARS,
+) -> list:
+    """
+    Synthetic 1-minute bars of a symbol in ``[start, end]``, shaped like the
+    ``Success`` rows of ``get_historical_data_v2``: naive India times, prices
+    on the 5 paise tick grid. At most ``limit`` bars, the oldest first.
+    """
+    low, high = int(start.timestamp()), int(end.timestamp())
+    rows = []
+    day = start.astimezone(india_tz).date()
+    while day <= end.astimezone(india_tz).date() and len(rows) < limit:
+        times, *prices, volumes = day_bars(stock_code, day)
+        for index in np.flatnonzero((times >= low) & (times <= high)).tolist():
+            moment = datetime.fromtimestamp(int(times[index]), india_tz)
+            rows.append(
+                {
+                    "datetime": moment.strftime(BREEZE_DATE_FORMAT),
+                    "stock_code": stock_code,
+                    "exchange_code": exchange_code,
+                    "open": tick_size_round(prices[0][index]),
+                    "high": tick_size_round(prices[1][index]),
+                    "low": tick_size_round(prices[2][index]),
+                    "close": tick_size_round(prices[3][index]),
+                    "volume": int(volumes[index]),
+                }
+            )
+        day += timedelta(days=1)
+    return rows[:limit]
+
+
+def parse_breeze_date(value: str) -> datetime:
+    """
+    Reads a ``from_date``/``to_date`` argument. The app sends India wall times
+    formatted by ``date_parser``, whose trailing "Z" is not a real offset.
+    """
+    value = value.removesuffix("Z").split(".")[0]
+    return india_tz.localize(datetime.fromisoformat(value))
+
+
+def quote_tick(symbol: str, last: float, ltq: int, at: float, day_open: float):
+    """
+    A ``stock`` event of the tick stream: the 21-field NSE/BSE quote that
+    ``BreezeConnect.parse_data`` decodes into 'symbol', 'last', 'ltq', 'ltt'
+    and the rest.
+    """
+    last = tick_size_round(last)
+    return [
+        symbol,
+        day_open,
+        last,
+        max(day_open, last),
+        min(day_open, last),
+        round((last - day_open) / day_open * 100, 2),
+        tick_size_round(last * 0.9995),
+        ltq,
+        tick_size_round(last * 1.0005),
+        ltq,
+        ltq,
+        last,
+        ltq,
+        0,
+        0,
+        0,
+        "",
+        tick_size_round(day_open * 0.8),
+        tick_size_round(day_open * 1.2),
+        int(at),
+        day_open,
+    ]
+
+
+def script_master_csv() -> str:
+    """
+    A script master holding the subscribed instruments, in the columns
+    ``BreezeConnect.get_stock_script_list`` reads, so ticks carry stock names.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(
+        ("Token", "CompanyName", "Exchange", "ShortName", "", "TokenNo", "", "Code")
+    )
+    for stock_token, short_name, company_name, exchange in (
+        SubscribedInstruments.objects.exclude(stock_token=None)
+        .exclude(stock_token="")
+        .values_list("stock_token", "short_name", "company_name", "exchange__exchange")
+    ):
+        token = stock_token.split("!")[-1]
+        writer.writerow(
+            (
+                token,
+                company_name or short_name,
+                exchange,
+                short_name,
+                "",
+                token,
+                "",
+                short_name,
+            )
+        )
+    return buffer.getvalue()
+
+
+class BreezeStandin:
+    """
+    The stand-in as an ASGI application: socket.io on ``/socket.io/`` and the
+    REST subset everywhere else. Counters of calls, responses and ticks are
+    served as JSON on ``/standin/stats``.
+    """
+
+    def __init__(self, options: StandinOptions | None = None):
+        self.options = options or StandinOptions()
+        self.random = random.Random(self.options.seed)
+        self.calls = defaultdict(deque)
+        self.stats = defaultdict(int)
+        self.prices = {}
+        self.tickers = set()
+        self.sio = socketio.AsyncServer(async_mode="asgi", cors_allowed_origins="*")
+        self.sio.on("connect", self.on_connect)
+        self.sio.on("join", self.on_join)
+        self.sio.on("leave", self.on_leave)
+        self.app = socketio.ASGIApp(self.sio, other_asgi_app=self.rest)
+
+    async def __call__(self, scope, receive, send):
+        await self.app(scope, receive, send)
+
+    # REST
+
+    async def rest(self, scope, receive, send):
+        if scope["type"] != "http":
+            return
+        body = b""
+        more = True
+        while more:
+            message = await receive()
+            body += message.get("body", b"")
+            more = message.get("more_body", False)
+        headers = {
+            name.decode().lower(): value.decode() for name, value in scope["headers"]
+        }
+        query = {
+            name: values[-1]
+            for name, values in parse_qs(scope["query_string"].decode()).items()
+        }
+        status, content_type, content = await self.respond(
+            scope["path"], query, headers, body
+        )
+        await send(
+            {
+                "type": "http.response.start",
+                "status": status,
+                "headers": [(b"content-type", content_type.encode())],
+            }
+        )
+        await send({"type": "http.response.body", "body": content})
+
+    async def respond(
+        self, path: str, query: dict, headers: dict, body: bytes
+    ) -> tuple:
+        """
+        Answers one REST call after the configured latency, unless it is
+        rate limited or picked to fail.
+
+        Returns:
+            tuple: The HTTP status, content type and body.
+        """
+        if path == STATS_PATH:
+            return 200, "application/json", json.dumps(self.stats).encode()
+        if path == SCRIPT_MASTER_PATH:
+            return 200, "text/csv", (await sync_to_async(script_master_csv)()).encode()
+
+        endpoint = path.rsplit("/", 1)[-1]
+        self.stats[f"calls.{endpoint}"] += 1
+        if self.options.latency or self.options.jitter:
+            await self.sio.sleep(
+                self.options.latency + self.random.random() * self.options.jitter
+            )
+
+        try:
+            payload = json.loads(body) if body else {}
+        except ValueError:
+            payload = {}
+        api_key = headers.get("apikey") or payload.get("AppKey", "")
+        if self.rate_limited(api_key):
+            status = 429
+            response = breeze_response(status=status, error="Rate limit exceeded.")
+        elif self.random.random() < self.options.error_rate:
+            status = 500
+            response = breeze_response(status=status, error="Internal server error.")
+        elif path == API_PREFIX + "customerdetails":
+            status, response = self.customer_details(payload)
+        elif path == API_PREFIX + "funds":
+            status, response = self.funds(headers)
+        elif path == HISTORICAL_PREFIX + "historicalcharts":
+            status, response = self.historical_charts(query, headers)
+        else:
+            status = 404
+            response = breeze_response(status=status, error="Resource not available.")
+        self.stats[f"status.{status}"] += 1
+        return status, "application/json", json.dumps(response).encode()
+
+    def rate_limited(self, api_key: str) -> bool:
+        """
+        Counts a call of ``api_key`` in its sliding one-minute window, unless
+        the window is full.
+        """
+        limit = self.options.calls_per_minute
+        if not limit:
+            return False
+        now = time.monotonic()
+        calls = self.calls[api_key]
+        while calls and calls[0] <= now - 60:
+            calls.popleft()
+        if len(calls) >= limit:
+            return True
+        calls.append(now)
+        return False
+
+    def customer_details(self, payload: dict) -> tuple:
+        session_token = payload.get("SessionToken")
+        if not session_token or not payload.get("AppKey"):
+            return 401, breeze_response(status=401, error="Invalid session.")
+        token = base64.b64encode(f"STANDIN:{session_token}".encode()).decode()
+        return 200, breeze_response(
+            {"session_token": token, "idirect_userid": "STANDIN"}
+        )
+
+    def funds(self, headers: dict) -> tuple:
+        if not headers.get("x-sessiontoken"):
+            return 401, breeze_response(status=401, error="Invalid session.")
+        return 200, breeze_response(
+            {
+                "bank_account": "000000000000",
+                "total_bank_balance": 1_000_000.0,
+                "allocated_equity": 500_000.0,
+                "allocated_fno": 500_000.0,
+                "block_by_trade_equity": 0.0,
+                "block_by_trade_fno": 0.0,
+                "unallocated_balance": "0.0",
+            }
+        )
+
+    def historical_charts(self, query: dict, headers: dict) -> tuple:
+        if not headers.get("x-sessiontoken"):
+            return 401, breeze_response(status=401, error="Invalid session.")
+        if query.get("interval", "1minute") != "1minute":
+            return 400, breeze_response(
+                status=400, error="The stand-in only serves 1minute bars."
+            )
+        try:
+            start = parse_breeze_date(query["from_date"])
+            end = parse_breeze_date(query["to_date"])
+            stock_code = query["stock_code"]
+        except (KeyError, ValueError):
+            return 400, breeze_response(status=400, error="Invalid parameters.")
+        rows = historical_bars(stock_code, query.get("exch_code", "NSE"), start, end)
+        self.stats["bars"] += len(rows)
+        return 200, breeze_response(rows)
+
+    # Tick stream
+
+    async def on_connect(self, sid, environ, auth=None):
+        if not auth or not auth.get("user") or not auth.get("token"):
+            raise socketio.exceptions.ConnectionRefusedError("Invalid session.")
+        self.stats["connections"] += 1
+
+    async def on_join(self, sid, data):
+        for symbol in data if isinstance(data, list) else [data]:
+            await self.sio.enter_room(sid, symbol)
+            if symbol not in self.tickers:
+                self.tickers.add(symbol)
+                self.sio.start_background_task(self.tick, symbol)
+
+    async def on_leave(self, sid, data):
+        for symbol in data if isinstance(data, list) else [data]:
+            await self.sio.leave_room(sid, symbol)
+
+    def tick_rate(self, symbol: str) -> float:
+        return self.options.symbol_rates.get(symbol, self.options.tick_rate)
+
+    async def tick(self, symbol: str):
+        """
+        Streams ticks of ``symbol`` to its room at its rate, as a random walk,
+        until nobody listens.
+        """
+        rng = random.Random(f"{self.options.seed}:{symbol}")
+        day_open = self.prices.setdefault(symbol, base_price(symbol))
+        last = day_open
+        interval = 1 / self.tick_rate(symbol)
+        next_at = time.monotonic()
+        try:
+            while self.sio.manager.rooms.get("/", {}).get(symbol):
+                last *= 1 + rng.gauss(0, 0.0005)
+                await self.sio.emit(
+                    "stock",
+                    quote_tick(
+                        symbol,
+                        last,
+                        rng.randint(1, 500),
+                        time.time() + self.options.clock_offset,
+                        day_open,
+                    ),
+                    room=symbol,
+                )
+                self.stats["ticks"] += 1
+                # Keeps the rate steady however long emitting takes
+                next_at += interval
+                await self.sio.sleep(max(0.0, next_at - time.monotonic()))
+        finally:
+            self.tickers.discard(symbol)
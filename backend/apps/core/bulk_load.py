@@ -0,0 +1,190 @@
+from datetime import UTC, date, datetime
+import io
+import logging
+from operator import itemgetter
+from typing import NamedTuple
+
+from django.db import connection, transaction
+import numpy as np
+
+from apps.core.models import Candle
+from apps.core.resample import IST_OFFSET
+from apps.core.trading_calendar import TradingCalendar, get_calendar
+from main import const
+
+logger = logging.getLogger(__name__)
+
+# Backfilled bars are streamed with COPY into a temporary staging table and
+# merged into core_candle with a single INSERT ... SELECT, instead of being
+# bound as parameters of one INSERT per few thousand rows.
+STAGING_TABLE = "candle_staging"
+STAGING_COLUMNS = ("date", "instrument_id", "volume", "open", "high", "low", "close")
+
+
+class CandleArrays(NamedTuple):
+    """
+    Bars of one instrument in contiguous arrays, oldest first: int64 epoch
+    seconds and prices in paise, as stored.
+    """
+
+    times: np.ndarray
+    opens: np.ndarray
+    highs: np.ndarray
+    lows: np.ndarray
+    closes: np.ndarray
+    volumes: np.ndarray
+
+    @property
+    def size(self) -> int:
+        return len(self.times)
+
+    def first(self) -> datetime:
+        return datetime.fromtimestamp(int(self.times[0]), UTC)
+
+    def last(self) -> datetime:
+        return datetime.fromtimestamp(int(self.times[-1]), UTC)
+
+
+def session_mask(times: np.ndarray, calendar: TradingCalendar) -> np.ndarray:
+    """
+    Flags the epoch-second timestamps falling inside a session of ``calendar``,
+    both ends included. Sessions are looked up once per day of the batch.
+    """
+    days = (times + IST_OFFSET) // 86400
+    mask = np.zeros(len(times), dtype=bool)
+    for day in np.unique(days).tolist():
+        for session in calendar.sessions(date.fromordinal(day + 719163)):
+            mask |= (times >= int(session.open.timestamp())) & (
+                times <= int(session.close.timestamp())
+            )
+    return mask
+
+
+def breeze_candle_arrays(
+    payload: list, calendar: TradingCalendar | None = None
+) -> CandleArrays:
+    """
+    Converts the ``Success`` rows of a Breeze historical response to arrays.
+
+    Breeze dates are naive India times; IST has no daylight saving, so they are
+    parsed by NumPy in one call and shifted by a fixed offset. Bars outside the
+    sessions of ``calendar`` (NSE by default) or missing a price are dropped
+    and, of bars sharing a minute, the last one is kept.
+    """
+    calendar = calendar or get_calendar()
+    if not payload:
+        empty = np.empty(0, dtype=np.int64)
+        return CandleArrays(empty, empty, empty, empty, empty, empty)
+
+    times = (
+        np.array([item["datetime"] for item in payload], dtype="datetime64[s]").astype(
+            np.int64
+        )
+        - IST_OFFSET
+    )
+    # Breeze sends numbers or numeric strings; None becomes NaN
+    values = np.array(
+        list(map(itemgetter("open", "high", "low", "close"), payload)),
+        dtype=np.float64,
+    )
+    volumes = np.array([item.get("volume") for item in payload], dtype=np.float64)
+
+    # Rows with a missing price would scale to garbage integers and fail the
+    # whole COPY; they are dropped before picking the last bar of each minute
+    keep = np.flatnonzero(
+        session_mask(times, calendar) & np.isfinite(values).all(axis=1)
+    )
+    dropped = len(payload) - len(keep)
+    # np.unique keeps the first occurrence; scanning backwards keeps the last
+    _, last = np.unique(times[keep][::-1], return_index=True)
+    last = keep[len(keep) - 1 - last]
+    if dropped:
+        logger.debug(
+            f"Dropped {dropped} Breeze bars outside sessions or without prices."
+        )
+
+    prices = np.rint(values[last] * const.PRICE_SCALE).astype(np.int64)
+    return CandleArrays(
+        times[last],
+        *prices.T,
+        np.rint(np.nan_to_num(volumes[last])).astype(np.int64),
+    )
+
+
+def copy_candles(instrument_id: int, candles: CandleArrays) -> int:
+    """
+    Writes the bars of an instrument, overwriting stored ones like
+    ``bulk_upsert(replace=True)``.
+
+    On Postgres the bars are COPYed into a temporary staging table and merged in
+    one statement; elsewhere they go through ``bulk_upsert``.
+
+    Returns:
+        int: The number of bars written.
+    """
+    if not candles.size:
+        return 0
+    if connection.vendor != "postgresql":
+        return Candle.objects.bulk_upsert(
+            [
+                (
+                    instrument_id,
+                    datetime.fromtimestamp(time, UTC),
+                    *(price / const.PRICE_SCALE for price in prices),
+                    volume,
+                )
+                for time, *prices, volume in zip(
+                    candles.times.tolist(),
+                    candles.opens.tolist(),
+                    candles.highs.tolist(),
+                    candles.lows.tolist(),
+                    candles.closes.tolist(),
+                    candles.volumes.tolist(),
+                    strict=True,
+                )
+            ],
+            replace=True,
+        )
+
+    dates = np.char.add(
+        np.datetime_as_string(candles.times.astype("datetime64[s]")), "+00"
+    )
+    columns = (
+        dates.tolist(),
+        [str(instrument_id)] * candles.size,
+        *(
+            column.astype(str).tolist()
+            for column in (
+                candles.volumes,
+                candles.opens,
+                candles.highs,
+                candles.lows,
+                candles.closes,
+            )
+        ),
+    )
+    buffer = io.StringIO("\n".join(map("\t".join, zip(*columns, strict=True))))
+
+    qn = connection.ops.quote_name
+    table = qn(Candle._meta.db_table)
+    names = ", ".join(qn(column) for column in STAGING_COLUMNS)
+    updates = ", ".join(
+        f"{qn(column)} = EXCLUDED.{qn(column)}" for column in STAGING_COLUMNS[2:]
+    )
+    with transaction.atomic(), connection.cursor() as cursor:
+        # Lives as long as the connection; the batch may run inside an outer
+        # transaction, so it is emptied explicitly rather than on commit
+        cursor.execute(
+            f"CREATE TEMPORARY TABLE IF NOT EXISTS {STAGING_TABLE} "
+            f"AS SELECT {names} FROM {table} WITH NO DATA"
+        )
+        cursor.execute(f"TRUNCATE {STAGING_TABLE}")
+        cursor.copy_expert(f"COPY {STAGING_TABLE} ({names}) FROM STDIN", buffer)
+        cursor.execute(
+            f"INSERT INTO {table} ({names}) SELECT {names} FROM {STAGING_TABLE} "
+            f"ON CONFLICT ({qn('instrument_id')}, {qn('date')}) "
+            f"DO UPDATE SET {updates}"
+        )
+        written = cursor.rowcount
+    logger.debug(f"Copied {written} candles of instrument ID {instrument_id}.")
+    return written
@@ -0,0 +1,175 @@
+from collections import defaultdict
+from datetime import UTC, datetime
+import json
+import logging
+
+import redis
+
+from apps.core.utils import stored_candles_qs
+from main import const, utils
+
+logger = logging.getLogger(__name__)
+
+# Member scored +inf marking a window seeded from the database. Live writes
+# alone only hold the bars seen since, so reads ignore windows without it.
+SEEDED = "seeded"
+
+HOT_TIMEFRAMES = (1, *const.CANDLE_ROLLUP_TIMEFRAMES)
+
+
+def _client() -> redis.Redis | None:
+    try:
+        return utils.get_redis_client("default")
+    except ValueError:
+        # Not running against Redis (tests, local settings)
+        return None
+
+
+def _encode(score: int, ohlcv) -> str:
+    return json.dumps([score, *ohlcv], separators=(",", ":"))
+
+
+def _decode(member) -> dict:
+    t, o, h, l_, c, v = json.loads(member)
+    return {
+        "bucket": datetime.fromtimestamp(t, tz=UTC),
+        "o": o,
+        "h_": h,
+        "l_": l_,
+        "c": c,
+        "v_": v,
+    }
+
+
+def store_hot_candles(rows: list, client: redis.Redis | None = None) -> int:
+    """
+    Writes bars into the hot windows, replacing the stored version of each bar
+    and trimming every window to ``CANDLE_HOT_WINDOW`` bars. Rows must hold the
+    bar as stored, since the cache never merges.
+
+    Args:
+        rows (list): ``(instrument_id, timeframe, date, open, high, low, close,
+            volume)`` rows.
+        client (redis.Redis, optional): Defaults to the default cache's client.
+
+    Returns:
+        int: The number of bars written; 0 when Redis is unavailable.
+    """
+    client = client or _client()
+    if client is None or not rows:
+        return 0
+
+    by_key = defaultdict(dict)
+    for instrument_id, timeframe, date, *ohlcv in rows:
+        score = int(date.timestamp())
+        # The last row of a bar wins
+        by_key[const.candle_hot_key(instrument_id, timeframe)][score] = ohlcv
+
+    try:
+        pipe = client.pipeline(transaction=False)
+        for key, bars in by_key.items():
+            for score, ohlcv in bars.items():
+                pipe.zremrangebyscore(key, score, score)
+                pipe.zadd(key, {_encode(score, ohlcv): score})
+            # Ranks count from the oldest bar; the seeded marker sorts last
+            pipe.zremrangebyrank(key, 0, -const.CANDLE_HOT_WINDOW - 2)
+            pipe.expire(key, const.CANDLE_HOT_TTL)
+        pipe.execute()
+    except redis.RedisError as e:
+        logger.warning(f"Could not update the hot candle cache: {e}")
+        return 0
+    return sum(len(bars) for bars in by_key.values())
+
+
+def seed_hot_candles(
+    instrument_id: int, timeframe: int, client: redis.Redis | None = None
+) -> list:
+    """
+    Loads the newest ``CANDLE_HOT_WINDOW`` bars of an instrument from the
+    database into its hot window and marks it seeded. Bars already written by
+    the live builder are fresher than this read and are kept.
+
+    Returns:
+        list: The loaded bars newest first, shaped like ``stored_candles_qs``.
+    """
+    rows = list(stored_candles_qs(instrument_id, timeframe)[: const.CANDLE_HOT_WINDOW])
+    client = client or _client()
+    if client is None:
+        return rows
+
+    key = const.candle_hot_key(instrument_id, timeframe)
+    try:
+        present = {
+            int(score)
+            for _, score in client.zrangebyscore(key, "-inf", "(+inf", withscores=True)
+        }
+        mapping = {}
+        for row in rows:
+            score = int(row["bucket"].timestamp())
+            if score not in present:
+                mapping[
+                    _encode(
+                        score, (row["o"], row["h_"], row["l_"], row["c"], row["v_"])
+                    )
+                ] = score
+        mapping[SEEDED] = float("inf")
+        pipe = client.pipeline(transaction=False)
+        pipe.zadd(key, mapping)
+        pipe.zremrangebyrank(key, 0, -const.CANDLE_HOT_WINDOW - 2)
+        pipe.expire(key, const.CANDLE_HOT_TTL)
+        pipe.execute()
+    except redis.RedisError as e:
+        logger.warning(f"Could not seed the hot candle cache of {key}: {e}")
+    return rows
+
+
+def latest_candles(
+    instrument_id: int, timeframe: int, count: int, client: redis.Redis | None = None
+) -> list | None:
+    """
+    Returns the newest ``count`` bars of an instrument from its hot window,
+    seeding the window from the database on a miss.
+
+    Returns:
+        list | None: Bars newest first, shaped like ``stored_candles_qs``, or
+        ``None`` when ``count`` exceeds the window or Redis is unavailable.
+    """
+    if timeframe not in HOT_TIMEFRAMES or count > const.CANDLE_HOT_WINDOW:
+        return None
+    client = client or _client()
+    if client is None:
+        return None
+
+    key = const.candle_hot_key(instrument_id, timeframe)
+    try:
+        pipe = client.pipeline(transaction=False)
+        pipe.zscore(key, SEEDED)
+        pipe.zrevrangebyscore(key, "(+inf", "-inf", start=0, num=count)
+        seeded, members = pipe.execute()
+    except redis.RedisError as e:
+        logger.warning(f"Could not read the hot candle cache of {key}: {e}")
+        return None
+
+    if seeded is None:
+        return seed_hot_candles(instrument_id, timeframe, client)[:count]
+    return [_decode(member) for member in members]
+
+
+def invalidate_hot_candles(
+    instrument_id: int, client: redis.Redis | None = None
+) -> None:
+    """
+    Drops every hot window of an instrument, e.g. after a backfill replaced
+    stored bars. The next read seeds them again.
+    """
+    client = client or _client()
+    if client is None:
+        return
+    try:
+        client.delete(
+            *(const.candle_hot_key(instrument_id, tf) for tf in HOT_TIMEFRAMES)
+        )
+    except redis.RedisError as e:
+        logger.warning(
+            f"Could not invalidate the hot candles of instrument ID {instrument_id}: {e}"
+        )
@@ -0,0 +1,114 @@
+import asyncio
+from collections import defaultdict
+import json
+import logging
+
+from channels.layers import get_channel_layer
+from django.conf import settings
+import redis
+import redis.asyncio as aioredis
+
+from main import const, utils
+
+logger = logging.getLogger(__name__)
+
+LIVE_CHANNEL_PATTERN = const.candle_live_channel("*", "*")
+
+
+def candle_group(instrument_id: int, timeframe: int) -> str:
+    """
+    Name of the Channels group of the sockets following an instrument's bars.
+    """
+    return f"candles.{instrument_id}.{timeframe}"
+
+
+def publish_candles(rows: list, client: redis.Redis | None = None) -> int:
+    """
+    Publishes freshly stored bars to the websocket processes, one message per
+    instrument and timeframe.
+
+    Args:
+        rows (list): ``(instrument_id, timeframe, date, open, high, low, close,
+            volume)`` rows as stored.
+        client (redis.Redis, optional): Defaults to the default cache's client.
+
+    Returns:
+        int: The number of messages published; 0 when Redis is unavailable.
+    """
+    if not rows:
+        return 0
+    if client is None:
+        try:
+            client = utils.get_redis_client("default")
+        except ValueError:
+            return 0
+
+    bars = defaultdict(list)
+    for instrument_id, timeframe, date, *ohlcv in rows:
+        bars[instrument_id, timeframe].append([int(date.timestamp()), *ohlcv])
+
+    try:
+        pipe = client.pipeline(transaction=False)
+        for (instrument_id, timeframe), updates in bars.items():
+            pipe.publish(
+                const.candle_live_channel(instrument_id, timeframe),
+                json.dumps(updates, separators=(",", ":")),
+            )
+        pipe.execute()
+    except redis.RedisError as e:
+        logger.warning(f"Could not publish candle updates: {e}")
+        return 0
+    return len(bars)
+
+
+class CandleRelay:
+    """
+    Forwards the bar updates published by the candle writers to the Channels
+    groups of this process. One relay runs per ASGI process, whatever the
+    number of sockets, and reconnects with backoff when Redis goes away.
+    """
+
+    def __init__(self, url: str, channel_layer=None):
+        self.url = url
+        self.channel_layer = channel_layer or get_channel_layer()
+
+    async def run(self):
+        backoff = 1
+        while True:
+            client = aioredis.from_url(self.url)
+            try:
+                async with client.pubsub() as pubsub:
+                    await pubsub.psubscribe(LIVE_CHANNEL_PATTERN)
+                    backoff = 1
+                    async for message in pubsub.listen():
+                        if message["type"] == "pmessage":
+                            await self.forward(message["channel"], message["data"])
+            except redis.RedisError as e:
+                logger.warning(f"Candle relay lost Redis, retrying in {backoff}s: {e}")
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, 30)
+            finally:
+                await client.aclose()
+
+    async def forward(self, channel: bytes, data: bytes):
+        *_, instrument_id, timeframe = channel.decode().split(":")
+        # Groups drop messages for sockets whose inbox is full rather than wait
+        await self.channel_layer.group_send(
+            candle_group(instrument_id, timeframe),
+            {"type": "candle.bars", "bars": json.loads(data)},
+        )
+
+
+_relay_task = None
+
+
+def ensure_relay() -> asyncio.Task:
+    """
+    Starts the relay of this process on the running event loop unless it is
+    already running.
+    """
+    global _relay_task
+    if _relay_task is None or _relay_task.done():
+        relay = CandleRelay(settings.CACHES["default"]["LOCATION"])
+        _relay_task = asyncio.get_running_loop().create_task(relay.run())
+    return _relay_task
@@ -0,0 +1,197 @@
+from collections.abc import Callable
+from datetime import datetime, timedelta
+import logging
+import threading
+import time as PythonTime
+
+from django.db import transaction
+from pytz import timezone
+
+from apps.core.candle_cache import store_hot_candles
+from apps.core.candle_push import publish_candles
+from apps.core.models import Candle
+from apps.core.rollups import merge_rollups
+from apps.core.ticks import parse_tick_batch
+from main import const
+
+logger = logging.getLogger(__name__)
+
+india_tz = timezone("Asia/Kolkata")
+
+
+class Bar:
+    """
+    Mutable OHLCV state of a single in-memory 1-minute bar.
+
+    ``volume`` only holds the quantity traded since the bar was last written, so
+    the open bar can be flushed repeatedly and merged into the stored candle.
+    """
+
+    __slots__ = ("open", "high", "low", "close", "volume", "dirty")
+
+    def __init__(self, price: float, quantity: float):
+        self.open = price
+        self.high = price
+        self.low = price
+        self.close = price
+        self.volume = quantity
+        self.dirty = True
+
+    def update(self, price: float, quantity: float):
+        if price > self.high:
+            self.high = price
+        if price < self.low:
+            self.low = price
+        self.close = price
+        self.volume += quantity
+        self.dirty = True
+
+    def as_row(self, instrument_id: int, date: datetime) -> tuple:
+        return (
+            instrument_id,
+            date,
+            self.open,
+            self.high,
+            self.low,
+            self.close,
+            self.volume,
+        )
+
+    def mark_flushed(self):
+        self.volume = 0
+        self.dirty = False
+
+
+class CandleBuilder:
+    """
+    Streaming 1-minute OHLCV aggregator keyed by (instrument, minute).
+
+    Ticks update the open bar of their instrument in memory. A bar is closed as
+    soon as a tick for a later minute arrives (or once its minute has passed on
+    the wall clock) and is queued for writing; open bars are written every
+    ``open_bar_flush_interval`` seconds so charts stay current. Writes go through
+    ``writer`` as a list of ``(instrument_id, date, open, high, low, close,
+    volume)`` rows, so the database sees one statement per flush instead of one
+    per tick.
+    """
+
+    def __init__(
+        self,
+        writer: Callable[[list], object] | None = None,
+        open_bar_flush_interval: float = const.CANDLE_OPEN_BAR_FLUSH_INTERVAL,
+    ):
+        self.writer = writer or write_candle_bars
+        self.open_bar_flush_interval = open_bar_flush_interval
+        self._bars = {}
+        self._latest_minute = {}
+        self._pending_rows = []
+        self._last_open_flush = PythonTime.monotonic()
+        self._lock = threading.Lock()
+        # Serialises writers so bars reach the database in the order they closed.
+        self._write_lock = threading.Lock()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._bars)
+
+    def add_ticks(self, ticks: list) -> int:
+        """
+        Folds a batch of raw Breeze ticks into the open bars and writes whatever
+        is due. Suitable as a ``TickBuffer`` flush callback.
+        """
+        self.update(parse_tick_batch(ticks))
+        return self.flush()
+
+    def update(self, rows: list):
+        """
+        Folds parsed ``(instrument_id, date, price, quantity)`` rows into the bars.
+        """
+        with self._lock:
+            for instrument_id, date, price, quantity in rows:
+                minute = date.replace(second=0, microsecond=0)
+                key = (instrument_id, minute)
+                bar = self._bars.get(key)
+                if bar is not None:
+                    bar.update(price, quantity)
+                    continue
+
+                latest = self._latest_minute.get(instrument_id)
+                if latest is None or minute > latest:
+                    if latest is not None:
+                        self._close((instrument_id, latest))
+                    self._latest_minute[instrument_id] = minute
+                self._bars[key] = Bar(price, quantity)
+
+    def flush(self, force: bool = False, now: datetime | None = None) -> int:
+        """
+        Writes closed bars, plus every dirty open bar when the open-bar interval
+        has elapsed or ``force`` is set.
+
+        Returns:
+            int: The number of bars handed to the writer.
+        """
+        now = now or datetime.now(india_tz)
+        with self._write_lock:
+            with self._lock:
+                rows = self._collect(force, now)
+            if not rows:
+                return 0
+            try:
+                self.writer(rows)
+            except Exception as e:
+                logger.error(
+                    f"Error writing {len(rows)} candle bars: {e}", exc_info=True
+                )
+                # Keep the rows so the next flush retries them.
+                with self._lock:
+                    self._pending_rows = rows + self._pending_rows
+                return 0
+        return len(rows)
+
+    def _collect(self, force: bool, now: datetime) -> list:
+        stale_before = now - timedelta(minutes=1, seconds=const.CANDLE_BAR_CLOSE_GRACE)
+        for key in [key for key in self._bars if key[1] <= stale_before]:
+            self._close(key)
+
+        if (
+            force
+            or PythonTime.monotonic() - self._last_open_flush
+            >= self.open_bar_flush_interval
+        ):
+            for (instrument_id, minute), bar in self._bars.items():
+                if bar.dirty:
+                    self._pending_rows.append(bar.as_row(instrument_id, minute))
+                    bar.mark_flushed()
+            self._last_open_flush = PythonTime.monotonic()
+
+        rows, self._pending_rows = self._pending_rows, []
+        return rows
+
+    def _close(self, key: tuple):
+        bar = self._bars.pop(key)
+        if bar.dirty:
+            self._pending_rows.append(bar.as_row(*key))
+
+
+def write_candle_bars(rows: list) -> int:
+    """
+    Merges a batch of bar rows into ``Candle``: existing candles keep their open,
+    extend their high/low, take the new close and add the volume. The rollups of
+    the higher timeframes are merged in the same transaction, and the bars as
+    stored are then copied into the hot candle cache and pushed to the charts
+    following them.
+
+    Args:
+        rows (list): ``(instrument_id, date, open, high, low, close, volume)`` rows.
+
+    Returns:
+        int: The number of candles written.
+    """
+    with transaction.atomic():
+        candles = Candle.objects.bulk_upsert(rows, returning=True)
+        rollups = merge_rollups(rows, returning=True)
+    stored = [(instrument_id, 1, *bar) for instrument_id, *bar in candles] + rollups
+    store_hot_candles(stored)
+    publish_candles(stored)
+    logger.info(f"Wrote {len(candles)} candle bars.")
+    return len(candles)
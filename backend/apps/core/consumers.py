@@ -0,0 +1,70 @@
+import asyncio
+
+from channels.db import database_sync_to_async
+from channels.generic.websocket import AsyncJsonWebsocketConsumer
+
+from apps.core.candle_cache import HOT_TIMEFRAMES
+from apps.core.candle_push import candle_group, ensure_relay
+from apps.core.models import SubscribedInstruments
+from main import const
+
+
+class CandleConsumer(AsyncJsonWebsocketConsumer):
+    """
+    Pushes the bar updates of one instrument and stored timeframe
+    (``ws/candles/<instrument_id>/<timeframe>/``) to an authenticated client.
+
+    Updates arriving within ``CANDLE_PUSH_INTERVAL`` are coalesced, keeping the
+    latest version of each bar, so a fast market costs a client at most one
+    message per interval. Messages look like ``{"instrument": 1, "tf": 5,
+    "bars": [[t, open, high, low, close, volume], ...]}``, oldest bar first
+    with ``t`` in epoch seconds.
+    """
+
+    async def connect(self):
+        kwargs = self.scope["url_route"]["kwargs"]
+        self.instrument_id = kwargs["instrument_id"]
+        self.timeframe = kwargs["timeframe"]
+        self.group = None
+        self.pending = {}
+        self.flusher = None
+
+        user = self.scope.get("user")
+        if user is None or not user.is_authenticated:
+            await self.close(code=4401)
+            return
+        if self.timeframe not in HOT_TIMEFRAMES or not await self.instrument_exists():
+            await self.close(code=4404)
+            return
+
+        ensure_relay()
+        self.group = candle_group(self.instrument_id, self.timeframe)
+        await self.channel_layer.group_add(self.group, self.channel_name)
+        await self.accept()
+
+    async def disconnect(self, code):
+        if self.group is not None:
+            await self.channel_layer.group_discard(self.group, self.channel_name)
+        if self.flusher is not None:
+            self.flusher.cancel()
+
+    async def candle_bars(self, event):
+        for bar in event["bars"]:
+            self.pending[bar[0]] = bar
+        if self.flusher is None or self.flusher.done():
+            self.flusher = asyncio.ensure_future(self.flush_later())
+
+    async def flush_later(self):
+        await asyncio.sleep(const.CANDLE_PUSH_INTERVAL)
+        bars, self.pending = self.pending, {}
+        await self.send_json(
+            {
+                "instrument": self.instrument_id,
+                "tf": self.timeframe,
+                "bars": [bars[t] for t in sorted(bars)],
+            }
+        )
+
+    @database_sync_to_async
+    def instrument_exists(self) -> bool:
+        return SubscribedInstruments.objects.filter(id=self.instrument_id).exists()
@@ -0,0 +1,278 @@
+import logging
+import threading
+import time as PythonTime
+
+from django.core.cache import cache
+import redis
+
+from apps.core.breeze import breeze_session_manager
+from apps.core.candles import CandleBuilder
+from apps.core.subscriptions import SubscriptionQueue
+from apps.core.ticks import TickBuffer, instrument_index
+from main import const
+from main.locks import RedisLease, default_owner
+
+logger = logging.getLogger(__name__)
+
+
+def request_feed(redis_client: redis.Redis, user_id: int) -> None:
+    """
+    Asks the feed service (``manage.py run_feed``) to keep a live feed for a user.
+    """
+    redis_client.sadd(const.FEED_USERS_KEY, user_id)
+
+
+def cancel_feed(redis_client: redis.Redis, user_id: int) -> None:
+    """
+    Withdraws a user's feed request; the feed service stops the running feed.
+    """
+    redis_client.srem(const.FEED_USERS_KEY, user_id)
+
+
+class UserFeed:
+    """
+    The Breeze websocket of one user, run on its own thread: ticks are folded
+    into 1-minute bars in memory and subscription requests are applied as they
+    arrive, until ``stop`` is called.
+    """
+
+    def __init__(self, user_id: int, redis_client: redis.Redis):
+        self.user_id = user_id
+        self.redis_client = redis_client
+        self.started_at = None
+        # Set when no Breeze session could be had for the user
+        self.session_failed = False
+        self._stopping = threading.Event()
+        self._thread = None
+
+    def __repr__(self):
+        return f"<UserFeed user={self.user_id}>"
+
+    def start(self):
+        self.started_at = PythonTime.monotonic()
+        self._thread = threading.Thread(
+            target=self.run, name=f"feed-user-{self.user_id}", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self, timeout: float | None = None):
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def is_alive(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def run(self):
+        # Imported here; the tasks module starts feeds through this one
+        from apps.core.tasks import load_candles
+
+        sess = None
+        tick_buffer = None
+        candle_builder = None
+        try:
+            # Ticks are decoded against Breeze's script master
+            try:
+                sess = breeze_session_manager.initialize_session(
+                    self.user_id, script_master=True
+                )
+            except Exception:
+                self.session_failed = True
+                raise
+            sess.ws_connect()
+            load_candles.delay(self.user_id)
+
+            # Ticks are buffered in-process and folded into 1-minute bars in
+            # memory; only the bars are written to the database.
+            candle_builder = CandleBuilder()
+            tick_buffer = TickBuffer(candle_builder.add_ticks)
+            tick_buffer.start()
+            sess.on_ticks = tick_buffer.add
+            logger.info(f"Feed of user {self.user_id} connected.")
+
+            subscription_queue = SubscriptionQueue(self.redis_client, self.user_id)
+            last_heartbeat = None
+            while not self._stopping.is_set():
+                try:
+                    now = PythonTime.monotonic()
+                    if (
+                        last_heartbeat is None
+                        or now - last_heartbeat >= const.WEBSOCKET_HEARTBEAT_INTERVAL
+                    ):
+                        cache.set(
+                            const.WEBSOCKET_HEARTBEAT_KEY,
+                            True,
+                            timeout=const.WEBSOCKET_HEARTBEAT_TTL,
+                        )
+                        last_heartbeat = now
+                    # Write open bars even when no ticks are arriving
+                    candle_builder.flush()
+                    # Wakes up as soon as either queue receives a request
+                    changes = subscription_queue.wait(const.SUBSCRIPTION_WAIT_TIMEOUT)
+                    # Ticks of these tokens must be resolved afresh
+                    for stock_token in (*changes.subscribe, *changes.unsubscribe):
+                        instrument_index.invalidate(stock_token)
+                    for stock_token in changes.subscribe:
+                        sess.subscribe_feeds(stock_token=stock_token)
+                        logger.info(f"Subscribed to new instrument: {stock_token}")
+                    for stock_token in changes.unsubscribe:
+                        sess.unsubscribe_feeds(stock_token=stock_token)
+                        logger.info(f"Unsubscribed from instrument: {stock_token}")
+                except Exception as e:
+                    logger.error(
+                        f"Error while processing subscription: {e}", exc_info=True
+                    )
+                    # Back off instead of spinning on a persistent failure
+                    self._stopping.wait(1)
+        except Exception as e:
+            logger.error(f"Feed of user {self.user_id} failed: {e}", exc_info=True)
+        finally:
+            # Flush pending ticks and disconnect
+            try:
+                if tick_buffer is not None:
+                    tick_buffer.stop()
+                    candle_builder.flush(force=True)
+            except Exception as e:
+                logger.error(f"Error while flushing tick buffer: {e}", exc_info=True)
+            try:
+                if sess is not None:
+                    sess.ws_disconnect()
+                    logger.info(f"Feed of user {self.user_id} disconnected.")
+            except Exception as e:
+                logger.error(f"Error while disconnecting WebSocket: {e}", exc_info=True)
+
+
+class FeedService:
+    """
+    Runs the live feeds of every user who requested one, across any number of
+    feed processes.
+
+    A process runs a user's feed only while it holds the user's lease in Redis,
+    so each feed runs exactly once; the lease is renewed every
+    ``FEED_RENEW_INTERVAL`` seconds, and when a process dies its leases expire
+    after ``FEED_LEASE_TTL`` and another process picks the users up. Feeds that
+    end on their own (e.g. an expired Breeze session) are retried with backoff;
+    users without a working Breeze session after ``FEED_MAX_SESSION_FAILURES``
+    attempts are dropped. Feeds whose request was withdrawn are stopped.
+    """
+
+    def __init__(
+        self,
+        redis_client: redis.Redis,
+        owner: str | None = None,
+        feed_class=UserFeed,
+    ):
+        self.redis_client = redis_client
+        self.owner = owner or default_owner()
+        self.feed_class = feed_class
+        self.feeds = {}
+        # user_id -> (monotonic time of the next attempt, current backoff)
+        self.retries = {}
+        # user_id -> consecutive feeds that could not get a Breeze session
+        self.session_failures = {}
+
+    def run(self, stopping: threading.Event):
+        logger.info(f"Feed service {self.owner} started.")
+        try:
+            while not stopping.is_set():
+                try:
+                    self.step()
+                except redis.RedisError as e:
+                    logger.error(f"Feed service lost Redis: {e}")
+                stopping.wait(const.FEED_RENEW_INTERVAL)
+        finally:
+            self.shutdown()
+
+    def step(self):
+        """
+        Renews the leases of the running feeds, reaps the ones that ended and
+        starts feeds for newly requested users.
+        """
+        now = PythonTime.monotonic()
+        requested = self.requested_users()
+        for user_id, (feed, lease) in list(self.feeds.items()):
+            if not feed.is_alive():
+                del self.feeds[user_id]
+                lease.release()
+                if self.count_session_failure(user_id, feed.session_failed):
+                    self.schedule_retry(user_id, now - feed.started_at, now)
+            elif user_id not in requested:
+                logger.info(f"Feed of user {user_id} is no longer requested; stopping.")
+                del self.feeds[user_id]
+                feed.stop(timeout=const.FEED_STOP_TIMEOUT)
+                lease.release()
+                self.retries.pop(user_id, None)
+            elif not lease.renew():
+                # Expired while we were not looking; someone else may own it now
+                logger.warning(f"Lost the feed lease of user {user_id}; stopping.")
+                del self.feeds[user_id]
+                feed.stop(timeout=const.FEED_STOP_TIMEOUT)
+
+        for user_id in requested - self.feeds.keys():
+            if self.retries.get(user_id, (0, 0))[0] > now:
+                continue
+            lease = RedisLease(
+                self.redis_client,
+                const.websocket_user_lock(user_id),
+                const.FEED_LEASE_TTL,
+                self.owner,
+            )
+            if not lease.acquire():
+                continue
+            feed = self.feed_class(user_id, self.redis_client)
+            feed.start()
+            self.feeds[user_id] = (feed, lease)
+            logger.info(f"Started the feed of user {user_id}.")
+
+    def requested_users(self) -> set:
+        return {
+            int(user_id) for user_id in self.redis_client.smembers(const.FEED_USERS_KEY)
+        }
+
+    def count_session_failure(self, user_id: int, failed: bool) -> bool:
+        """
+        Tracks the feeds of a user that ended without a Breeze session, and
+        withdraws the user's request once there were too many in a row.
+
+        Returns:
+            bool: Whether the feed should be retried.
+        """
+        if not failed:
+            self.session_failures.pop(user_id, None)
+            return True
+        failures = self.session_failures.get(user_id, 0) + 1
+        if failures < const.FEED_MAX_SESSION_FAILURES:
+            self.session_failures[user_id] = failures
+            return True
+        cancel_feed(self.redis_client, user_id)
+        self.session_failures.pop(user_id, None)
+        self.retries.pop(user_id, None)
+        logger.error(
+            f"No Breeze session for the feed of user {user_id} after {failures} "
+            "attempts; dropped it until the feed is requested again."
+        )
+        return False
+
+    def schedule_retry(self, user_id: int, ran_for: float, now: float):
+        _, backoff = self.retries.get(user_id, (0, 0))
+        if ran_for >= const.FEED_RETRY_BACKOFF_MAX:
+            # It was healthy for a while; start over
+            backoff = 0
+        backoff = min(
+            max(backoff * 2, const.FEED_RETRY_BACKOFF), const.FEED_RETRY_BACKOFF_MAX
+        )
+        self.retries[user_id] = (now + backoff, backoff)
+        logger.warning(f"Feed of user {user_id} ended; retrying in {backoff}s.")
+
+    def shutdown(self):
+        for feed, _ in self.feeds.values():
+            feed.stop(timeout=const.FEED_STOP_TIMEOUT)
+        for user_id, (_, lease) in self.feeds.items():
+            try:
+                lease.release()
+            except redis.RedisError as e:
+                logger.warning(
+                    f"Could not release the feed lease of user {user_id}: {e}"
+                )
+        self.feeds.clear()
+        logger.info(f"Feed service {self.owner} stopped.")
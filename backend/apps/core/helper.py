@@ -1,4 +1,7 @@
-from datetime import datetime
+from datetime import UTC, datetime
+
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 
 
 def date_parser(date_obj: datetime) -> str:
@@ -10,3 +13,19 @@ def date_parser(date_obj: datetime) -> str:
     # Convert datetime to string
     formatted_string = date_obj.strftime("%Y-%m-%dT%H:%M:%S.000Z")
     return formatted_string  # Output: 2023-07-01T07:00:00.000Z
+
+
+def parse_timestamp(value: str) -> datetime:
+    """
+    'input': ISO 8601 timestamp or epoch seconds, e.g. from a query parameter
+    'output': timezone-aware datetime; naive timestamps are taken as local time
+    Raises ValueError when the value is neither.
+    """
+    if value.replace(".", "", 1).isdigit():
+        return datetime.fromtimestamp(float(value), tz=UTC)
+    parsed = parse_datetime(value)
+    if parsed is None:
+        raise ValueError(f"Invalid timestamp: {value}")
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
@@ -0,0 +1,73 @@
+# Generated by Django 5.2.18 on 2026-10-18 00:00
+
+from django.db import migrations, models
+from django.db.models import Count
+
+# Collapse duplicate (instrument, date) candles before the unique constraint is
+# added: keep the oldest row, extend its high/low, take the latest close and the
+# largest volume (most duplicates are the same bar re-inserted by a backfill).
+MERGE_DUPLICATE_CANDLES = """
+UPDATE core_candle AS c
+SET high = d.high, low = d.low, close = d.close, volume = d.volume
+FROM (
+    SELECT
+        MIN(id) AS keep_id,
+        MAX(high) AS high,
+        MIN(low) AS low,
+        (ARRAY_AGG(close ORDER BY id DESC))[1] AS close,
+        MAX(volume) AS volume
+    FROM core_candle
+    GROUP BY instrument_id, date
+    HAVING COUNT(*) > 1
+) AS d
+WHERE c.id = d.keep_id;
+
+DELETE FROM core_candle AS c
+USING core_candle AS k
+WHERE c.instrument_id = k.instrument_id
+  AND c.date = k.date
+  AND c.id > k.id;
+"""
+
+
+def merge_duplicate_candles(apps, schema_editor):
+    if schema_editor.connection.vendor == "postgresql":
+        schema_editor.execute(MERGE_DUPLICATE_CANDLES)
+        return
+    # Same merge row by row for other databases
+    Candle = apps.get_model("core", "Candle")
+    duplicates = (
+        Candle.objects.values("instrument_id", "date")
+        .annotate(count=Count("id"))
+        .filter(count__gt=1)
+    )
+    for duplicate in duplicates:
+        keep, *rest = Candle.objects.filter(
+            instrument_id=duplicate["instrument_id"], date=duplicate["date"]
+        ).order_by("id")
+        bars = [keep, *rest]
+        keep.high = max(bar.high for bar in bars)
+        keep.low = min(bar.low for bar in bars)
+        keep.close = rest[-1].close
+        keep.volume = max(
+            (bar.volume for bar in bars if bar.volume is not None), default=None
+        )
+        keep.save(update_fields=["high", "low", "close", "volume"])
+        Candle.objects.filter(id__in=[bar.id for bar in rest]).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0010_alter_candle_options_and_more"),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_candles, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name="candle",
+            constraint=models.UniqueConstraint(
+                fields=("instrument", "date"), name="uniq_candle_instrument_date"
+            ),
+        ),
+    ]
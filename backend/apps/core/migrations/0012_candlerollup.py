@@ -0,0 +1,50 @@
+# Generated by Django 5.2.18 on 2026-10-18 00:08
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0011_candle_unique_instrument_date"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CandleRollup",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("timeframe", models.PositiveSmallIntegerField()),
+                ("date", models.DateTimeField()),
+                ("open", models.FloatField()),
+                ("high", models.FloatField()),
+                ("low", models.FloatField()),
+                ("close", models.FloatField()),
+                ("volume", models.FloatField(null=True)),
+                (
+                    "instrument",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="core.subscribedinstruments",
+                    ),
+                ),
+            ],
+            options={
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("instrument", "timeframe", "date"),
+                        name="uniq_rollup_instr_tf_date",
+                    )
+                ],
+            },
+        ),
+    ]
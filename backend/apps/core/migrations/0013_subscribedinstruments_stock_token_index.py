@@ -0,0 +1,20 @@
+# Generated by Django 5.2.18 on 2026-10-18 00:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0012_candlerollup"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="subscribedinstruments",
+            name="stock_token",
+            field=models.CharField(
+                blank=True, db_index=True, max_length=255, null=True
+            ),
+        ),
+    ]
@@ -0,0 +1,119 @@
+from datetime import datetime
+
+from django.db import migrations
+from pytz import timezone
+
+india_tz = timezone("Asia/Kolkata")
+
+# Rebuild core_candle as a table range partitioned by month of ``date``. The
+# primary key of a partitioned table has to include the partition key, so it
+# becomes (id, date); ``id`` stays unique since it still comes from a single
+# identity sequence. The constraint and index names match the model's, so the
+# ORM and later migrations see the same table.
+CREATE_PARTITIONED = """
+CREATE TABLE core_candle_partitioned (
+    id bigint GENERATED BY DEFAULT AS IDENTITY,
+    open double precision NOT NULL,
+    high double precision NOT NULL,
+    low double precision NOT NULL,
+    close double precision NOT NULL,
+    date timestamp with time zone NOT NULL,
+    is_active boolean NOT NULL,
+    instrument_id bigint NULL,
+    volume double precision NULL,
+    PRIMARY KEY (id, date)
+) PARTITION BY RANGE (date);
+
+CREATE TABLE core_candle_default PARTITION OF core_candle_partitioned DEFAULT;
+"""
+
+CREATE_PLAIN = """
+CREATE TABLE core_candle_plain (
+    id bigint GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+    open double precision NOT NULL,
+    high double precision NOT NULL,
+    low double precision NOT NULL,
+    close double precision NOT NULL,
+    date timestamp with time zone NOT NULL,
+    is_active boolean NOT NULL,
+    instrument_id bigint NULL,
+    volume double precision NULL
+);
+"""
+
+COPY_AND_SWAP = """
+INSERT INTO {new} (id, open, high, low, close, date, is_active, instrument_id, volume)
+SELECT id, open, high, low, close, date, is_active, instrument_id, volume
+FROM core_candle;
+
+SELECT setval(pg_get_serial_sequence('{new}', 'id'), COALESCE(MAX(id), 0) + 1, false)
+FROM {new};
+
+DROP TABLE core_candle;
+ALTER TABLE {new} RENAME TO core_candle;
+ALTER SEQUENCE {new}_id_seq RENAME TO core_candle_id_seq;
+ALTER TABLE core_candle RENAME CONSTRAINT {new}_pkey TO core_candle_pkey;
+
+ALTER TABLE core_candle
+    ADD CONSTRAINT uniq_candle_instrument_date UNIQUE (instrument_id, date);
+ALTER TABLE core_candle
+    ADD CONSTRAINT core_candle_instrument_id_aaa60acb_fk_core_subs
+    FOREIGN KEY (instrument_id) REFERENCES core_subscribedinstruments (id)
+    DEFERRABLE INITIALLY DEFERRED;
+CREATE INDEX core_candle_instrument_id_aaa60acb ON core_candle (instrument_id);
+CREATE INDEX idx_candle_instr_date_desc ON core_candle (instrument_id, date DESC);
+CREATE INDEX brin_candle_date ON core_candle USING brin (date);
+"""
+
+# Months ahead of the current one created up front; `manage.py maintain_candles`
+# keeps creating them from then on.
+MONTHS_AHEAD = 2
+
+
+def add_months(date: datetime, months: int) -> datetime:
+    index = date.year * 12 + date.month - 1 + months
+    return india_tz.localize(datetime(index // 12, index % 12 + 1, 1))
+
+
+def month_range(first: datetime, last: datetime):
+    month = add_months(first, 0)
+    while month <= last:
+        yield month, add_months(month, 1)
+        month = add_months(month, 1)
+
+
+def partition_candles(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    now = datetime.now(india_tz)
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("SELECT MIN(date) FROM core_candle")
+        first = cursor.fetchone()[0]
+    first = (first or now).astimezone(india_tz)
+
+    schema_editor.execute(CREATE_PARTITIONED)
+    for start, end in month_range(first, add_months(now, MONTHS_AHEAD)):
+        schema_editor.execute(
+            f"CREATE TABLE core_candle_p{start:%Y%m} PARTITION OF "
+            f"core_candle_partitioned FOR VALUES FROM (%s) TO (%s)",
+            [start, end],
+        )
+    schema_editor.execute(COPY_AND_SWAP.format(new="core_candle_partitioned"))
+
+
+def unpartition_candles(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute(CREATE_PLAIN)
+    schema_editor.execute(COPY_AND_SWAP.format(new="core_candle_plain"))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0013_subscribedinstruments_stock_token_index"),
+    ]
+
+    operations = [
+        migrations.RunPython(partition_candles, unpartition_candles),
+    ]
@@ -0,0 +1,242 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+from apps.core.models import PriceField
+
+# Rewrite the candle tables in a compact layout: prices as integer paise instead
+# of doubles, volume as bigint, no per-row is_active flag, and the columns
+# ordered widest first so rows carry no alignment padding. A 1-minute candle
+# goes from 96 to 72 bytes per row; indexes duplicating the unique constraints
+# are dropped as well. Django cannot reorder
+# columns, so each table is rebuilt and swapped in, partitions included.
+# `manage.py compact_candles` runs this migration and reports the sizes.
+
+CANDLE_COMPACT = {
+    "columns": """
+        id bigint GENERATED BY DEFAULT AS IDENTITY,
+        date timestamp with time zone NOT NULL,
+        instrument_id bigint NULL,
+        volume bigint NULL,
+        open integer NOT NULL,
+        high integer NOT NULL,
+        low integer NOT NULL,
+        close integer NOT NULL
+    """,
+    "select": """
+        id, date, instrument_id, ROUND(volume)::bigint,
+        ROUND(open * 100)::integer, ROUND(high * 100)::integer,
+        ROUND(low * 100)::integer, ROUND(close * 100)::integer
+    """,
+}
+
+CANDLE_EXPANDED = {
+    "columns": """
+        id bigint GENERATED BY DEFAULT AS IDENTITY,
+        open double precision NOT NULL,
+        high double precision NOT NULL,
+        low double precision NOT NULL,
+        close double precision NOT NULL,
+        date timestamp with time zone NOT NULL,
+        is_active boolean NOT NULL,
+        instrument_id bigint NULL,
+        volume double precision NULL
+    """,
+    "select": """
+        id, open / 100.0, high / 100.0, low / 100.0, close / 100.0, date, TRUE,
+        instrument_id, volume
+    """,
+}
+
+CANDLE_CONSTRAINTS = """
+ALTER TABLE core_candle ADD CONSTRAINT core_candle_pkey PRIMARY KEY (id, date);
+ALTER TABLE core_candle
+    ADD CONSTRAINT uniq_candle_instrument_date UNIQUE (instrument_id, date);
+ALTER TABLE core_candle
+    ADD CONSTRAINT core_candle_instrument_id_aaa60acb_fk_core_subs
+    FOREIGN KEY (instrument_id) REFERENCES core_subscribedinstruments (id)
+    DEFERRABLE INITIALLY DEFERRED;
+CREATE INDEX brin_candle_date ON core_candle USING brin (date);
+"""
+
+# Duplicates of the unique (instrument_id, date) index, which Postgres scans
+# backwards just as well; only the expanded layout has them.
+CANDLE_REDUNDANT_INDEXES = """
+CREATE INDEX core_candle_instrument_id_aaa60acb ON core_candle (instrument_id);
+CREATE INDEX idx_candle_instr_date_desc ON core_candle (instrument_id, date DESC);
+"""
+
+ROLLUP_COMPACT = {
+    "columns": """
+        id bigint GENERATED BY DEFAULT AS IDENTITY,
+        date timestamp with time zone NOT NULL,
+        instrument_id bigint NOT NULL,
+        volume bigint NULL,
+        open integer NOT NULL,
+        high integer NOT NULL,
+        low integer NOT NULL,
+        close integer NOT NULL,
+        timeframe smallint NOT NULL
+    """,
+    "select": """
+        id, date, instrument_id, ROUND(volume)::bigint,
+        ROUND(open * 100)::integer, ROUND(high * 100)::integer,
+        ROUND(low * 100)::integer, ROUND(close * 100)::integer, timeframe
+    """,
+}
+
+ROLLUP_EXPANDED = {
+    "columns": """
+        id bigint GENERATED BY DEFAULT AS IDENTITY,
+        timeframe smallint NOT NULL,
+        date timestamp with time zone NOT NULL,
+        open double precision NOT NULL,
+        high double precision NOT NULL,
+        low double precision NOT NULL,
+        close double precision NOT NULL,
+        volume double precision NULL,
+        instrument_id bigint NOT NULL
+    """,
+    "select": """
+        id, timeframe, date, open / 100.0, high / 100.0, low / 100.0,
+        close / 100.0, volume, instrument_id
+    """,
+}
+
+ROLLUP_CONSTRAINTS = """
+ALTER TABLE core_candlerollup ADD CONSTRAINT core_candlerollup_pkey PRIMARY KEY (id);
+ALTER TABLE core_candlerollup
+    ADD CONSTRAINT core_candlerollup_timeframe_check CHECK (timeframe >= 0);
+ALTER TABLE core_candlerollup
+    ADD CONSTRAINT uniq_rollup_instr_tf_date UNIQUE (instrument_id, timeframe, date);
+ALTER TABLE core_candlerollup
+    ADD CONSTRAINT core_candlerollup_instrument_id_74b6ac66_fk_core_subs
+    FOREIGN KEY (instrument_id) REFERENCES core_subscribedinstruments (id)
+    DEFERRABLE INITIALLY DEFERRED;
+"""
+
+ROLLUP_REDUNDANT_INDEXES = """
+CREATE INDEX core_candlerollup_instrument_id_74b6ac66
+    ON core_candlerollup (instrument_id);
+"""
+
+
+def rebuild_table(schema_editor, table: str, layout: dict, constraints: str):
+    """
+    Copies ``table`` into a new one with the given columns, keeping its
+    partitions, and swaps it in. Constraints and indexes are added once the
+    rows are in, under the names the models expect.
+    """
+    new = f"{table}_rebuilt"
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT c.relname, pg_get_expr(c.relpartbound, c.oid) FROM pg_inherits i "
+            "JOIN pg_class c ON c.oid = i.inhrelid WHERE i.inhparent = %s::regclass",
+            [table],
+        )
+        partitions = cursor.fetchall()
+        cursor.execute(
+            "SELECT relkind = 'p' FROM pg_class WHERE oid = %s::regclass", [table]
+        )
+        partitioned = cursor.fetchone()[0]
+
+    suffix = " PARTITION BY RANGE (date)" if partitioned else ""
+    schema_editor.execute(f"CREATE TABLE {new} ({layout['columns']}){suffix}")
+    for name, bound in partitions:
+        schema_editor.execute(
+            f"CREATE TABLE {name}_rebuilt PARTITION OF {new} {bound}"
+        )
+    schema_editor.execute(
+        f"INSERT INTO {new} SELECT {layout['select']} FROM {table}"
+    )
+    schema_editor.execute(
+        f"SELECT setval(pg_get_serial_sequence('{new}', 'id'), "
+        f"COALESCE(MAX(id), 0) + 1, false) FROM {new}"
+    )
+    schema_editor.execute(f"DROP TABLE {table}")
+    schema_editor.execute(f"ALTER TABLE {new} RENAME TO {table}")
+    schema_editor.execute(f"ALTER SEQUENCE {new}_id_seq RENAME TO {table}_id_seq")
+    for name, _ in partitions:
+        schema_editor.execute(f"ALTER TABLE {name}_rebuilt RENAME TO {name}")
+    schema_editor.execute(constraints)
+
+
+def compact(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    rebuild_table(schema_editor, "core_candle", CANDLE_COMPACT, CANDLE_CONSTRAINTS)
+    rebuild_table(
+        schema_editor, "core_candlerollup", ROLLUP_COMPACT, ROLLUP_CONSTRAINTS
+    )
+
+
+def expand(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    rebuild_table(
+        schema_editor,
+        "core_candle",
+        CANDLE_EXPANDED,
+        CANDLE_CONSTRAINTS + CANDLE_REDUNDANT_INDEXES,
+    )
+    rebuild_table(
+        schema_editor,
+        "core_candlerollup",
+        ROLLUP_EXPANDED,
+        ROLLUP_CONSTRAINTS + ROLLUP_REDUNDANT_INDEXES,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0014_partition_candle"),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            database_operations=[migrations.RunPython(compact, expand)],
+            state_operations=[
+                migrations.RemoveField(model_name="candle", name="is_active"),
+                migrations.RemoveIndex(
+                    model_name="candle", name="idx_candle_instr_date_desc"
+                ),
+                migrations.AlterField(
+                    model_name="candle",
+                    name="instrument",
+                    field=models.ForeignKey(
+                        blank=True,
+                        db_index=False,
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="core.subscribedinstruments",
+                    ),
+                ),
+                migrations.AlterField(
+                    model_name="candlerollup",
+                    name="instrument",
+                    field=models.ForeignKey(
+                        db_index=False,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="core.subscribedinstruments",
+                    ),
+                ),
+                *(
+                    migrations.AlterField(
+                        model_name=model_name,
+                        name=name,
+                        field=PriceField(),
+                    )
+                    for model_name in ("candle", "candlerollup")
+                    for name in ("open", "high", "low", "close")
+                ),
+                *(
+                    migrations.AlterField(
+                        model_name=model_name,
+                        name="volume",
+                        field=models.BigIntegerField(null=True),
+                    )
+                    for model_name in ("candle", "candlerollup")
+                ),
+            ],
+        ),
+    ]
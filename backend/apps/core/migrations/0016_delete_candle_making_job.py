@@ -0,0 +1,28 @@
+from django.db import migrations
+from django.utils import timezone
+
+# "candle_making_job" was dropped from the static beat schedule when live candles
+# moved in-process, but beat runs with the DatabaseScheduler, which copies that
+# schedule into PeriodicTask rows and never removes them. Delete the row so beat
+# stops queueing candle_maker, and bump PeriodicTasks so a running beat reloads.
+
+
+def delete_candle_making_job(apps, schema_editor):
+    PeriodicTask = apps.get_model("django_celery_beat", "PeriodicTask")
+    PeriodicTasks = apps.get_model("django_celery_beat", "PeriodicTasks")
+    if PeriodicTask.objects.filter(name="candle_making_job").delete()[0]:
+        PeriodicTasks.objects.update_or_create(
+            ident=1, defaults={"last_update": timezone.now()}
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0015_compact_candle_storage"),
+        ("django_celery_beat", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.RunPython(delete_candle_making_job, migrations.RunPython.noop),
+    ]
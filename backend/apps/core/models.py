@@ -1,7 +1,12 @@
+from datetime import UTC, datetime
+
 from django.contrib.postgres.indexes import BrinIndex
-from django.db import models
+from django.db import connections, models
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 
 from apps.account.models import User
+from main import const
 
 # Create your models here.
 
@@ -63,7 +68,7 @@ class Instrument(models.Model):
 
 class SubscribedInstruments(models.Model):
     exchange = models.ForeignKey(Exchanges, on_delete=models.CASCADE)
-    stock_token = models.CharField(blank=True, null=True, max_length=255)
+    stock_token = models.CharField(blank=True, null=True, max_length=255, db_index=True)
     token = models.CharField(blank=True, null=True, max_length=255)
     instrument = models.CharField(null=True, blank=True, max_length=255)
     short_name = models.CharField(blank=True, null=True, max_length=255)
@@ -121,28 +126,205 @@ class Tick(models.Model):
         )
 
 
+class PriceField(models.FloatField):
+    """
+    A price stored as a whole number of paise in a 4-byte integer column, half
+    the size of a double and exact to the paisa; read and written as rupees.
+    """
+
+    def db_type(self, connection):
+        return connection.data_types["IntegerField"]
+
+    def get_prep_value(self, value):
+        value = super().get_prep_value(value)
+        return None if value is None else round(value * const.PRICE_SCALE)
+
+    def from_db_value(self, value, expression, connection):
+        return None if value is None else value / const.PRICE_SCALE
+
+
+class OHLCVQuerySet(models.QuerySet):
+    """
+    Bulk upserts for tables of OHLCV bars identified by ``key_columns``.
+    """
+
+    key_columns = ("instrument_id", "date")
+
+    def bulk_upsert(
+        self,
+        rows: list,
+        replace: bool = False,
+        batch_size: int = const.CANDLE_UPSERT_BATCH_SIZE,
+        returning: bool = False,
+    ) -> int | list:
+        """
+        Writes bars with ``INSERT ... ON CONFLICT (<key columns>) DO UPDATE``,
+        one statement per batch.
+
+        By default bars are merged into existing rows on the server: the stored
+        open is kept, high/low are extended, the close is replaced and the volume
+        is added, which suits live bars carrying the volume traded since their last
+        write. With ``replace=True`` the incoming bar overwrites the stored one,
+        which suits authoritative historical data being re-fetched.
+
+        Args:
+            rows (list): Tuples of the key columns followed by
+                ``open, high, low, close, volume``.
+            replace (bool, optional): Overwrite instead of merging. Defaults to False.
+            batch_size (int, optional): Maximum number of rows per statement.
+            returning (bool, optional): Return the rows as stored after the
+                merge, via ``RETURNING``. Defaults to False.
+
+        Returns:
+            int | list: The number of distinct bars written, or with
+            ``returning=True`` the stored rows in the shape of ``rows``.
+        """
+        bars = _combine_rows(rows, replace)
+        if not bars:
+            return [] if returning else 0
+
+        connection = connections[self.db]
+        qn = connection.ops.quote_name
+        table = qn(self.model._meta.db_table)
+        columns = [
+            *self.key_columns,
+            "open",
+            "high",
+            "low",
+            "close",
+            "volume",
+        ]
+        if replace:
+            assignments = [
+                f"{qn(column)} = EXCLUDED.{qn(column)}"
+                for column in ("open", "high", "low", "close", "volume")
+            ]
+        else:
+            greatest, least = (
+                ("GREATEST", "LEAST")
+                if connection.vendor == "postgresql"
+                else ("MAX", "MIN")
+            )
+            high, low, close, volume = (
+                qn(column) for column in ("high", "low", "close", "volume")
+            )
+            assignments = [
+                f"{high} = {greatest}({table}.{high}, EXCLUDED.{high})",
+                f"{low} = {least}({table}.{low}, EXCLUDED.{low})",
+                f"{close} = EXCLUDED.{close}",
+                f"{volume} = COALESCE({table}.{volume}, 0)"
+                f" + COALESCE(EXCLUDED.{volume}, 0)",
+            ]
+
+        # Prepared like the ORM would, e.g. prices scaled to paise
+        fields = [self.model._meta.get_field(column) for column in columns]
+        values = [
+            tuple(
+                field.get_db_prep_save(value, connection)
+                for field, value in zip(fields, (*key, *bar), strict=True)
+            )
+            for key, bar in bars
+        ]
+        batch_size = max(
+            min(batch_size, connection.ops.bulk_batch_size(columns, values)), 1
+        )
+        row_sql = "(" + ", ".join(["%s"] * len(columns)) + ")"
+        conflict = ", ".join(qn(column) for column in self.key_columns)
+        suffix = f" RETURNING {', '.join(qn(c) for c in columns)}" if returning else ""
+        stored = []
+        with connection.cursor() as cursor:
+            for start in range(0, len(values), batch_size):
+                batch = values[start : start + batch_size]
+                cursor.execute(
+                    f"INSERT INTO {table} ({', '.join(qn(c) for c in columns)}) "
+                    f"VALUES {', '.join([row_sql] * len(batch))} "
+                    f"ON CONFLICT ({conflict}) "
+                    f"DO UPDATE SET {', '.join(assignments)}{suffix}",
+                    [param for row in batch for param in row],
+                )
+                if returning:
+                    stored.extend(cursor.fetchall())
+        if not returning:
+            return len(values)
+
+        converters = [getattr(field, "from_db_value", None) for field in fields]
+        date_index = len(self.key_columns) - 1
+        rows = []
+        for row in stored:
+            row = [
+                convert(value, None, connection) if convert else value
+                for value, convert in zip(row, converters, strict=True)
+            ]
+            row[date_index] = _returned_datetime(row[date_index])
+            rows.append(tuple(row))
+        return rows
+
+
+class CandleRollupQuerySet(OHLCVQuerySet):
+    key_columns = ("instrument_id", "timeframe", "date")
+
+
+def _returned_datetime(value) -> datetime:
+    """
+    Normalises a datetime read by a raw cursor: SQLite hands back naive UTC
+    strings, Postgres aware datetimes.
+    """
+    if isinstance(value, str):
+        value = parse_datetime(value)
+    if timezone.is_naive(value):
+        value = timezone.make_aware(value, UTC)
+    return value
+
+
+def _combine_rows(rows: list, replace: bool) -> list:
+    """
+    Collapses rows sharing a key, since a single ``ON CONFLICT DO UPDATE``
+    statement may not touch the same row twice. The last row wins when
+    replacing; otherwise rows are merged like ticks.
+    """
+    bars = {}
+    for row in rows:
+        key = row[:-5]
+        open_, high, low, close, volume = row[-5:]
+        bar = bars.get(key)
+        if bar is None or replace:
+            bars[key] = [open_, high, low, close, volume or 0]
+        else:
+            bar[1] = max(bar[1], high)
+            bar[2] = min(bar[2], low)
+            bar[3] = close
+            bar[4] += volume or 0
+    return list(bars.items())
+
+
 class Candle(models.Model):
+    # Fields are ordered widest first, which is also the column order of the
+    # table: the row has no alignment padding (see migration 0015).
+    date = models.DateTimeField(null=False)
+    # Served by the unique constraint's (instrument, date) index, which is also
+    # scanned backwards for "latest first" reads
     instrument = models.ForeignKey(
-        SubscribedInstruments, on_delete=models.CASCADE, null=True, blank=True
+        SubscribedInstruments,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        db_index=False,
     )
-    open = models.FloatField(null=False)
-    high = models.FloatField(null=False)
-    low = models.FloatField(null=False)
-    close = models.FloatField(null=False)
-    volume = models.FloatField(null=True)
-    date = models.DateTimeField(null=False)
-    is_active = models.BooleanField(default=True)
+    volume = models.BigIntegerField(null=True)
+    open = PriceField(null=False)
+    high = PriceField(null=False)
+    low = PriceField(null=False)
+    close = PriceField(null=False)
+
+    objects = OHLCVQuerySet.as_manager()
 
     class Meta:
-        indexes = [
-            # Fast point/range look‑ups + ORDER BY on the B‑tree
-            models.Index(
-                fields=[
-                    "instrument",
-                    "-date",
-                ],  # DESC so “latest first” scans are sequential
-                name="idx_candle_instr_date_desc",
+        constraints = [
+            models.UniqueConstraint(
+                fields=["instrument", "date"], name="uniq_candle_instrument_date"
             ),
+        ]
+        indexes = [
             # Optional: ultra‑cheap BRIN for big historical range scans
             BrinIndex(
                 fields=["date"],
@@ -167,6 +349,39 @@ class Candle(models.Model):
         )
 
 
+class CandleRollup(models.Model):
+    """
+    Pre-aggregated candles of the higher timeframes, kept in step with ``Candle``
+    so charts do not re-aggregate the 1-minute history on every request. The
+    unique constraint's (instrument, timeframe, date) index serves the
+    newest-first chart scans.
+    """
+
+    date = models.DateTimeField()
+    instrument = models.ForeignKey(
+        SubscribedInstruments, on_delete=models.CASCADE, db_index=False
+    )
+    volume = models.BigIntegerField(null=True)
+    open = PriceField()
+    high = PriceField()
+    low = PriceField()
+    close = PriceField()
+    timeframe = models.PositiveSmallIntegerField()  # minutes
+
+    objects = CandleRollupQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["instrument", "timeframe", "date"],
+                name="uniq_rollup_instr_tf_date",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.timeframe}m {self.date} o:{self.open} h:{self.high} l:{self.low} c:{self.close}"
+
+
 class Percentage(models.Model):
     source = models.CharField(blank=True, null=True, max_length=255)
     value = models.FloatField(blank=True, null=True)
@@ -1,5 +1,11 @@
-from rest_framework.pagination import LimitOffsetPagination
+from datetime import datetime
+
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import BasePagination, LimitOffsetPagination
 from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from apps.core.helper import parse_timestamp
 
 
 class OffsetPagination(LimitOffsetPagination):
@@ -20,3 +26,98 @@ class OffsetPagination(LimitOffsetPagination):
 class CandleBucketPagination(LimitOffsetPagination):
     default_limit = 100
     max_limit = 1000
+
+
+class CandleKeysetPagination(BasePagination):
+    """
+    Pages candle buckets newest first by seeking on their date instead of
+    skipping an offset, so deep pages cost the same as the first one and bars
+    inserted meanwhile do not shift the pages.
+
+    ``before`` (an ISO 8601 timestamp or epoch seconds) returns the buckets older
+    than it; the ``next`` link carries the oldest bucket of the page. The total
+    is only counted when ``count=true`` is passed.
+    """
+
+    default_limit = 100
+    max_limit = 1000
+    limit_query_param = "limit"
+    cursor_query_param = "before"
+    count_query_param = "count"
+    # Field filtered on, and the name it is returned under
+    cursor_field = "date"
+    cursor_alias = "bucket"
+    count = None
+
+    def paginate_queryset(self, queryset, request, view=None):
+        before = self.get_before(request)
+
+        if request.query_params.get(self.count_query_param) in ("1", "true"):
+            self.count = queryset.count()
+
+        if before is not None:
+            queryset = queryset.filter(**{f"{self.cursor_field}__lt": before})
+        limit = self.get_limit(request)
+        return self.paginate_rows(list(queryset[: limit + 1]), request)
+
+    def paginate_rows(self, rows: list, request) -> list:
+        """
+        Pages rows that were already fetched newest first, with up to one row
+        beyond the limit telling whether an older page exists. Lets the first
+        page come from a cache instead of the queryset.
+        """
+        self.request = request
+        self.limit = self.get_limit(request)
+        self.next_before = None
+        if len(rows) > self.limit:
+            rows = rows[: self.limit]
+            self.next_before = rows[-1][self.cursor_alias]
+        return rows
+
+    def is_first_page(self, request) -> bool:
+        """
+        Whether the request asks for the newest page without a total.
+        """
+        params = request.query_params
+        return not params.get(self.cursor_query_param) and params.get(
+            self.count_query_param
+        ) not in ("1", "true")
+
+    def get_limit(self, request) -> int:
+        try:
+            limit = int(request.query_params[self.limit_query_param])
+        except (KeyError, ValueError):
+            return self.default_limit
+        return min(max(limit, 1), self.max_limit)
+
+    def get_before(self, request) -> datetime | None:
+        value = request.query_params.get(self.cursor_query_param)
+        if not value:
+            return None
+        try:
+            return parse_timestamp(value)
+        except (ValueError, OverflowError) as e:
+            raise ValidationError(
+                {self.cursor_query_param: "Invalid timestamp."}
+            ) from e
+
+    def get_next_link(self) -> str | None:
+        if self.next_before is None:
+            return None
+        url = self.request.build_absolute_uri()
+        # The total does not change between pages; only the first one counts it
+        url = remove_query_param(url, self.count_query_param)
+        return replace_query_param(
+            url, self.cursor_query_param, self.next_before.isoformat()
+        )
+
+    def get_paginated_response(self, data):
+        return Response(
+            {
+                "next": self.get_next_link(),
+                "previous": None,
+                "before": (self.next_before.isoformat() if self.next_before else None),
+                "count": self.count,
+                "results": data,
+            }
+        )
@@ -0,0 +1,155 @@
+from datetime import datetime
+import logging
+import re
+
+from django.db import connection, transaction
+from pytz import timezone
+
+from apps.core.models import Candle
+from main import const
+
+logger = logging.getLogger(__name__)
+
+india_tz = timezone("Asia/Kolkata")
+
+# On Postgres ``core_candle`` is range partitioned by month of ``date`` (see
+# migration 0014): one ``core_candle_pYYYYMM`` table per month plus a default
+# partition catching bars outside of them, e.g. from backfills of old ranges.
+TABLE = Candle._meta.db_table
+DEFAULT_PARTITION = f"{TABLE}_default"
+PARTITION_PATTERN = re.compile(rf"^{TABLE}_p(\d{{4}})(\d{{2}})$")
+
+
+def month_start(date: datetime) -> datetime:
+    """
+    The start of the month containing ``date``, at midnight India time.
+    """
+    date = date.astimezone(india_tz)
+    return india_tz.localize(datetime(date.year, date.month, 1))
+
+
+def add_months(month: datetime, months: int) -> datetime:
+    index = month.year * 12 + month.month - 1 + months
+    return india_tz.localize(datetime(index // 12, index % 12 + 1, 1))
+
+
+def partition_name(month: datetime) -> str:
+    return f"{TABLE}_p{month:%Y%m}"
+
+
+def is_partitioned() -> bool:
+    if connection.vendor != "postgresql":
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT relkind FROM pg_class WHERE oid = to_regclass(%s)", [TABLE]
+        )
+        row = cursor.fetchone()
+    return row is not None and row[0] == "p"
+
+
+def existing_partitions() -> dict:
+    """
+    Maps the start of every month with a partition to the partition's name.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT c.relname FROM pg_inherits i "
+            "JOIN pg_class c ON c.oid = i.inhrelid "
+            "WHERE i.inhparent = to_regclass(%s)",
+            [TABLE],
+        )
+        names = [row[0] for row in cursor.fetchall()]
+    partitions = {}
+    for name in names:
+        match = PARTITION_PATTERN.match(name)
+        if match:
+            year, month = map(int, match.groups())
+            partitions[india_tz.localize(datetime(year, month, 1))] = name
+    return partitions
+
+
+def create_partition(month: datetime) -> str:
+    """
+    Creates the partition of ``month``. Bars of that month already sitting in
+    the default partition are moved into it first, since Postgres refuses to
+    attach a range the default partition has rows for.
+    """
+    name = partition_name(month)
+    qn = connection.ops.quote_name
+    table, default, partition = qn(TABLE), qn(DEFAULT_PARTITION), qn(name)
+    bounds = [month, add_months(month, 1)]
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f"CREATE TABLE {partition} (LIKE {table} INCLUDING DEFAULTS)")
+        cursor.execute(
+            f"WITH moved AS (DELETE FROM {default} "
+            f"WHERE date >= %s AND date < %s RETURNING *) "
+            f"INSERT INTO {partition} SELECT * FROM moved",
+            bounds,
+        )
+        moved = cursor.rowcount
+        cursor.execute(
+            f"ALTER TABLE {table} ATTACH PARTITION {partition} "
+            f"FOR VALUES FROM (%s) TO (%s)",
+            bounds,
+        )
+    logger.info(f"Created candle partition {name}; moved {moved} bars into it.")
+    return name
+
+
+def ensure_partitions(
+    months_ahead: int = const.CANDLE_PARTITION_MONTHS_AHEAD,
+    now: datetime | None = None,
+) -> list:
+    """
+    Creates the partitions of the current month and the next ``months_ahead``
+    ones, plus those of months whose bars landed in the default partition.
+
+    Returns:
+        list: The names of the created partitions.
+    """
+    if not is_partitioned():
+        return []
+    current = month_start(now or datetime.now(india_tz))
+    months = {add_months(current, offset) for offset in range(months_ahead + 1)}
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT DISTINCT date_trunc('month', date AT TIME ZONE %s) "
+            f"FROM {connection.ops.quote_name(DEFAULT_PARTITION)}",
+            [india_tz.zone],
+        )
+        months.update(india_tz.localize(row[0]) for row in cursor.fetchall())
+
+    existing = existing_partitions()
+    return [
+        create_partition(month) for month in sorted(months) if month not in existing
+    ]
+
+
+def drop_partitions_before(cutoff: datetime, before_drop=None) -> list:
+    """
+    Detaches and drops the partitions of the months ending at or before
+    ``cutoff``, oldest first. Old bars in the default partition are left alone.
+
+    Args:
+        cutoff (datetime): Bars older than this are dropped.
+        before_drop (callable, optional): Called with the ``(start, end)`` range of
+            every partition before it is dropped, e.g. to downsample its bars.
+
+    Returns:
+        list: The names of the dropped partitions.
+    """
+    qn = connection.ops.quote_name
+    dropped = []
+    for month, name in sorted(existing_partitions().items()):
+        end = add_months(month, 1)
+        if end > cutoff:
+            break
+        if before_drop is not None:
+            before_drop(month, end)
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(f"ALTER TABLE {qn(TABLE)} DETACH PARTITION {qn(name)}")
+            cursor.execute(f"DROP TABLE {qn(name)}")
+        logger.info(f"Dropped candle partition {name}.")
+        dropped.append(name)
+    return dropped
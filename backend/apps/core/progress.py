@@ -0,0 +1,164 @@
+import logging
+import time
+
+import redis
+
+from apps.core.models import PercentageInstrument
+from main import const, utils
+
+logger = logging.getLogger(__name__)
+
+# Backfill progress lives in one Redis hash per instrument, updated with atomic
+# increments by the fetcher and the batch writer. Only the final state reaches
+# the database, when the backfill completes.
+COUNTERS = ("chunks_total", "chunks_done", "chunks_failed", "rows")
+
+
+def _client() -> redis.Redis | None:
+    try:
+        return utils.get_redis_client("default")
+    except ValueError:
+        # Not running against Redis (tests, local settings)
+        return None
+
+
+def start_backfill_progress(
+    instrument_id: int, chunks: int, client: redis.Redis | None = None
+) -> None:
+    """
+    Resets the progress of an instrument's backfill about to request ``chunks``
+    chunks.
+    """
+    client = client or _client()
+    if client is None:
+        return
+    key = const.backfill_progress_key(instrument_id)
+    now = time.time()
+    try:
+        pipe = client.pipeline()
+        pipe.delete(key)
+        pipe.hset(
+            key,
+            mapping={
+                "chunks_total": chunks,
+                "chunks_done": 0,
+                "chunks_failed": 0,
+                "rows": 0,
+                "started": now,
+                "updated": now,
+            },
+        )
+        pipe.expire(key, const.BACKFILL_PROGRESS_TTL)
+        pipe.execute()
+    except redis.RedisError as e:
+        logger.warning(
+            f"Could not start the progress of instrument ID {instrument_id}: {e}"
+        )
+
+
+def record_backfill_progress(
+    instrument_id: int,
+    chunks: int = 0,
+    failed: int = 0,
+    rows: int = 0,
+    client: redis.Redis | None = None,
+) -> None:
+    """
+    Adds fetched ``chunks``, ``failed`` ones and written ``rows`` to an
+    instrument's backfill progress.
+    """
+    client = client or _client()
+    if client is None:
+        return
+    key = const.backfill_progress_key(instrument_id)
+    try:
+        pipe = client.pipeline()
+        if chunks:
+            pipe.hincrby(key, "chunks_done", chunks)
+        if failed:
+            pipe.hincrby(key, "chunks_failed", failed)
+        if rows:
+            pipe.hincrby(key, "rows", rows)
+        pipe.hset(key, "updated", time.time())
+        pipe.expire(key, const.BACKFILL_PROGRESS_TTL)
+        pipe.execute()
+    except redis.RedisError as e:
+        logger.warning(
+            f"Could not record the progress of instrument ID {instrument_id}: {e}"
+        )
+
+
+def _summary(values: dict, now: float) -> dict:
+    counters = {name: int(values.get(name, 0)) for name in COUNTERS}
+    total = counters["chunks_total"]
+    done = counters["chunks_done"] + counters["chunks_failed"]
+    elapsed = now - float(values.get("started", now))
+    remaining = total - done
+    counters["percentage"] = round(done / total * 100, 1) if total else 100.0
+    # Chunks run a few at a time at a steady rate, so the mean so far holds
+    counters["eta"] = round(elapsed / done * remaining) if done and remaining else None
+    return counters
+
+
+def backfill_progress(instrument_ids, client: redis.Redis | None = None) -> dict:
+    """
+    Reads the backfill progress of several instruments in one round trip.
+
+    Returns:
+        dict: Maps instrument IDs with a backfill in progress to their
+        ``chunks_total``, ``chunks_done``, ``chunks_failed``, ``rows``,
+        ``percentage`` and ``eta`` (seconds, None until a chunk is done).
+    """
+    instrument_ids = list(instrument_ids)
+    client = client or _client()
+    if client is None or not instrument_ids:
+        return {}
+    try:
+        pipe = client.pipeline(transaction=False)
+        for instrument_id in instrument_ids:
+            pipe.hgetall(const.backfill_progress_key(instrument_id))
+        hashes = pipe.execute()
+    except redis.RedisError as e:
+        logger.warning(f"Could not read the backfill progress: {e}")
+        return {}
+
+    now = time.time()
+    return {
+        instrument_id: _summary(
+            {
+                (name.decode() if isinstance(name, bytes) else name): value
+                for name, value in values.items()
+            },
+            now,
+        )
+        for instrument_id, values in zip(instrument_ids, hashes, strict=True)
+        if values
+    }
+
+
+def finish_backfill_progress(
+    instrument_id: int, failed: bool = False, client: redis.Redis | None = None
+) -> None:
+    """
+    Marks an instrument's backfill as over in the database and drops its
+    counters. A ``failed`` backfill keeps the percentage it reached instead of
+    100, so it is no longer shown as loading without claiming to be complete.
+    """
+    client = client or _client()
+    percentage = 100
+    if failed:
+        progress = backfill_progress([instrument_id], client=client)
+        percentage = progress.get(instrument_id, {}).get("percentage")
+
+    updates = {"is_loading": True}
+    if percentage is not None:
+        updates["percentage"] = percentage
+    PercentageInstrument.objects.filter(instrument_id=instrument_id).update(**updates)
+    if client is None:
+        return
+    try:
+        client.delete(const.backfill_progress_key(instrument_id))
+    except redis.RedisError as e:
+        logger.warning(
+            f"Could not clear the progress of instrument ID {instrument_id}: {e}"
+        )
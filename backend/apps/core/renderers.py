@@ -0,0 +1,119 @@
+from array import array
+import json
+import math
+import struct
+import sys
+
+from django.utils import timezone
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.settings import api_settings
+
+
+def candle_columns(rows) -> dict:
+    """
+    Transposes aggregated candle rows (as returned by ``stored_candles_qs`` or
+    ``resample_qs``) into one list per field, with dates as epoch seconds.
+    """
+    columns = {"t": [], "o": [], "h": [], "l": [], "c": [], "v": []}
+    t, o, h, l_, c, v = columns.values()
+    for row in rows:
+        t.append(int(row["bucket"].timestamp()))
+        o.append(row["o"])
+        h.append(row["h_"])
+        l_.append(row["l_"])
+        c.append(row["c"])
+        v.append(row["v_"])
+    return columns
+
+
+def stream_candle_rows(rows, chunk_size: int):
+    """
+    Encodes aggregated candle rows as ``{"msg": "done", "data": [...]}`` JSON,
+    yielding one piece per ``chunk_size`` rows so the whole series never sits in
+    memory. Bars look like ``CandleSerializer`` output.
+    """
+    yield '{"msg": "done", "data": ['
+    separator = ""
+    batch = []
+    for row in rows:
+        batch.append(
+            {
+                "open": row["o"],
+                "high": row["h_"],
+                "low": row["l_"],
+                "close": row["c"],
+                "volume": row["v_"],
+                "date": timezone.localtime(row["bucket"]).isoformat(),
+            }
+        )
+        if len(batch) >= chunk_size:
+            yield separator + json.dumps(batch)[1:-1]
+            separator = ","
+            batch = []
+    if batch:
+        yield separator + json.dumps(batch)[1:-1]
+    yield "]}"
+
+
+class ColumnarCandleRenderer(JSONRenderer):
+    """
+    JSON with the candles as columns, ``{t: [...], o: [...], ...}``, instead of
+    one object per bar. Selected with ``?format=columnar`` or its media type.
+    """
+
+    media_type = "application/vnd.candles.columnar+json"
+    format = "columnar"
+
+
+class PackedCandleRenderer(BaseRenderer):
+    """
+    Candle columns as little-endian arrays: a uint32 bar count ``n``, ``n``
+    int64 epoch seconds, then ``n`` float64 values for each of open, high, low,
+    close and volume (NaN when unknown). Pagination details travel in the
+    ``X-Next-Cursor``, ``X-Next`` and ``X-Total-Count`` headers. Selected with
+    ``?format=packed`` or its media type.
+    """
+
+    media_type = "application/vnd.candles.packed"
+    format = "packed"
+    charset = None
+    render_style = "binary"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        response = (renderer_context or {}).get("response")
+        columns = data.get("results") if isinstance(data, dict) else None
+        if not isinstance(columns, dict):
+            # Errors are not candles; send them as plain JSON
+            if response is not None:
+                response["Content-Type"] = "application/json"
+            return JSONRenderer().render(data, renderer_context=renderer_context)
+
+        if response is not None:
+            for header, key in (
+                ("X-Next-Cursor", "before"),
+                ("X-Next", "next"),
+                ("X-Total-Count", "count"),
+            ):
+                if data.get(key) is not None:
+                    response[header] = str(data[key])
+
+        times = array("q", columns["t"])
+        values = [
+            array("d", (math.nan if value is None else value for value in columns[key]))
+            for key in ("o", "h", "l", "c", "v")
+        ]
+        if sys.byteorder == "big":
+            for packed in (times, *values):
+                packed.byteswap()
+        return b"".join(
+            [struct.pack("<I", len(times)), times.tobytes()]
+            + [packed.tobytes() for packed in values]
+        )
+
+
+CANDLE_RENDERER_CLASSES = [
+    *api_settings.DEFAULT_RENDERER_CLASSES,
+    ColumnarCandleRenderer,
+    PackedCandleRenderer,
+]
+CANDLE_COLUMN_FORMATS = {ColumnarCandleRenderer.format, PackedCandleRenderer.format}
@@ -0,0 +1,144 @@
+from datetime import datetime
+from operator import itemgetter
+import re
+
+import numpy as np
+
+from apps.core.trading_calendar import TradingCalendar, get_calendar
+
+SECONDS_PER_DAY = 86400
+IST_OFFSET = 19800  # +05:30
+
+UTC_OFFSET = re.compile(r"^(?:Z|([+-])(\d{2}):(\d{2}))$")
+
+
+def epoch_seconds(dates: list) -> np.ndarray:
+    """
+    Converts ISO 8601 strings to int64 epoch seconds.
+
+    Serialized candles share a single UTC offset, so the local part is parsed
+    by NumPy in one call and the offset applied once; anything else goes
+    through ``datetime.fromisoformat`` row by row.
+    """
+    offsets = {date[19:] for date in dates}
+    match = UTC_OFFSET.match(offsets.pop()) if len(offsets) == 1 else None
+    if match is None:
+        return np.fromiter(
+            (int(datetime.fromisoformat(date).timestamp()) for date in dates),
+            dtype=np.int64,
+            count=len(dates),
+        )
+
+    sign, hours, minutes = match.groups()
+    offset = 0
+    if sign is not None:
+        offset = (int(hours) * 3600 + int(minutes) * 60) * (-1 if sign == "-" else 1)
+    local = np.array([date[:19] for date in dates], dtype="datetime64[s]")
+    return local.astype(np.int64) - offset
+
+
+def bucket_times(
+    times: np.ndarray, minutes: int, calendar: TradingCalendar | None = None
+) -> np.ndarray:
+    """
+    Maps epoch-second timestamps to the start of their ``minutes`` wide bucket.
+
+    Buckets restart at the session open of every trading day, so timeframes that
+    do not divide a day still line up with the open each morning.
+    """
+    calendar = calendar or get_calendar()
+    anchor = calendar.bucket_anchor
+    # Seconds from UTC midnight to the session open
+    open_offset = int(anchor.timestamp()) % SECONDS_PER_DAY
+    day_open = (times - open_offset) // SECONDS_PER_DAY * SECONDS_PER_DAY + open_offset
+    width = minutes * 60
+    return day_open + (times - day_open) // width * width
+
+
+def resample_arrays(
+    times: np.ndarray,
+    opens: np.ndarray,
+    highs: np.ndarray,
+    lows: np.ndarray,
+    closes: np.ndarray,
+    volumes: np.ndarray,
+    minutes: int,
+    calendar: TradingCalendar | None = None,
+) -> tuple:
+    """
+    Resamples bars held in contiguous arrays to a ``minutes`` timeframe.
+
+    Args:
+        times (np.ndarray): Ascending int64 epoch seconds of each bar.
+        opens, highs, lows, closes, volumes (np.ndarray): float64 bar values;
+            NaN volumes count as zero.
+        minutes (int): Target timeframe in minutes.
+        calendar (TradingCalendar, optional): Supplies the session open the
+            buckets are anchored at. Defaults to NSE.
+
+    Returns:
+        tuple: ``(times, opens, highs, lows, closes, volumes)`` arrays of the
+        resampled bars, ``times`` being the bucket starts.
+    """
+    if len(times) == 0:
+        empty = np.empty(0)
+        return np.empty(0, dtype=np.int64), empty, empty, empty, empty, empty
+
+    buckets = bucket_times(np.asarray(times, dtype=np.int64), minutes, calendar)
+    # Bars are sorted, so each bucket is a contiguous run starting where the
+    # bucket value changes
+    starts = np.flatnonzero(np.diff(buckets)) + 1
+    starts = np.concatenate(([0], starts))
+    ends = np.concatenate((starts[1:], [len(buckets)])) - 1
+    return (
+        buckets[starts],
+        np.asarray(opens, dtype=np.float64)[starts],
+        np.maximum.reduceat(np.asarray(highs, dtype=np.float64), starts),
+        np.minimum.reduceat(np.asarray(lows, dtype=np.float64), starts),
+        np.asarray(closes, dtype=np.float64)[ends],
+        np.add.reduceat(np.nan_to_num(np.asarray(volumes, dtype=np.float64)), starts),
+    )
+
+
+def resample_records(
+    candles: list, minutes: int, calendar: TradingCalendar | None = None
+) -> list:
+    """
+    Resamples candle dictionaries with 'date' (ISO 8601), 'open', 'high', 'low',
+    'close' and 'volume' keys, as produced by ``CandleSerializer``.
+
+    Returns:
+        list: Resampled candle dictionaries in the same shape, oldest first.
+    """
+    if not candles:
+        return []
+
+    times = epoch_seconds([candle["date"] for candle in candles])
+    # One pass over the dictionaries; None becomes NaN
+    values = np.array(
+        list(map(itemgetter("open", "high", "low", "close", "volume"), candles)),
+        dtype=np.float64,
+    )
+    columns = values.T
+    order = np.argsort(times, kind="stable")
+    times, *resampled = resample_arrays(
+        times[order], *(column[order] for column in columns), minutes, calendar
+    )
+    # IST has no daylight saving, so dates are formatted with a fixed offset
+    dates = np.char.add(
+        np.datetime_as_string((times + IST_OFFSET).astype("datetime64[s]")),
+        "+05:30",
+    )
+    return [
+        {
+            "open": open_,
+            "high": high,
+            "low": low,
+            "close": close,
+            "volume": volume,
+            "date": date,
+        }
+        for date, open_, high, low, close, volume in zip(
+            dates.tolist(), *(column.tolist() for column in resampled), strict=True
+        )
+    ]
@@ -0,0 +1,150 @@
+from datetime import date, datetime, timedelta
+import logging
+
+from django.conf import settings
+from django.db.models import Max, Min
+
+from apps.core import partitions
+from apps.core.candle_cache import invalidate_hot_candles
+from apps.core.models import Candle
+from apps.core.rollups import bucket_start, instrument_anchors, rebuild_rollups
+from apps.core.trading_calendar import get_calendar
+from main import const
+
+logger = logging.getLogger(__name__)
+
+# 1-minute candles are dropped in tiers: those of contracts that expired more
+# than CANDLE_EXPIRED_RETENTION_DAYS ago, and all of those older than
+# CANDLE_MINUTE_RETENTION_MONTHS. Their rollups (5m ... 1d) are rebuilt first
+# and kept, so charts of old ranges still have data.
+
+
+def expired_contract_cutoff(today: date | None = None) -> date:
+    """
+    Contracts expiring before this day have their 1-minute candles dropped.
+    """
+    today = today or datetime.now(partitions.india_tz).date()
+    return today - timedelta(days=settings.CANDLE_EXPIRED_RETENTION_DAYS)
+
+
+def minute_retention_cutoff(now: datetime | None = None) -> datetime | None:
+    """
+    1-minute candles older than this are dropped, whole months at a time;
+    None when they are kept forever.
+    """
+    if not settings.CANDLE_MINUTE_RETENTION_MONTHS:
+        return None
+    current = partitions.month_start(now or datetime.now(partitions.india_tz))
+    return partitions.add_months(current, -settings.CANDLE_MINUTE_RETENTION_MONTHS)
+
+
+def downsample(instrument_id: int, start: datetime | None, end: datetime) -> int:
+    """
+    Rebuilds the rollups of an instrument from its 1-minute candles in
+    ``[start, end)`` before they are dropped.
+
+    Rollup buckets starting before ``start`` are left alone: the candles they
+    cover before ``start`` may be gone already, and rebuilding them from the
+    remaining ones would lose data.
+
+    Returns:
+        int: The number of rollup rows written.
+    """
+    if start is not None:
+        widest = max(const.CANDLE_ROLLUP_TIMEFRAMES)
+        anchor = instrument_anchors([instrument_id]).get(
+            instrument_id, get_calendar().bucket_anchor
+        )
+        first = bucket_start(start, widest, anchor)
+        start = first if first >= start else first + timedelta(minutes=widest)
+    # The last bucket may reach past ``end``; its candles there are kept
+    return rebuild_rollups(instrument_id, start, end - timedelta(microseconds=1))
+
+
+def prune_expired_contracts(cutoff: date | None = None) -> list:
+    """
+    Drops the 1-minute candles of contracts that expired before ``cutoff``,
+    after rebuilding their rollups. Their partitions are shared with live
+    instruments, so the bars are deleted.
+
+    Returns:
+        list: The IDs of the pruned instruments.
+    """
+    cutoff = cutoff or expired_contract_cutoff()
+    expired = (
+        Candle.objects.filter(instrument__expiry__lt=cutoff)
+        .order_by()
+        .values("instrument_id")
+        .annotate(start=Min("date"), end=Max("date"))
+        .values_list("instrument_id", "start", "end")
+    )
+    instrument_ids = []
+    for instrument_id, start, end in expired:
+        # Older months may have been dropped already, see prune_minute_candles
+        downsample(
+            instrument_id, partitions.month_start(start), end + timedelta(minutes=1)
+        )
+        deleted, _ = Candle.objects.filter(instrument_id=instrument_id).delete()
+        invalidate_hot_candles(instrument_id)
+        logger.info(
+            f"Dropped {deleted} 1-minute candles of expired instrument ID {instrument_id}."
+        )
+        instrument_ids.append(instrument_id)
+    return instrument_ids
+
+
+def prune_minute_candles(cutoff: datetime | None = None) -> int:
+    """
+    Drops the 1-minute candles older than ``cutoff``, after rebuilding the
+    rollups they cover. On Postgres whole monthly partitions are dropped; bars
+    outside of them are deleted.
+
+    Returns:
+        int: The number of dropped partitions and deleted bars.
+    """
+    cutoff = cutoff or minute_retention_cutoff()
+    if cutoff is None:
+        return 0
+
+    def downsample_range(start: datetime, end: datetime):
+        for instrument_id in (
+            Candle.objects.filter(date__gte=start, date__lt=end)
+            .order_by()
+            .values_list("instrument_id", flat=True)
+            .distinct()
+        ):
+            downsample(instrument_id, start, end)
+
+    dropped = []
+    if partitions.is_partitioned():
+        dropped = partitions.drop_partitions_before(cutoff, downsample_range)
+
+    old = Candle.objects.filter(date__lt=cutoff)
+    for instrument_id, start in (
+        old.order_by()
+        .values("instrument_id")
+        .annotate(start=Min("date"))
+        .values_list("instrument_id", "start")
+    ):
+        downsample(instrument_id, partitions.month_start(start), cutoff)
+    deleted, _ = old.delete()
+    if deleted:
+        logger.info(f"Deleted {deleted} 1-minute candles older than {cutoff}.")
+    return len(dropped) + deleted
+
+
+def maintain_candle_storage(
+    months_ahead: int = const.CANDLE_PARTITION_MONTHS_AHEAD,
+) -> dict:
+    """
+    Creates upcoming candle partitions and applies both retention tiers.
+
+    Returns:
+        dict: The ``created`` partitions, the ``expired`` instruments pruned and
+        the number of old partitions or bars ``dropped``.
+    """
+    return {
+        "created": partitions.ensure_partitions(months_ahead),
+        "expired": prune_expired_contracts(),
+        "dropped": prune_minute_candles(),
+    }
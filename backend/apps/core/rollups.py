@@ -0,0 +1,173 @@
+from datetime import datetime, timedelta
+import logging
+
+from django.db import connection, transaction
+from django.db.models import Min
+
+from apps.core.models import Candle, CandleRollup, SubscribedInstruments
+from apps.core.trading_calendar import get_calendar
+from main import const
+
+logger = logging.getLogger(__name__)
+
+
+def bucket_start(date: datetime, minutes: int, anchor: datetime) -> datetime:
+    """
+    Floors ``date`` to its ``minutes`` wide bucket, counted from ``anchor`` like
+    Postgres' ``date_bin``.
+    """
+    width = timedelta(minutes=minutes)
+    return anchor + (date - anchor) // width * width
+
+
+def instrument_anchors(instrument_ids) -> dict:
+    """
+    Maps instrument IDs to the bucket anchor of their exchange's calendar.
+    """
+    return {
+        instrument_id: get_calendar(exchange).bucket_anchor
+        for instrument_id, exchange in SubscribedInstruments.objects.filter(
+            id__in=set(instrument_ids)
+        ).values_list("id", "exchange__exchange")
+    }
+
+
+def lock_rollups(instrument_ids) -> None:
+    """
+    Takes the transaction-scoped advisory locks guarding the rollups of
+    ``instrument_ids``, in a fixed order so writers never deadlock. Live merges
+    and rebuilds of an instrument thus never interleave, and a rebuild reads
+    every candle whose delta was merged before it. Postgres only; SQLite
+    serialises writers anyway.
+    """
+    if connection.vendor != "postgresql":
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT pg_advisory_xact_lock(%s, id) "
+            "FROM (SELECT DISTINCT unnest(%s::integer[]) AS id ORDER BY id) ids",
+            [const.CANDLE_ROLLUP_LOCK_NAMESPACE, list(instrument_ids)],
+        )
+
+
+def rollup_rows(
+    rows: list, anchors: dict, timeframes=const.CANDLE_ROLLUP_TIMEFRAMES
+) -> list:
+    """
+    Expands 1-minute bar rows into one ``(instrument_id, timeframe, bucket, open,
+    high, low, close, volume)`` row per timeframe, oldest first so merging keeps
+    the earliest open and the latest close.
+    """
+    default_anchor = get_calendar().bucket_anchor
+    expanded = []
+    for instrument_id, date, *ohlcv in sorted(rows, key=lambda row: row[1]):
+        anchor = anchors.get(instrument_id, default_anchor)
+        for minutes in timeframes:
+            expanded.append(
+                (instrument_id, minutes, bucket_start(date, minutes, anchor), *ohlcv)
+            )
+    return expanded
+
+
+def merge_rollups(rows: list, returning: bool = False) -> int | list:
+    """
+    Merges freshly written 1-minute bars into the rollups, the same way the bars
+    themselves are merged into ``Candle``. Takes the instruments' rollup locks,
+    so a merge never falls between a rebuild's read and its rewrite.
+
+    Args:
+        rows (list): ``(instrument_id, date, open, high, low, close, volume)`` rows.
+        returning (bool, optional): Return the rollup rows as stored instead of
+            their number. Defaults to False.
+
+    Returns:
+        int | list: The number of rollup rows written, or the stored
+        ``(instrument_id, timeframe, date, open, high, low, close, volume)`` rows.
+    """
+    if not rows:
+        return [] if returning else 0
+    anchors = instrument_anchors(row[0] for row in rows)
+    with transaction.atomic():
+        lock_rollups({row[0] for row in rows})
+        return CandleRollup.objects.bulk_upsert(
+            rollup_rows(rows, anchors), returning=returning
+        )
+
+
+def rebuild_rollups(
+    instrument_id: int,
+    start: datetime | None = None,
+    end: datetime | None = None,
+    timeframes=const.CANDLE_ROLLUP_TIMEFRAMES,
+) -> int:
+    """
+    Recomputes the rollups of an instrument from its 1-minute candles, for the
+    buckets touching ``[start, end]`` or the whole history. Used after backfills,
+    whose bars replace rather than extend the stored ones.
+
+    Rollups outlive the 1-minute candles dropped by retention, so without a
+    ``start`` only the buckets starting at or after the earliest stored candle
+    are rebuilt; older ones are left alone.
+
+    The candles are read and the rollups rewritten in one transaction holding
+    the instrument's rollup lock, so live merges wait for the rebuild and land
+    on top of it.
+
+    Returns:
+        int: The number of rollup rows written.
+    """
+    anchor = instrument_anchors([instrument_id]).get(
+        instrument_id, get_calendar().bucket_anchor
+    )
+    # Smaller timeframes nest inside the widest one, so aligning the range to it
+    # covers every affected bucket.
+    widest = max(timeframes)
+    candles = Candle.objects.filter(instrument_id=instrument_id)
+    rollups = CandleRollup.objects.filter(
+        instrument_id=instrument_id, timeframe__in=timeframes
+    )
+    first = None
+    if start is None:
+        first = candles.aggregate(first=Min("date"))["first"]
+        if first is None:
+            return 0
+        rollups = rollups.filter(date__gte=first)
+    else:
+        start = bucket_start(start, widest, anchor)
+        candles = candles.filter(date__gte=start)
+        rollups = rollups.filter(date__gte=start)
+    if end is not None:
+        end = bucket_start(end, widest, anchor) + timedelta(minutes=widest)
+        candles = candles.filter(date__lt=end)
+        rollups = rollups.filter(date__lt=end)
+
+    with transaction.atomic():
+        # Read under the lock: a live delta merged between the read and the
+        # rewrite would otherwise be overwritten
+        lock_rollups([instrument_id])
+        bars = {}
+        for date, open_, high, low, close, volume in (
+            candles.order_by("date")
+            .values_list("date", "open", "high", "low", "close", "volume")
+            .iterator(chunk_size=const.CANDLE_UPSERT_BATCH_SIZE)
+        ):
+            for minutes in timeframes:
+                bucket = bucket_start(date, minutes, anchor)
+                if first is not None and bucket < first:
+                    continue
+                key = (instrument_id, minutes, bucket)
+                bar = bars.get(key)
+                if bar is None:
+                    bars[key] = [open_, high, low, close, volume or 0]
+                else:
+                    bar[1] = max(bar[1], high)
+                    bar[2] = min(bar[2], low)
+                    bar[3] = close
+                    bar[4] += volume or 0
+
+        rollups.delete()
+        written = CandleRollup.objects.bulk_upsert(
+            [(*key, *bar) for key, bar in bars.items()], replace=True
+        )
+    logger.info(f"Rebuilt {written} rollup candles for instrument ID {instrument_id}.")
+    return written
@@ -0,0 +1,10 @@
+from django.urls import path
+
+from apps.core.consumers import CandleConsumer
+
+websocket_urlpatterns = [
+    path(
+        "ws/candles/<int:instrument_id>/<int:timeframe>/",
+        CandleConsumer.as_asgi(),
+    ),
+]
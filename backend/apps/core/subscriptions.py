@@ -0,0 +1,85 @@
+import json
+import logging
+from typing import NamedTuple
+
+import redis
+
+from main import const
+
+logger = logging.getLogger(__name__)
+
+
+class SubscriptionChanges(NamedTuple):
+    subscribe: list
+    unsubscribe: list
+
+    def __bool__(self):
+        return bool(self.subscribe or self.unsubscribe)
+
+
+class SubscriptionQueue:
+    """
+    Waits on a user's subscription and unsubscription queues at once.
+
+    A single ``BLPOP`` on both queues wakes up as soon as either receives a
+    request; whatever else is queued by then is drained in the same round trip,
+    so a burst of requests becomes one batch of changes.
+    """
+
+    def __init__(
+        self,
+        redis_client: redis.Redis,
+        user_id: int,
+        batch_size: int = const.SUBSCRIPTION_BATCH_SIZE,
+    ):
+        self.redis_client = redis_client
+        self.batch_size = batch_size
+        self.actions = {
+            const.websocket_subscription_queue(user_id): "subscribe",
+            const.websocket_unsubscription_queue(user_id): "unsubscribe",
+        }
+
+    def wait(self, timeout: float) -> SubscriptionChanges:
+        """
+        Blocks for up to ``timeout`` seconds for subscription requests.
+
+        Returns:
+            SubscriptionChanges: Stock tokens to subscribe and unsubscribe; empty
+            when the wait timed out.
+        """
+        popped = self.redis_client.blpop(list(self.actions), timeout=timeout)
+        if popped is None:
+            return SubscriptionChanges([], [])
+
+        entries = [popped]
+        pipe = self.redis_client.pipeline(transaction=False)
+        for queue in self.actions:
+            pipe.lpop(queue, self.batch_size)
+        for queue, items in zip(self.actions, pipe.execute(), strict=True):
+            entries.extend((queue, item) for item in items or ())
+        return self.changes(entries)
+
+    def changes(self, entries: list) -> SubscriptionChanges:
+        """
+        Reduces ``(queue, payload)`` entries to the final action per stock token.
+
+        The queues are drained one after the other, so the entries are not in
+        the order the requests were made. Among requests for the same token, an
+        unsubscription always wins, since it follows the instrument's deletion.
+        """
+        actions = {}
+        for queue, payload in entries:
+            if isinstance(queue, bytes):
+                queue = queue.decode()
+            try:
+                stock_token = json.loads(payload).get("stock_token")
+            except (ValueError, AttributeError):
+                logger.warning(f"Ignoring malformed request on {queue}: {payload!r}")
+                continue
+            if stock_token and actions.get(stock_token) != "unsubscribe":
+                actions[stock_token] = self.actions[queue]
+
+        changes = SubscriptionChanges([], [])
+        for stock_token, action in actions.items():
+            getattr(changes, action).append(stock_token)
+        return changes
@@ -1,11 +1,27 @@
+from datetime import datetime, timedelta
+import json
+import struct
 from unittest.mock import MagicMock, patch
 
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from channels.testing import WebsocketCommunicator
 from django.contrib.auth import get_user_model
 import pytest
 from rest_framework import status
 from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
 
-from apps.core.models import Exchanges, Instrument, SubscribedInstruments
+from apps.core.candle_push import candle_group
+from apps.core.models import (
+    Candle,
+    Exchanges,
+    Instrument,
+    PercentageInstrument,
+    SubscribedInstruments,
+)
+from apps.core.ticks import india_tz
+from main.asgi import application
 
 User = get_user_model()
 
@@ -106,6 +122,134 @@ class TestSubscribedInstrumentsViewSet:
         assert response.status_code == status.HTTP_400_BAD_REQUEST
         assert response.data["error"] == "already subscribed"
 
+    def test_progress_lists_loading_instruments(
+        self, authenticated_client, subscribed_instrument, instrument
+    ):
+        PercentageInstrument.objects.create(
+            instrument=subscribed_instrument, percentage=12.5
+        )
+        done = SubscribedInstruments.objects.create(exchange=instrument.exchange)
+        PercentageInstrument.objects.create(
+            instrument=done, percentage=100, is_loading=True
+        )
+        response = authenticated_client.get(
+            "/api/core/subscribed_instruments/progress/"
+        )
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data["data"] == [
+            {
+                "id": subscribed_instrument.pk,
+                "chunks_total": 0,
+                "chunks_done": 0,
+                "chunks_failed": 0,
+                "rows": 0,
+                "percentage": 12.5,
+                "eta": None,
+            }
+        ]
+
+    def test_candles_are_paged_by_cursor(
+        self, authenticated_client, subscribed_instrument
+    ):
+        first = india_tz.localize(datetime(2025, 7, 7, 9, 15))
+        Candle.objects.bulk_upsert(
+            [
+                (subscribed_instrument.pk, first + timedelta(minutes=i), i, i, i, i, 1)
+                for i in range(5)
+            ]
+        )
+        url = f"/api/core/subscribed_instruments/{subscribed_instrument.pk}/candles/"
+
+        response = authenticated_client.get(url, {"tf": 1, "limit": 2, "count": "true"})
+        assert [c["open"] for c in response.data["results"]] == [4, 3]
+        assert response.data["count"] == 5
+
+        # A newer bar arriving between requests does not shift the next page
+        Candle.objects.bulk_upsert(
+            [(subscribed_instrument.pk, first + timedelta(minutes=5), 5, 5, 5, 5, 1)]
+        )
+        response = authenticated_client.get(response.data["next"])
+        assert [c["open"] for c in response.data["results"]] == [2, 1]
+        assert response.data["count"] is None
+
+        response = authenticated_client.get(response.data["next"])
+        assert [c["open"] for c in response.data["results"]] == [0]
+        assert response.data["next"] is None
+
+    def test_candles_as_columns(self, authenticated_client, subscribed_instrument):
+        first = india_tz.localize(datetime(2025, 7, 7, 9, 15))
+        Candle.objects.bulk_upsert(
+            [
+                (subscribed_instrument.pk, first, 1.0, 2.0, 0.5, 1.5, 10),
+                (
+                    subscribed_instrument.pk,
+                    first + timedelta(minutes=1),
+                    1.5,
+                    3.0,
+                    1.0,
+                    2.5,
+                    20,
+                ),
+            ]
+        )
+        url = f"/api/core/subscribed_instruments/{subscribed_instrument.pk}/candles/"
+
+        response = authenticated_client.get(url, {"format": "columnar"})
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json()["results"] == {
+            "t": [int(first.timestamp()) + 60, int(first.timestamp())],
+            "o": [1.5, 1.0],
+            "h": [3.0, 2.0],
+            "l": [1.0, 0.5],
+            "c": [2.5, 1.5],
+            "v": [20, 10],
+        }
+
+        response = authenticated_client.get(url, {"format": "packed"})
+        assert response["Content-Type"] == "application/vnd.candles.packed"
+        (n,) = struct.unpack_from("<I", response.content)
+        times = struct.unpack_from(f"<{n}q", response.content, 4)
+        opens = struct.unpack_from(f"<{n}d", response.content, 4 + 8 * n)
+        assert times == (int(first.timestamp()) + 60, int(first.timestamp()))
+        assert opens == (1.5, 1.0)
+        assert len(response.content) == 4 + 6 * 8 * n
+
+    def test_first_candle_page_is_served_from_hot_cache(
+        self, authenticated_client, subscribed_instrument
+    ):
+        first = india_tz.localize(datetime(2025, 7, 7, 9, 15))
+        hot = [
+            {
+                "bucket": first + timedelta(minutes=i),
+                "o": i,
+                "h_": i,
+                "l_": i,
+                "c": i,
+                "v_": 1,
+            }
+            for i in (2, 1, 0)
+        ]
+        url = f"/api/core/subscribed_instruments/{subscribed_instrument.pk}/candles/"
+
+        with patch("apps.core.views.latest_candles", return_value=hot) as latest:
+            response = authenticated_client.get(url, {"tf": 5, "limit": 2})
+            latest.assert_called_once_with(subscribed_instrument.pk, 5, 3)
+            assert [c["open"] for c in response.data["results"]] == [2, 1]
+            assert response.data["before"] == hot[1]["bucket"].isoformat()
+
+            # Older pages go to the database
+            authenticated_client.get(response.data["next"])
+            latest.assert_called_once()
+
+    def test_candles_reject_invalid_cursor(
+        self, authenticated_client, subscribed_instrument
+    ):
+        response = authenticated_client.get(
+            f"/api/core/subscribed_instruments/{subscribed_instrument.pk}/candles/",
+            {"before": "yesterday"},
+        )
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
 
 @pytest.mark.django_db
 class TestCandleViewSet:
@@ -115,7 +259,97 @@ class TestCandleViewSet:
         )
         assert response.status_code == status.HTTP_200_OK
 
+    def test_get_candles_streams_requested_range(
+        self, authenticated_client, subscribed_instrument
+    ):
+        first = india_tz.localize(datetime(2025, 7, 7, 9, 15))
+        Candle.objects.bulk_upsert(
+            [
+                (subscribed_instrument.pk, first + timedelta(minutes=i), i, i, i, i, 1)
+                for i in range(10)
+            ]
+        )
+
+        response = authenticated_client.get(
+            "/api/core/candles/get_candles/",
+            {
+                "id": subscribed_instrument.pk,
+                "start": (first + timedelta(minutes=2)).isoformat(),
+                "end": str(int((first + timedelta(minutes=5)).timestamp())),
+            },
+        )
+
+        assert response.streaming
+        data = json.loads(b"".join(response.streaming_content))["data"]
+        assert [candle["open"] for candle in data] == [2, 3, 4]
+        assert data[0]["date"] == "2025-07-07T09:17:00+05:30"
+
+    def test_get_candles_rejects_unbounded_range(
+        self, authenticated_client, subscribed_instrument
+    ):
+        response = authenticated_client.get(
+            "/api/core/candles/get_candles/",
+            {
+                "id": subscribed_instrument.pk,
+                "start": "2020-01-01T00:00:00+05:30",
+                "end": "2025-01-01T00:00:00+05:30",
+            },
+        )
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
     def test_get_candles_missing_id(self, authenticated_client):
         response = authenticated_client.get("/api/core/candles/get_candles/")
         assert response.status_code == status.HTTP_400_BAD_REQUEST
         assert response.data["msg"] == "Missing instrument ID"
+
+
+@pytest.mark.django_db
+class TestCandleSocket:
+    def connect_and_receive(self, path, *events):
+        async def scenario():
+            communicator = WebsocketCommunicator(application, path)
+            connected, _ = await communicator.connect()
+            messages = []
+            if connected:
+                layer = get_channel_layer()
+                for group, bars in events:
+                    await layer.group_send(group, {"type": "candle.bars", "bars": bars})
+                messages.append(await communicator.receive_json_from(timeout=1))
+                assert await communicator.receive_nothing(timeout=0.3)
+            await communicator.disconnect()
+            return connected, messages
+
+        with patch("apps.core.consumers.ensure_relay"):
+            return async_to_sync(scenario)()
+
+    def test_bar_updates_are_coalesced(self, user, subscribed_instrument):
+        token = AccessToken.for_user(user)
+        group = candle_group(subscribed_instrument.pk, 5)
+
+        connected, messages = self.connect_and_receive(
+            f"/ws/candles/{subscribed_instrument.pk}/5/?token={token}",
+            (group, [[300, 1.0, 2.0, 0.5, 1.5, 3.0]]),
+            (group, [[300, 1.0, 3.0, 0.5, 2.5, 4.0], [0, 1.0, 1.0, 1.0, 1.0, 1.0]]),
+        )
+
+        assert connected
+        assert messages == [
+            {
+                "instrument": subscribed_instrument.pk,
+                "tf": 5,
+                "bars": [[0, 1.0, 1.0, 1.0, 1.0, 1.0], [300, 1.0, 3.0, 0.5, 2.5, 4.0]],
+            }
+        ]
+
+    def test_socket_requires_valid_token(self, subscribed_instrument):
+        connected, _ = self.connect_and_receive(
+            f"/ws/candles/{subscribed_instrument.pk}/5/?token=invalid"
+        )
+        assert not connected
+
+    def test_socket_rejects_resampled_timeframe(self, user, subscribed_instrument):
+        token = AccessToken.for_user(user)
+        connected, _ = self.connect_and_receive(
+            f"/ws/candles/{subscribed_instrument.pk}/7/?token={token}"
+        )
+        assert not connected
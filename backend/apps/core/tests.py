@@ -1,11 +1,74 @@
+import base64
+from datetime import UTC, datetime, timedelta
+from io import StringIO
 import json
-from unittest.mock import MagicMock, patch
-
+import threading
+from unittest.mock import AsyncMock, MagicMock, call, patch
+
+from asgiref.sync import async_to_sync
+from breeze_connect import BreezeConnect
+from django.apps import apps
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
 from django.test import RequestFactory
+import numpy as np
 import pytest
+import redis
 from rest_framework import status
-
+from rest_framework.test import force_authenticate
+
+from apps.core.backfill import coverage_index, plan_backfill
+from apps.core.breeze import (
+    TOKEN_BUCKET_SCRIPT,
+    BreezeSessionManager,
+    RateLimiter,
+    credentials_fingerprint,
+)
+from apps.core.breeze_rest import PooledApification, RequestMetrics
+from apps.core.breeze_standin import (
+    BreezeStandin,
+    StandinOptions,
+    historical_bars,
+    quote_tick,
+)
+from apps.core.bulk_load import breeze_candle_arrays, copy_candles
+from apps.core.candle_cache import SEEDED, latest_candles
+from apps.core.candle_push import CandleRelay, publish_candles
+from apps.core.candles import CandleBuilder, write_candle_bars
+from apps.core.feed import FeedService
+from apps.core.models import (
+    BreezeAccount,
+    Candle,
+    CandleRollup,
+    Exchanges,
+    PercentageInstrument,
+    SubscribedInstruments,
+)
+from apps.core.partitions import add_months, month_start
+from apps.core.progress import (
+    backfill_progress,
+    finish_backfill_progress,
+    record_backfill_progress,
+)
+from apps.core.resample import epoch_seconds, resample_arrays, resample_records
+from apps.core.retention import prune_expired_contracts, prune_minute_candles
+from apps.core.rollups import bucket_start, rebuild_rollups
+from apps.core.subscriptions import SubscriptionQueue
+from apps.core.tasks import load_instrument_candles, sub_candle_maker
+from apps.core.ticks import TickBuffer, india_tz, instrument_index, parse_tick_batch
+from apps.core.trading_calendar import TradingCalendar, get_calendar
+from apps.core.utils import (
+    ChunkFetchError,
+    fetch_chunk,
+    fetch_historical_data,
+    stored_candles_qs,
+)
 from apps.core.views import BreezeAccountViewSet, InstrumentViewSet
+from main import const
+from main.locks import ACQUIRE_SCRIPT, RELEASE_SCRIPT, RENEW_SCRIPT, RedisLock
+
+User = get_user_model()
 
 
 class TestInstrumentViewSet:
@@ -377,9 +440,8 @@ class TestBreezeAccountViewSet:
             exists=MagicMock(return_value=True)
         )
 
-        mock_session = MagicMock()
-        mock_session.get_funds.return_value = {"Status": 200}
-        MockBreezeSessionManager.initialize_session.return_value = mock_session
+        # The cached verdict is served without calling Breeze
+        MockBreezeSessionManager.health.return_value = {"healthy": True}
 
         MockCache.get.return_value = True  # Simulate ticks received
 
@@ -393,10 +455,8 @@ class TestBreezeAccountViewSet:
             "session_status": True,
             "websocket_status": True,
         }
-        MockBreezeSessionManager.initialize_session.assert_called_once_with(
-            request.user.id
-        )
-        mock_session.get_funds.assert_called_once_with()
+        MockBreezeSessionManager.health.assert_called_once_with(request.user.id)
+        MockBreezeSessionManager.initialize_session.assert_not_called()
         MockCache.get.assert_called_once_with("ticks_received", False)
 
     @patch("apps.core.views.websocket_start")
@@ -489,3 +549,1656 @@ class TestBreezeAccountViewSet:
             request.user.id
         )
         mock_session.get_funds.assert_called_once_with()
+
+    @pytest.mark.django_db
+    @patch("apps.core.views.utils.get_cache_client")
+    @patch("apps.core.views.breeze_session_manager")
+    @patch("apps.core.views.BreezeAccountViewSet.permission_classes", new=[])
+    def test_deleting_the_account_withdraws_the_feed(
+        self, MockBreezeSessionManager, MockGetCacheClient
+    ):
+        user = User.objects.create_user(
+            email="feed@example.com", name="Feed", password="password123"
+        )
+        account = BreezeAccount.objects.create(user=user, api_key="key")
+        request = self.factory.delete(f"/breeze_accounts/{account.pk}/")
+        force_authenticate(request, user=user)
+
+        response = BreezeAccountViewSet.as_view({"delete": "destroy"})(
+            request, pk=account.pk
+        )
+
+        assert response.status_code == status.HTTP_204_NO_CONTENT
+        assert not BreezeAccount.objects.filter(pk=account.pk).exists()
+        MockBreezeSessionManager.clear_session.assert_called_once_with(user.id)
+        MockGetCacheClient.return_value.srem.assert_called_once_with(
+            const.FEED_USERS_KEY, user.id
+        )
+
+
+class TestTickBuffer:
+
+    def test_flushes_when_batch_is_full(self):
+        batches = []
+        flushed = threading.Event()
+
+        def flush(batch):
+            batches.append(batch)
+            flushed.set()
+
+        buffer = TickBuffer(flush, max_size=3, max_wait=60)
+        buffer.start()
+        try:
+            for i in range(3):
+                buffer.add({"symbol": "4.1!1", "last": i})
+            assert flushed.wait(timeout=2)
+        finally:
+            buffer.stop(flush=False)
+
+        assert len(batches) == 1
+        assert [tick["last"] for tick in batches[0]] == [0, 1, 2]
+
+    def test_flushes_after_max_wait(self):
+        flushed = threading.Event()
+        buffer = TickBuffer(lambda batch: flushed.set(), max_size=100, max_wait=0.05)
+        buffer.start()
+        try:
+            buffer.add({"symbol": "4.1!1", "last": 1})
+            assert flushed.wait(timeout=2)
+        finally:
+            buffer.stop(flush=False)
+        assert len(buffer) == 0
+
+    def test_stop_flushes_pending_ticks(self):
+        batches = []
+        buffer = TickBuffer(batches.append, max_size=100, max_wait=60)
+        buffer.add({"symbol": "4.1!1", "last": 1})
+        buffer.stop()
+        assert len(batches) == 1
+
+    def test_flush_callback_errors_are_contained(self):
+        buffer = TickBuffer(MagicMock(side_effect=RuntimeError("db down")))
+        buffer.add({"symbol": "4.1!1", "last": 1})
+        assert buffer.flush() == 1
+        assert len(buffer) == 0
+
+
+@pytest.mark.django_db
+class TestParseTickBatch:
+
+    @pytest.fixture(autouse=True)
+    def fresh_index(self):
+        instrument_index.invalidate()
+        yield
+        instrument_index.invalidate()
+
+    def test_resolves_known_symbols_in_one_lookup(self):
+        exchange = Exchanges.objects.create(title="NSE")
+        instrument = SubscribedInstruments.objects.create(
+            exchange=exchange, stock_token="4.1!2885"
+        )
+        ticks = [
+            {
+                "symbol": "4.1!2885",
+                "last": 100.0 + i,
+                "ltq": 10,
+                "ltt": f"Mon Jul 07 10:15:0{i} 2025",
+            }
+            for i in range(3)
+        ]
+        ticks.append(
+            {"symbol": "4.1!9999", "last": 1.0, "ltq": 1, "ltt": ticks[0]["ltt"]}
+        )
+
+        rows = parse_tick_batch(ticks)
+
+        assert [row[0] for row in rows] == [instrument.id] * 3
+        assert [row[2] for row in rows] == [100.0, 101.0, 102.0]
+        assert rows[0][1] == india_tz.localize(datetime(2025, 7, 7, 10, 15, 0))
+
+    def test_ignores_ticks_outside_market_hours(self):
+        exchange = Exchanges.objects.create(title="NSE")
+        instrument = SubscribedInstruments.objects.create(
+            exchange=exchange, stock_token="4.1!2885"
+        )
+        ticks = [
+            {"symbol": "4.1!2885", "last": 1.0, "ltq": 1, "ltt": ltt}
+            for ltt in (
+                "Mon Jul 07 09:14:59 2025",  # pre-open
+                "Mon Jul 07 15:30:00 2025",
+                "Mon Jul 07 15:30:01 2025",
+                "Sat Jul 05 10:15:00 2025",  # weekend
+                "Fri Aug 15 10:15:00 2025",  # holiday
+            )
+        ]
+        rows = parse_tick_batch(ticks)
+        assert [(row[0], row[1].time()) for row in rows] == [
+            (instrument.id, datetime(2025, 7, 7, 15, 30).time())
+        ]
+
+    def test_malformed_ticks_are_skipped(self):
+        exchange = Exchanges.objects.create(title="NSE")
+        instrument = SubscribedInstruments.objects.create(
+            exchange=exchange, stock_token="4.1!2885"
+        )
+        ltt = "Mon Jul 07 10:15:00 2025"
+        ticks = [
+            {"symbol": "4.1!2885", "ltq": 1, "ltt": ltt},  # no price
+            {"symbol": "4.1!2885", "last": 1.0, "ltq": 1},  # no time
+            {"symbol": "4.1!2885", "last": 1.0, "ltq": 1, "ltt": "07/07/2025"},
+            {"symbol": "4.1!2885", "last": 1.0, "ltq": 1, "ltt": None},
+            {"symbol": "4.1!2885", "last": 2.0, "ltq": 1, "ltt": ltt},
+        ]
+
+        rows = parse_tick_batch(ticks)
+
+        assert [(row[0], row[2]) for row in rows] == [(instrument.id, 2.0)]
+
+    def test_resolves_symbols_without_queries_once_loaded(
+        self, django_assert_num_queries
+    ):
+        exchange = Exchanges.objects.create(title="NSE")
+        instrument = SubscribedInstruments.objects.create(
+            exchange=exchange, stock_token="4.1!2885"
+        )
+        tick = {"symbol": "4.1!2885", "last": 1.0, "ltq": 1}
+        tick["ltt"] = "Mon Jul 07 10:15:00 2025"
+        parse_tick_batch([tick])
+
+        with django_assert_num_queries(0):
+            rows = parse_tick_batch([tick])
+        assert rows[0][0] == instrument.id
+
+    def test_unknown_symbols_are_looked_up_once(self, django_assert_num_queries):
+        tick = {"symbol": "4.1!9999", "last": 1.0, "ltq": 1}
+        tick["ltt"] = "Mon Jul 07 10:15:00 2025"
+        parse_tick_batch([tick])
+
+        with django_assert_num_queries(0):
+            assert parse_tick_batch([tick]) == []
+
+    def test_new_subscription_is_picked_up_after_invalidation(self):
+        exchange = Exchanges.objects.create(title="NSE")
+        tick = {"symbol": "4.1!2885", "last": 1.0, "ltq": 1}
+        tick["ltt"] = "Mon Jul 07 10:15:00 2025"
+        assert parse_tick_batch([tick]) == []
+
+        instrument = SubscribedInstruments.objects.create(
+            exchange=exchange, stock_token="4.1!2885"
+        )
+        instrument_index.invalidate("4.1!2885")
+
+        assert parse_tick_batch([tick])[0][0] == instrument.id
+
+
+class TestCandleBuilder:
+
+    def ts(self, minute, second=0):
+        return india_tz.localize(datetime(2025, 7, 7, 10, minute, second))
+
+    def test_aggregates_ticks_and_writes_closed_bars(self):
+        writer = MagicMock()
+        builder = CandleBuilder(writer=writer, open_bar_flush_interval=3600)
+        builder.update(
+            [
+                (1, self.ts(15, 1), 100.0, 5),
+                (1, self.ts(15, 20), 103.0, 5),
+                (1, self.ts(15, 40), 99.0, 5),
+                (1, self.ts(15, 59), 101.0, 5),
+                (1, self.ts(16, 2), 102.0, 1),
+            ]
+        )
+
+        assert builder.flush(now=self.ts(16, 10)) == 1
+        writer.assert_called_once_with(
+            [(1, self.ts(15), 100.0, 103.0, 99.0, 101.0, 20)]
+        )
+        assert len(builder) == 1
+
+    def test_open_bar_is_flushed_with_volume_delta(self):
+        writer = MagicMock()
+        builder = CandleBuilder(writer=writer, open_bar_flush_interval=3600)
+        builder.update([(1, self.ts(15, 1), 100.0, 5)])
+        builder.flush(force=True, now=self.ts(15, 30))
+        builder.update([(1, self.ts(15, 31), 104.0, 2)])
+        builder.flush(force=True, now=self.ts(15, 40))
+
+        assert writer.call_args_list[0].args[0] == [
+            (1, self.ts(15), 100.0, 100.0, 100.0, 100.0, 5)
+        ]
+        assert writer.call_args_list[1].args[0] == [
+            (1, self.ts(15), 100.0, 104.0, 100.0, 104.0, 2)
+        ]
+
+    def test_stale_open_bar_is_closed_by_wall_clock(self):
+        writer = MagicMock()
+        builder = CandleBuilder(writer=writer, open_bar_flush_interval=3600)
+        builder.update([(1, self.ts(15, 1), 100.0, 5)])
+
+        assert builder.flush(now=self.ts(17)) == 1
+        assert len(builder) == 0
+
+    def test_failed_writes_are_retried(self):
+        writer = MagicMock(side_effect=[RuntimeError("db down"), None])
+        builder = CandleBuilder(writer=writer)
+        builder.update([(1, self.ts(15, 1), 100.0, 5)])
+
+        assert builder.flush(force=True, now=self.ts(15, 2)) == 0
+        assert builder.flush(now=self.ts(15, 3)) == 1
+        assert writer.call_args_list[0] == writer.call_args_list[1]
+
+
+@pytest.mark.django_db
+class TestWriteCandleBars:
+
+    def test_merges_into_existing_candles(self):
+        exchange = Exchanges.objects.create(title="NSE")
+        instrument = SubscribedInstruments.objects.create(exchange=exchange)
+        date = india_tz.localize(datetime(2025, 7, 7, 10, 15))
+        Candle.objects.create(
+            instrument=instrument,
+            date=date,
+            open=100.0,
+            high=101.0,
+            low=99.0,
+            close=100.5,
+            volume=10,
+        )
+
+        write_candle_bars(
+            [
+                (instrument.id, date, 100.5, 102.0, 99.5, 101.5, 5),
+                (
+                    instrument.id,
+                    date + timedelta(minutes=1),
+                    101.5,
+                    101.5,
+                    101.0,
+                    101.0,
+                    3,
+                ),
+            ]
+        )
+
+        first, second = Candle.objects.filter(instrument=instrument).order_by("date")
+        assert (first.open, first.high, first.low, first.close, first.volume) == (
+            100.0,
+            102.0,
+            99.0,
+            101.5,
+            15,
+        )
+        assert (second.open, second.close, second.volume) == (101.5, 101.0, 3)
+
+
+@pytest.mark.django_db
+class TestCandleBulkUpsert:
+
+    @pytest.fixture(autouse=True)
+    def setup(self):
+        exchange = Exchanges.objects.create(title="NSE")
+        self.instrument = SubscribedInstruments.objects.create(exchange=exchange)
+        self.date = india_tz.localize(datetime(2025, 7, 7, 10, 15))
+
+    def ohlcv(self):
+        candle = Candle.objects.get(instrument=self.instrument, date=self.date)
+        return (candle.open, candle.high, candle.low, candle.close, candle.volume)
+
+    def test_duplicate_keys_in_one_batch_are_merged(self):
+        written = Candle.objects.bulk_upsert(
+            [
+                (self.instrument.id, self.date, 100.0, 101.0, 99.0, 100.5, 5),
+                (self.instrument.id, self.date, 100.5, 103.0, 100.0, 102.0, 7),
+            ]
+        )
+        assert written == 1
+        assert self.ohlcv() == (100.0, 103.0, 99.0, 102.0, 12)
+
+    def test_replace_overwrites_stored_bar(self):
+        Candle.objects.bulk_upsert(
+            [(self.instrument.id, self.date, 100.0, 105.0, 95.0, 100.0, 50)]
+        )
+        Candle.objects.bulk_upsert(
+            [(self.instrument.id, self.date, 101.0, 102.0, 99.0, 101.5, 20)],
+            replace=True,
+        )
+        assert Candle.objects.count() == 1
+        assert self.ohlcv() == (101.0, 102.0, 99.0, 101.5, 20)
+
+    def test_batches_large_writes(self):
+        rows = [
+            (
+                self.instrument.id,
+                self.date + timedelta(minutes=i),
+                1.0,
+                1.0,
+                1.0,
+                1.0,
+                1,
+            )
+            for i in range(300)
+        ]
+        assert Candle.objects.bulk_upsert(rows, batch_size=50) == 300
+        assert Candle.objects.filter(instrument=self.instrument).count() == 300
+
+
+class TestResample:
+
+    def epoch(self, day, hour, minute):
+        return int(india_tz.localize(datetime(2025, 7, day, hour, minute)).timestamp())
+
+    def test_buckets_restart_at_each_session_open(self):
+        times = np.array(
+            [
+                self.epoch(7, 9, 15),
+                self.epoch(7, 9, 21),
+                self.epoch(7, 9, 22),
+                self.epoch(7, 15, 29),
+                self.epoch(8, 9, 15),
+            ]
+        )
+        values = np.array([1.0, 2.0, 3.0, 4.0, 5.0])
+
+        result = resample_arrays(
+            times, values, values + 1, values - 1, values, values, 7
+        )
+
+        assert result[0].tolist() == [
+            self.epoch(7, 9, 15),
+            self.epoch(7, 9, 22),
+            self.epoch(7, 15, 26),
+            self.epoch(8, 9, 15),
+        ]
+        assert result[1].tolist() == [1.0, 3.0, 4.0, 5.0]
+        assert result[2].tolist() == [3.0, 4.0, 5.0, 6.0]
+        assert result[4].tolist() == [2.0, 3.0, 4.0, 5.0]
+        assert result[5].tolist() == [3.0, 3.0, 4.0, 5.0]
+
+    def test_records_round_trip(self):
+        candles = [
+            {
+                "date": f"2025-07-07T09:{15 + i}:00+05:30",
+                "open": 10.0 + i,
+                "high": 20.0 + i,
+                "low": 5.0 - i,
+                "close": 15.0 + i,
+                "volume": None if i == 1 else 100,
+            }
+            for i in range(6)
+        ]
+        # Out of order input is sorted first
+        candles.reverse()
+
+        assert resample_records(candles, 5) == [
+            {
+                "open": 10.0,
+                "high": 24.0,
+                "low": 1.0,
+                "close": 19.0,
+                "volume": 400.0,
+                "date": "2025-07-07T09:15:00+05:30",
+            },
+            {
+                "open": 15.0,
+                "high": 25.0,
+                "low": 0.0,
+                "close": 20.0,
+                "volume": 100.0,
+                "date": "2025-07-07T09:20:00+05:30",
+            },
+        ]
+
+    def test_epoch_seconds_handles_mixed_offsets(self):
+        expected = self.epoch(7, 9, 15)
+        assert epoch_seconds(["2025-07-07T03:45:00Z"]).tolist() == [expected]
+        assert epoch_seconds(
+            ["2025-07-07T09:15:00+05:30", "2025-07-07T03:45:00.000+00:00"]
+        ).tolist() == [expected, expected]
+
+
+@pytest.mark.django_db
+class TestCandleRollups:
+
+    @pytest.fixture(autouse=True)
+    def setup(self):
+        exchange = Exchanges.objects.create(title="NSE")
+        self.instrument = SubscribedInstruments.objects.create(exchange=exchange)
+
+    def at(self, hour, minute):
+        return india_tz.localize(datetime(2025, 7, 7, hour, minute))
+
+    def rollup(self, timeframe, date):
+        candle = CandleRollup.objects.get(
+            instrument=self.instrument, timeframe=timeframe, date=date
+        )
+        return (candle.open, candle.high, candle.low, candle.close, candle.volume)
+
+    def test_buckets_are_anchored_at_session_open(self):
+        anchor = india_tz.localize(datetime(1970, 1, 1, 9, 15))
+        assert bucket_start(self.at(10, 14), 60, anchor) == self.at(9, 15)
+        assert bucket_start(self.at(10, 15), 60, anchor) == self.at(10, 15)
+        assert bucket_start(self.at(15, 29), 1440, anchor) == self.at(9, 15)
+
+    def test_live_bars_are_merged_into_rollups(self):
+        write_candle_bars(
+            [
+                (self.instrument.id, self.at(9, 20), 100.0, 101.0, 99.0, 100.5, 5),
+                (self.instrument.id, self.at(9, 21), 100.5, 103.0, 100.0, 102.0, 7),
+            ]
+        )
+        # The open bar of 09:21 written again with the volume traded since
+        write_candle_bars(
+            [(self.instrument.id, self.at(9, 21), 100.5, 104.0, 100.0, 103.5, 2)]
+        )
+
+        assert self.rollup(5, self.at(9, 20)) == (100.0, 104.0, 99.0, 103.5, 14)
+        assert self.rollup(1440, self.at(9, 15)) == (100.0, 104.0, 99.0, 103.5, 14)
+        assert CandleRollup.objects.count() == 5
+
+    def test_rebuild_replaces_affected_buckets(self):
+        write_candle_bars(
+            [(self.instrument.id, self.at(9, 20), 100.0, 101.0, 99.0, 100.5, 5)]
+        )
+        Candle.objects.bulk_upsert(
+            [
+                (self.instrument.id, self.at(9, 20), 90.0, 95.0, 89.0, 94.0, 50),
+                (self.instrument.id, self.at(9, 35), 94.0, 96.0, 93.0, 95.0, 20),
+            ],
+            replace=True,
+        )
+
+        rebuild_rollups(self.instrument.id, self.at(9, 20), self.at(9, 35))
+
+        assert self.rollup(15, self.at(9, 15)) == (90.0, 95.0, 89.0, 94.0, 50)
+        assert self.rollup(15, self.at(9, 30)) == (94.0, 96.0, 93.0, 95.0, 20)
+        assert self.rollup(60, self.at(9, 15)) == (90.0, 96.0, 89.0, 95.0, 70)
+        assert [row["bucket"] for row in stored_candles_qs(self.instrument.id, 5)] == [
+            self.at(9, 35),
+            self.at(9, 20),
+        ]
+
+    def test_rebuild_reads_candles_under_the_lock(self):
+        write_candle_bars(
+            [(self.instrument.id, self.at(9, 20), 100.0, 101.0, 99.0, 100.5, 5)]
+        )
+
+        waited = []
+
+        def merge_while_waiting(instrument_ids):
+            # A live write that committed while the rebuild waited for the lock
+            assert connection.in_atomic_block
+            if not waited:
+                waited.append(instrument_ids)
+                write_candle_bars(
+                    [
+                        (
+                            self.instrument.id,
+                            self.at(9, 21),
+                            100.5,
+                            103.0,
+                            100.0,
+                            102.0,
+                            7,
+                        )
+                    ]
+                )
+
+        with patch("apps.core.rollups.lock_rollups", side_effect=merge_while_waiting):
+            rebuild_rollups(self.instrument.id, self.at(9, 20), self.at(9, 20))
+
+        assert self.rollup(5, self.at(9, 20)) == (100.0, 103.0, 99.0, 102.0, 12)
+
+
+@pytest.mark.django_db
+class TestHotCandleCache:
+
+    @pytest.fixture(autouse=True)
+    def setup(self):
+        exchange = Exchanges.objects.create(title="NSE")
+        self.instrument = SubscribedInstruments.objects.create(exchange=exchange)
+
+    def at(self, hour, minute):
+        return india_tz.localize(datetime(2025, 7, 7, hour, minute))
+
+    def test_stored_bars_are_cached_after_merge(self):
+        write_candle_bars(
+            [(self.instrument.id, self.at(9, 21), 100.5, 103.0, 100.0, 102.0, 7)]
+        )
+        with patch("apps.core.candles.store_hot_candles") as store:
+            write_candle_bars(
+                [(self.instrument.id, self.at(9, 21), 100.5, 104.0, 100.0, 103.5, 2)]
+            )
+
+        rows = store.call_args.args[0]
+        assert (
+            self.instrument.id,
+            1,
+            self.at(9, 21),
+            100.5,
+            104.0,
+            100.0,
+            103.5,
+            9,
+        ) in rows
+        assert (
+            self.instrument.id,
+            5,
+            self.at(9, 20),
+            100.5,
+            104.0,
+            100.0,
+            103.5,
+            9,
+        ) in rows
+        assert len(rows) == 1 + len(const.CANDLE_ROLLUP_TIMEFRAMES)
+
+    def test_seeded_window_is_read_from_redis(self):
+        client = MagicMock()
+        members = [
+            json.dumps([int(self.at(9, 21).timestamp()), 1, 2, 0.5, 1.5, 10]),
+            json.dumps([int(self.at(9, 20).timestamp()), 1, 1, 1, 1, None]),
+        ]
+        client.pipeline.return_value.execute.return_value = [float("inf"), members]
+
+        rows = latest_candles(self.instrument.id, 1, 2, client=client)
+
+        assert [row["bucket"] for row in rows] == [self.at(9, 21), self.at(9, 20)]
+        assert rows[0]["h_"] == 2 and rows[1]["v_"] is None
+
+    def test_unseeded_window_is_loaded_from_database(self):
+        Candle.objects.bulk_upsert(
+            [(self.instrument.id, self.at(9, 20), 1.0, 2.0, 0.5, 1.5, 10)]
+        )
+        client = MagicMock()
+        client.pipeline.return_value.execute.return_value = [None, []]
+        client.zrangebyscore.return_value = []
+
+        rows = latest_candles(self.instrument.id, 1, 10, client=client)
+
+        assert [row["bucket"] for row in rows] == [self.at(9, 20)]
+        mapping = client.pipeline.return_value.zadd.call_args.args[1]
+        assert mapping[SEEDED] == float("inf")
+        assert len(mapping) == 2
+
+    def test_windows_larger_than_the_cache_are_not_served(self):
+        client = MagicMock()
+        assert (
+            latest_candles(
+                self.instrument.id, 1, const.CANDLE_HOT_WINDOW + 1, client=client
+            )
+            is None
+        )
+        assert latest_candles(self.instrument.id, 7, 10, client=client) is None
+        client.pipeline.assert_not_called()
+
+
+class TestCandlePush:
+
+    def test_updates_are_published_per_instrument_and_timeframe(self):
+        client = MagicMock()
+        date = india_tz.localize(datetime(2025, 7, 7, 9, 20))
+        rows = [
+            (1, 1, date, 1.0, 2.0, 0.5, 1.5, 3.0),
+            (1, 5, date, 1.0, 2.0, 0.5, 1.5, 3.0),
+            (1, 1, date + timedelta(minutes=1), 1.5, 1.5, 1.5, 1.5, None),
+        ]
+
+        assert publish_candles(rows, client=client) == 2
+
+        pipe = client.pipeline.return_value
+        channel, data = pipe.publish.call_args_list[0].args
+        assert channel == const.candle_live_channel(1, 1)
+        assert json.loads(data) == [
+            [int(date.timestamp()), 1.0, 2.0, 0.5, 1.5, 3.0],
+            [int(date.timestamp()) + 60, 1.5, 1.5, 1.5, 1.5, None],
+        ]
+        pipe.execute.assert_called_once()
+
+    def test_relay_forwards_to_group(self):
+        layer = MagicMock()
+        layer.group_send = AsyncMock()
+        relay = CandleRelay("redis://localhost", channel_layer=layer)
+
+        async_to_sync(relay.forward)(b"candles:live:4:15", b"[[0,1,1,1,1,null]]")
+
+        layer.group_send.assert_awaited_once_with(
+            "candles.4.15", {"type": "candle.bars", "bars": [[0, 1, 1, 1, 1, None]]}
+        )
+
+
+class TestSubscriptionQueue:
+
+    def request(self, stock_token):
+        return json.dumps({"stock_token": stock_token}).encode()
+
+    def test_waits_on_both_queues_and_drains_the_rest(self):
+        client = MagicMock()
+        client.blpop.return_value = (b"user:1:subscriptions", self.request("A"))
+        client.pipeline.return_value.execute.return_value = [
+            [self.request("B")],
+            [self.request("C"), self.request("B"), b"not json"],
+        ]
+
+        changes = SubscriptionQueue(client, 1).wait(1)
+
+        client.blpop.assert_called_once_with(
+            ["user:1:subscriptions", "user:1:unsubscriptions"], timeout=1
+        )
+        assert changes.subscribe == ["A"]
+        assert changes.unsubscribe == ["B", "C"]
+
+    def test_unsubscription_beats_a_later_subscription(self):
+        client = MagicMock()
+        client.blpop.return_value = (b"user:1:unsubscriptions", self.request("A"))
+        client.pipeline.return_value.execute.return_value = [
+            [self.request("A")],
+            [],
+        ]
+
+        changes = SubscriptionQueue(client, 1).wait(1)
+
+        assert changes.subscribe == []
+        assert changes.unsubscribe == ["A"]
+
+    def test_timeout_yields_no_changes(self):
+        client = MagicMock()
+        client.blpop.return_value = None
+
+        changes = SubscriptionQueue(client, 1).wait(1)
+
+        assert not changes
+        client.pipeline.assert_not_called()
+
+
+class FakeFeed:
+    def __init__(self, user_id, redis_client):
+        self.user_id = user_id
+        self.started_at = 0
+        self.alive = False
+        self.session_failed = False
+
+    def start(self):
+        self.alive = True
+
+    def stop(self, timeout=None):
+        self.alive = False
+
+    def is_alive(self):
+        return self.alive
+
+
+class TestFeedService:
+
+    @pytest.fixture(autouse=True)
+    def setup(self):
+        self.client = MagicMock()
+        self.client.smembers.return_value = {b"1", b"2"}
+        # User 2's lease is held by another process
+        self.client.set.side_effect = lambda key, *args, **kwargs: key.endswith("-1")
+        self.client.eval.return_value = 1
+        self.service = FeedService(self.client, owner="me", feed_class=FakeFeed)
+
+    def test_feeds_users_whose_lease_it_wins(self):
+        self.service.step()
+
+        assert list(self.service.feeds) == [1]
+        self.client.set.assert_any_call(
+            const.websocket_user_lock(1),
+            "me",
+            nx=True,
+            px=const.FEED_LEASE_TTL * 1000,
+        )
+
+        self.service.step()
+        feed, lease = self.service.feeds[1]
+        assert feed.is_alive()
+        self.client.eval.assert_called_once_with(
+            RENEW_SCRIPT, 1, lease.key, "me", const.FEED_LEASE_TTL * 1000
+        )
+
+    def test_stops_feed_when_lease_is_lost(self):
+        self.service.step()
+        feed, _ = self.service.feeds[1]
+        # Another process took the lease over
+        self.client.eval.return_value = 0
+        self.client.set.side_effect = None
+        self.client.set.return_value = False
+
+        self.service.step()
+
+        assert not feed.is_alive()
+        assert 1 not in self.service.feeds
+
+    def test_ended_feed_is_retried_after_backoff(self):
+        self.service.step()
+        feed, _ = self.service.feeds[1]
+        feed.alive = False
+
+        self.service.step()
+
+        assert 1 not in self.service.feeds
+        assert self.service.retries[1][1] == const.FEED_RETRY_BACKOFF
+        self.client.eval.assert_called_once()  # the release
+
+    def test_withdrawn_feed_is_stopped(self):
+        self.service.step()
+        feed, lease = self.service.feeds[1]
+        self.client.smembers.return_value = {b"2"}
+
+        self.service.step()
+
+        assert not feed.is_alive()
+        assert 1 not in self.service.feeds
+        self.client.eval.assert_called_with(RELEASE_SCRIPT, 1, lease.key, "me")
+
+    def test_users_without_a_breeze_session_are_dropped(self):
+        for _ in range(const.FEED_MAX_SESSION_FAILURES):
+            self.service.retries.clear()
+            self.service.step()
+            feed, _ = self.service.feeds[1]
+            feed.alive = False
+            feed.session_failed = True
+            self.client.srem.assert_not_called()
+
+            self.service.step()
+
+        self.client.srem.assert_called_once_with(const.FEED_USERS_KEY, 1)
+        assert 1 not in self.service.retries
+        assert 1 not in self.service.session_failures
+
+    def test_shutdown_releases_leases(self):
+        self.service.step()
+        feed, lease = self.service.feeds[1]
+
+        self.service.shutdown()
+
+        assert not feed.is_alive()
+        self.client.eval.assert_called_once_with(RELEASE_SCRIPT, 1, lease.key, "me")
+
+
+class TestRedisLock:
+
+    def test_acquire_returns_the_fencing_token(self):
+        client = MagicMock()
+        client.eval.return_value = 7
+        lock = RedisLock(client, "lock", ttl=30, owner="me")
+
+        assert lock.acquire()
+        assert lock.token == 7
+        client.eval.assert_called_once_with(
+            ACQUIRE_SCRIPT, 2, "lock", "lock:fence", "me", 30000
+        )
+
+    def test_acquire_fails_while_someone_else_holds_it(self):
+        client = MagicMock()
+        client.eval.return_value = None
+        lock = RedisLock(client, "lock", ttl=30, owner="me")
+
+        assert not lock.acquire()
+        assert lock.token is None
+
+    def test_keeper_flags_a_lost_lock(self):
+        client = MagicMock()
+        client.eval.side_effect = [1, 0]  # acquired, then the renewal fails
+        lock = RedisLock(client, "lock", ttl=30, owner="me")
+        lock.acquire()
+
+        keeper = lock.keep_alive(0.01)
+        assert keeper.lost.wait(1)
+        keeper.stop()
+
+
+class TestSingleInstanceTask:
+
+    @pytest.fixture(autouse=True)
+    def setup(self):
+        self.client = MagicMock()
+        with patch("apps.core.tasks.utils.get_cache_client", return_value=self.client):
+            yield
+
+    @patch("celery.app.task.Task.apply_async")
+    def test_dispatch_takes_the_lock_under_the_task_id(self, mock_apply_async):
+        self.client.eval.return_value = 1
+
+        sub_candle_maker.apply_async(args=[5], task_id="abc")
+
+        self.client.eval.assert_called_once_with(
+            ACQUIRE_SCRIPT,
+            2,
+            const.task_lock("sub_candle_maker", 5),
+            const.task_lock("sub_candle_maker", 5) + ":fence",
+            "abc",
+            const.TASK_LOCK_TTL * 1000,
+        )
+        mock_apply_async.assert_called_once()
+
+    @patch("celery.app.task.Task.apply_async")
+    def test_duplicate_dispatch_is_dropped(self, mock_apply_async):
+        self.client.eval.return_value = None
+
+        assert sub_candle_maker.apply_async(args=[5]) is None
+        mock_apply_async.assert_not_called()
+
+    @patch("apps.core.tasks.Tick.objects")
+    def test_run_is_skipped_while_another_holds_the_lock(self, mock_ticks):
+        self.client.eval.return_value = None
+
+        sub_candle_maker(5)
+
+        mock_ticks.filter.assert_not_called()
+
+    @patch("apps.core.tasks.Tick.objects")
+    def test_run_releases_the_lock(self, mock_ticks):
+        self.client.eval.return_value = 1
+        mock_ticks.filter.return_value.order_by.return_value.values_list.return_value = (
+            []
+        )
+
+        sub_candle_maker(5)
+
+        assert self.client.eval.call_args.args[0] == RELEASE_SCRIPT
+
+
+@pytest.mark.django_db
+class TestCandleRetention:
+
+    @pytest.fixture(autouse=True)
+    def setup(self):
+        self.exchange = Exchanges.objects.create(title="NSE")
+
+    def at(self, month, day, hour=9, minute=20):
+        return india_tz.localize(datetime(2025, month, day, hour, minute))
+
+    def write(self, instrument, *dates):
+        write_candle_bars(
+            [(instrument.id, date, 100.0, 101.0, 99.0, 100.5, 5) for date in dates]
+        )
+
+    def test_months_are_counted_in_india_time(self):
+        assert month_start(datetime(2025, 6, 30, 19, 0, tzinfo=UTC)) == (
+            india_tz.localize(datetime(2025, 7, 1))
+        )
+        assert add_months(india_tz.localize(datetime(2025, 11, 1)), 3) == (
+            india_tz.localize(datetime(2026, 2, 1))
+        )
+
+    def test_expired_contracts_keep_only_rollups(self):
+        expired = SubscribedInstruments.objects.create(
+            exchange=self.exchange, expiry=datetime(2025, 7, 31).date()
+        )
+        live = SubscribedInstruments.objects.create(exchange=self.exchange)
+        self.write(expired, self.at(7, 7), self.at(7, 8))
+        self.write(live, self.at(7, 7))
+
+        pruned = prune_expired_contracts(datetime(2025, 9, 1).date())
+
+        assert pruned == [expired.id]
+        assert not Candle.objects.filter(instrument=expired).exists()
+        assert Candle.objects.filter(instrument=live).count() == 1
+        assert CandleRollup.objects.filter(instrument=expired, timeframe=5).count() == 2
+        assert (
+            CandleRollup.objects.filter(instrument=expired, timeframe=1440).count() == 2
+        )
+
+    def test_old_minute_candles_are_downsampled_then_dropped(self):
+        instrument = SubscribedInstruments.objects.create(exchange=self.exchange)
+        self.write(instrument, self.at(6, 30), self.at(6, 30, 9, 21), self.at(7, 1))
+        # Rollups left incomplete, e.g. by a crash mid-write
+        CandleRollup.objects.filter(timeframe=5, date__lt=self.at(7, 1, 0, 0)).delete()
+
+        dropped = prune_minute_candles(india_tz.localize(datetime(2025, 7, 1)))
+
+        assert dropped == 2
+        assert list(Candle.objects.values_list("date", flat=True)) == [self.at(7, 1)]
+        assert list(
+            CandleRollup.objects.filter(timeframe=5)
+            .order_by("date")
+            .values_list("date", "volume")
+        ) == [(self.at(6, 30), 10), (self.at(7, 1), 5)]
+
+    def test_rebuilding_all_rollups_keeps_downsampled_history(self):
+        instrument = SubscribedInstruments.objects.create(exchange=self.exchange)
+        self.write(instrument, self.at(6, 30), self.at(7, 1, 9, 15), self.at(7, 1))
+        prune_minute_candles(india_tz.localize(datetime(2025, 7, 1)))
+
+        call_command("build_rollups", stdout=StringIO())
+
+        assert list(
+            CandleRollup.objects.filter(timeframe=1440)
+            .order_by("date")
+            .values_list("date", "volume")
+        ) == [(self.at(6, 30, 9, 15), 5), (self.at(7, 1, 9, 15), 10)]
+
+    def test_backfills_skip_pruned_contracts(self):
+        instrument = SubscribedInstruments.objects.create(
+            exchange=self.exchange, expiry=datetime(2020, 1, 30).date()
+        )
+        PercentageInstrument.objects.create(instrument=instrument)
+        with (
+            patch("apps.core.tasks.breeze_session_manager"),
+            patch("apps.core.tasks.fetch_historical_data") as fetch,
+        ):
+            load_instrument_candles(instrument.id, 1)
+        fetch.assert_not_called()
+        assert PercentageInstrument.objects.get(instrument=instrument).is_loading
+
+    def test_failed_backfills_stop_loading(self):
+        instrument = SubscribedInstruments.objects.create(exchange=self.exchange)
+        PercentageInstrument.objects.create(instrument=instrument)
+        with (
+            patch("apps.core.tasks.breeze_session_manager"),
+            patch(
+                "apps.core.tasks.fetch_historical_data",
+                side_effect=RuntimeError("Breeze is down"),
+            ),
+        ):
+            load_instrument_candles(instrument.id, 1)
+
+        stored = PercentageInstrument.objects.get(instrument=instrument)
+        assert (stored.percentage, stored.is_loading) == (0, True)
+
+
+@pytest.mark.django_db
+class TestCompactCandleStorage:
+
+    def test_prices_are_stored_in_paise(self):
+        exchange = Exchanges.objects.create(title="NSE")
+        instrument = SubscribedInstruments.objects.create(exchange=exchange)
+        date = india_tz.localize(datetime(2025, 7, 7, 9, 20))
+
+        stored = Candle.objects.bulk_upsert(
+            [(instrument.id, date, 100.05, 101.1, 99.95, 100.5, 5.0)], returning=True
+        )
+
+        assert stored == [(instrument.id, date, 100.05, 101.1, 99.95, 100.5, 5)]
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT open, high, low, close, volume FROM core_candle")
+            assert cursor.fetchone() == (10005, 10110, 9995, 10050, 5)
+        assert Candle.objects.get(high__gt=101.05).low == 99.95
+
+
+@pytest.mark.django_db
+class TestBulkLoad:
+
+    def test_breeze_rows_become_session_arrays(self):
+        payload = [
+            {
+                "datetime": "2025-07-07 09:15:00",
+                "open": 100,
+                "high": 101,
+                "low": 99.5,
+                "close": 100.05,
+                "volume": 10,
+            },
+            # Pre-open and weekend bars are dropped
+            {
+                "datetime": "2025-07-07 09:00:00",
+                "open": 1,
+                "high": 1,
+                "low": 1,
+                "close": 1,
+                "volume": 1,
+            },
+            {
+                "datetime": "2025-07-06 10:00:00",
+                "open": 1,
+                "high": 1,
+                "low": 1,
+                "close": 1,
+                "volume": 1,
+            },
+            # A re-sent minute replaces the earlier one
+            {
+                "datetime": "2025-07-07 09:15:00",
+                "open": "100",
+                "high": "102",
+                "low": "99.5",
+                "close": "101.5",
+                "volume": None,
+            },
+            {
+                "datetime": "2025-07-07 09:14:00",
+                "open": 1,
+                "high": 1,
+                "low": 1,
+                "close": 1,
+            },
+        ]
+
+        candles = breeze_candle_arrays(payload)
+
+        assert candles.size == 1
+        assert candles.first() == india_tz.localize(datetime(2025, 7, 7, 9, 15))
+        assert [int(column[0]) for column in candles[1:]] == [
+            10000,
+            10200,
+            9950,
+            10150,
+            0,
+        ]
+
+    def test_bars_missing_a_price_are_dropped(self):
+        def bar(minute, close):
+            return {
+                "datetime": f"2025-07-07 09:{minute}:00",
+                "open": 100,
+                "high": 101,
+                "low": 99,
+                "close": close,
+                "volume": 5,
+            }
+
+        candles = breeze_candle_arrays(
+            # A broken re-send does not replace the good bar of its minute
+            [bar(15, 100.5), bar(15, None), bar(16, float("nan")), bar(17, "101")]
+        )
+
+        assert candles.size == 2
+        assert candles.closes.tolist() == [10050, 10100]
+        assert candles.closes.min() > 0
+
+    def test_copied_candles_overwrite_stored_ones(self):
+        exchange = Exchanges.objects.create(title="NSE")
+        instrument = SubscribedInstruments.objects.create(exchange=exchange)
+        date = india_tz.localize(datetime(2025, 7, 7, 9, 16))
+        Candle.objects.bulk_upsert([(instrument.id, date, 1, 1, 1, 1, 1)])
+        candles = breeze_candle_arrays(
+            [
+                {
+                    "datetime": f"2025-07-07 09:{minute}:00",
+                    "open": 100.05,
+                    "high": 101,
+                    "low": 99,
+                    "close": 100.5,
+                    "volume": 7,
+                }
+                for minute in (15, 16)
+            ]
+        )
+
+        assert copy_candles(instrument.id, candles) == 2
+        assert list(
+            Candle.objects.order_by("date").values_list("date", "open", "volume")
+        ) == [(date - timedelta(minutes=1), 100.05, 7), (date, 100.05, 7)]
+
+
+class TestBackfillProgress:
+
+    def test_counters_are_incremented_in_one_transaction(self):
+        client = MagicMock()
+        pipe = client.pipeline.return_value
+
+        record_backfill_progress(7, chunks=1, rows=375, client=client)
+
+        client.pipeline.assert_called_once_with()
+        pipe.hincrby.assert_has_calls(
+            [
+                call("backfill:progress:7", "chunks_done", 1),
+                call("backfill:progress:7", "rows", 375),
+            ]
+        )
+        pipe.execute.assert_called_once()
+
+    @patch("apps.core.progress.time.time", return_value=1100.0)
+    def test_progress_is_read_in_one_round_trip(self, _mock_time):
+        client = MagicMock()
+        pipe = client.pipeline.return_value
+        pipe.execute.return_value = [
+            {
+                b"chunks_total": b"10",
+                b"chunks_done": b"3",
+                b"chunks_failed": b"1",
+                b"rows": b"1500",
+                b"started": b"1000.0",
+            },
+            {},
+        ]
+
+        progress = backfill_progress([7, 8], client=client)
+
+        assert pipe.hgetall.call_count == 2
+        assert progress == {
+            7: {
+                "chunks_total": 10,
+                "chunks_done": 3,
+                "chunks_failed": 1,
+                "rows": 1500,
+                "percentage": 40.0,
+                "eta": 150,
+            }
+        }
+
+    @pytest.mark.django_db
+    def test_finishing_flushes_to_the_database(self):
+        exchange = Exchanges.objects.create(title="NSE")
+        instrument = SubscribedInstruments.objects.create(exchange=exchange)
+        PercentageInstrument.objects.create(instrument=instrument)
+        client = MagicMock()
+
+        finish_backfill_progress(instrument.id, client=client)
+
+        stored = PercentageInstrument.objects.get(instrument=instrument)
+        assert (stored.percentage, stored.is_loading) == (100, True)
+        client.delete.assert_called_once_with(f"backfill:progress:{instrument.id}")
+
+    @pytest.mark.django_db
+    def test_failed_backfills_keep_the_percentage_reached(self):
+        exchange = Exchanges.objects.create(title="NSE")
+        instrument = SubscribedInstruments.objects.create(exchange=exchange)
+        PercentageInstrument.objects.create(instrument=instrument)
+        client = MagicMock()
+        client.pipeline.return_value.execute.return_value = [
+            {b"chunks_total": b"10", b"chunks_done": b"3", b"chunks_failed": b"1"}
+        ]
+
+        finish_backfill_progress(instrument.id, failed=True, client=client)
+
+        stored = PercentageInstrument.objects.get(instrument=instrument)
+        assert (stored.percentage, stored.is_loading) == (40, True)
+        client.delete.assert_called_once_with(f"backfill:progress:{instrument.id}")
+
+
+@pytest.mark.django_db
+class TestBreezeSessionManager:
+
+    @pytest.fixture(autouse=True)
+    def setup(self):
+        self.user = User.objects.create_user(
+            email="breeze@example.com", name="Breeze", password="password123"
+        )
+        self.account = BreezeAccount.objects.create(
+            user=self.user, api_key="key", api_secret="secret", session_token="token"
+        )
+        self.client = MagicMock()
+        # The shared rate limit always has a token
+        self.client.eval.return_value = 0
+        self.manager = BreezeSessionManager()
+        with patch("apps.core.breeze._client", return_value=self.client):
+            yield
+
+    def test_generated_sessions_are_shared(self):
+        self.client.get.return_value = None
+
+        def generate_session(breeze, **_credentials):
+            breeze.user_id, breeze.session_key = "U1", "S1"
+
+        with patch.object(
+            BreezeConnect,
+            "generate_session",
+            autospec=True,
+            side_effect=generate_session,
+        ):
+            self.manager.initialize_session(self.user.id)
+
+        key, material = self.client.set.call_args.args
+        assert key == f"breeze:session:{self.user.id}"
+        assert json.loads(material)["session_key"] == "S1"
+
+    def test_shared_sessions_are_restored_without_generating(self):
+        self.client.get.return_value = json.dumps(
+            {
+                "user_id": "U1",
+                "session_key": "S1",
+                "credentials": credentials_fingerprint(self.account),
+            }
+        )
+        with patch.object(BreezeConnect, "generate_session") as generate_session:
+            session = self.manager.initialize_session(self.user.id)
+
+        generate_session.assert_not_called()
+        assert (session.user_id, session.session_key, session.secret_key) == (
+            "U1",
+            "S1",
+            "secret",
+        )
+        assert session.api_handler is not None
+
+    def test_health_is_served_from_the_cache(self):
+        pipe = self.client.pipeline.return_value
+        pipe.execute.return_value = [json.dumps({"healthy": True}), 1]
+        with patch.object(self.manager, "probe") as probe:
+            assert self.manager.health(self.user.id) == {"healthy": True}
+        probe.assert_not_called()
+
+    def test_missing_health_is_probed_and_cached(self):
+        pipe = self.client.pipeline.return_value
+        pipe.execute.return_value = [None, 1]
+        session = MagicMock()
+        session.get_funds.return_value = {"Status": 200}
+        with patch.object(self.manager, "initialize_session", return_value=session):
+            verdict = self.manager.health(self.user.id)
+
+        assert verdict["healthy"]
+        key, cached = self.client.set.call_args.args
+        assert key == f"breeze:health:{self.user.id}"
+        assert json.loads(cached)["healthy"]
+
+
+class TestPooledApification:
+
+    def handler(self, session):
+        breeze = MagicMock(
+            user_id="U1", session_key="S1", api_key="key", secret_key="secret"
+        )
+        self.slots = threading.BoundedSemaphore(1)
+        return PooledApification(breeze, self.slots, session=session)
+
+    def test_historical_requests_use_the_pooled_session(self):
+        session = MagicMock()
+        session.request.return_value.json.return_value = {"Status": 200}
+        metrics = RequestMetrics()
+
+        with patch("apps.core.breeze_rest.breeze_metrics", metrics):
+            response = self.handler(session).get_historical_data_v2(
+                "1minute", "2025-07-07", "2025-07-08", "NIFTY", "NFO", "futures"
+            )
+
+        assert response == {"Status": 200}
+        method, url = session.request.call_args.args
+        assert (method, url.rsplit("/", 1)[-1]) == ("GET", "historicalcharts")
+        assert session.request.call_args.kwargs["params"] == {
+            "interval": "1minute",
+            "from_date": "2025-07-07",
+            "to_date": "2025-07-08",
+            "stock_code": "NIFTY",
+            "exch_code": "NFO",
+            "product_type": "futures",
+        }
+        assert session.request.call_args.kwargs["timeout"] == const.BREEZE_HTTP_TIMEOUT
+        assert metrics.snapshot()["historicalcharts"]["requests"] == 1
+
+    def test_failed_requests_release_their_slot(self):
+        session = MagicMock()
+        session.request.side_effect = ConnectionError("reset")
+        metrics = RequestMetrics()
+        handler = self.handler(session)
+
+        with (
+            patch("apps.core.breeze_rest.breeze_metrics", metrics),
+            pytest.raises(Exception, match="get_funds"),
+        ):
+            handler.get_funds()
+
+        assert self.slots.acquire(blocking=False)
+        assert metrics.snapshot()["funds"]["errors"] == 1
+
+
+class TestBreezeStandin:
+
+    def respond(self, standin, path, query=None, headers=None, body=None):
+        status, _, content = async_to_sync(standin.respond)(
+            path, query or {}, headers or {}, json.dumps(body).encode() if body else b""
+        )
+        return status, json.loads(content)
+
+    def test_session_matches_what_breeze_connect_decodes(self):
+        status, response = self.respond(
+            BreezeStandin(),
+            "/breezeapi/api/v1/customerdetails",
+            body={"SessionToken": "tok", "AppKey": "key"},
+        )
+
+        assert status == 200
+        token = response["Success"]["session_token"]
+        assert base64.b64decode(token).decode() == "STANDIN:tok"
+
+    def test_historical_bars_are_deterministic_session_minutes(self):
+        start = india_tz.localize(datetime(2025, 1, 6, 9, 0))
+        end = india_tz.localize(datetime(2025, 1, 6, 16, 0))
+
+        bars = historical_bars("NIFTY", "NSE", start, end)
+
+        assert len(bars) == 375
+        assert (bars[0]["datetime"], bars[-1]["datetime"]) == (
+            "2025-01-06 09:15:00",
+            "2025-01-06 15:29:00",
+        )
+        assert bars == historical_bars("NIFTY", "NSE", start, end)
+        assert breeze_candle_arrays(bars).size == 375
+
+    def test_historical_charts_cap_the_bars(self):
+        status, response = self.respond(
+            BreezeStandin(),
+            "/api/v2/historicalcharts",
+            query={
+                "interval": "1minute",
+                "from_date": "2025-01-06T09:00:00.000Z",
+                "to_date": "2025-01-10T16:00:00.000Z",
+                "stock_code": "NIFTY",
+                "exch_code": "NSE",
+            },
+            headers={"x-sessiontoken": "token", "apikey": "key"},
+        )
+
+        assert status == 200
+        assert len(response["Success"]) == const.BREEZE_HISTORICAL_MAX_BARS
+
+    def test_calls_beyond_the_rate_limit_are_refused(self):
+        standin = BreezeStandin(StandinOptions(calls_per_minute=2))
+        headers = {"x-sessiontoken": "token", "apikey": "key"}
+
+        statuses = [
+            self.respond(standin, "/breezeapi/api/v1/funds", headers=headers)[0]
+            for _ in range(3)
+        ]
+        other_key = self.respond(
+            standin,
+            "/breezeapi/api/v1/funds",
+            headers={"x-sessiontoken": "token", "apikey": "other"},
+        )[0]
+
+        assert statuses == [200, 200, 429]
+        assert other_key == 200
+        assert standin.stats["status.429"] == 1
+
+    def test_errors_are_injected(self):
+        standin = BreezeStandin(StandinOptions(error_rate=1))
+
+        status, response = self.respond(
+            standin,
+            "/breezeapi/api/v1/funds",
+            headers={"x-sessiontoken": "token", "apikey": "key"},
+        )
+
+        assert (status, response["Status"]) == (500, 500)
+
+    def test_standin_url_is_applied_when_the_app_is_ready(self, settings):
+        from breeze_connect.breeze_connect import config
+
+        original = (config.API_URL, config.BREEZE_NEW_URL, config.LIVE_STREAM_URL)
+        settings.BREEZE_STANDIN_URL = "http://127.0.0.1:8765/"
+        try:
+            apps.get_app_config("core").ready()
+
+            assert config.API_URL == "http://127.0.0.1:8765/breezeapi/api/v1/"
+            assert config.BREEZE_NEW_URL == "http://127.0.0.1:8765/api/v2/"
+            assert config.LIVE_STREAM_URL == "http://127.0.0.1:8765"
+        finally:
+            config.API_URL, config.BREEZE_NEW_URL, config.LIVE_STREAM_URL = original
+
+    def test_ticks_decode_like_breeze_quotes(self):
+        at = india_tz.localize(datetime(2025, 1, 6, 10, 0)).timestamp()
+
+        tick = BreezeConnect(api_key="key").parse_data(
+            quote_tick("4.1!2885", 1234.56, 25, at, 1200.0)
+        )
+
+        assert tick["symbol"] == "4.1!2885"
+        assert tick["last"] == 1234.55
+        assert tick["ltq"] == 25
+        assert tick["exchange"] == "NSE Equity"
+        assert tick["ltt"] == datetime.fromtimestamp(at).strftime("%c")
+
+
+class TestRateLimiter:
+
+    @patch("apps.core.breeze.time.sleep")
+    def test_waits_for_a_refill_once_the_bucket_is_empty(self, mock_sleep):
+        limiter = RateLimiter(2, period=60)
+
+        def sleep(seconds):
+            # Let the bucket see the time as having passed
+            limiter.updated_at -= seconds
+
+        mock_sleep.side_effect = sleep
+
+        limiter.acquire()
+        limiter.acquire()
+        mock_sleep.assert_not_called()
+
+        limiter.acquire()
+        mock_sleep.assert_called_once()
+        assert mock_sleep.call_args.args[0] == pytest.approx(30, abs=0.1)
+
+    @patch("apps.core.breeze.time.sleep")
+    @patch("apps.core.breeze._client")
+    def test_accounts_share_one_bucket_in_redis(self, mock_client, mock_sleep):
+        # The first call finds the bucket empty, the second gets a token
+        mock_client.return_value.eval.side_effect = [1500, 0]
+        limiter = BreezeSessionManager().get_rate_limiter(5)
+
+        limiter.acquire()
+
+        mock_sleep.assert_called_once_with(1.5)
+        mock_client.return_value.eval.assert_called_with(
+            TOKEN_BUCKET_SCRIPT, 1, "breeze:ratelimit:5", 90, 0.0015
+        )
+
+    @patch("apps.core.breeze.time.sleep")
+    @patch("apps.core.breeze._client")
+    def test_falls_back_to_a_local_bucket_without_redis(self, mock_client, mock_sleep):
+        mock_client.return_value.eval.side_effect = redis.ConnectionError("down")
+        limiter = RateLimiter(1, period=60, key="breeze:ratelimit:5")
+
+        limiter.acquire()
+        mock_sleep.assert_not_called()
+        assert limiter.tokens == pytest.approx(0, abs=0.01)
+
+
+class TestFetchHistoricalData:
+
+    PARAMS = {"stock_code": "NIFTY", "exchange_code": "NSE"}
+
+    def instrument(self):
+        instrument = MagicMock(id=1, series="FUTURE", option_type=None)
+        instrument.percentage.percentage = 0
+        return instrument
+
+    @patch("apps.core.utils.time.sleep")
+    def test_fetch_chunk_retries_with_backoff(self, mock_sleep):
+        session = MagicMock()
+        session.get_historical_data_v2.side_effect = [
+            ConnectionError("reset"),
+            {"Status": 500, "Error": "Server busy", "Success": None},
+            {"Status": 200, "Success": [{"datetime": "2025-07-07 09:15:00"}]},
+        ]
+        limiter = MagicMock()
+
+        data = fetch_chunk(
+            session,
+            self.PARAMS,
+            datetime(2025, 7, 7),
+            datetime(2025, 7, 8),
+            rate_limiter=limiter,
+        )
+
+        assert data == [{"datetime": "2025-07-07 09:15:00"}]
+        assert limiter.acquire.call_count == 3
+        assert [call.args[0] for call in mock_sleep.call_args_list] == [2, 4]
+
+    @patch("apps.core.utils.time.sleep")
+    def test_fetch_chunk_gives_up_after_retries(self, _mock_sleep):
+        session = MagicMock()
+        session.get_historical_data_v2.side_effect = ConnectionError("reset")
+        with pytest.raises(ChunkFetchError):
+            fetch_chunk(
+                session,
+                self.PARAMS,
+                datetime(2025, 7, 7),
+                datetime(2025, 7, 8),
+                retries=1,
+            )
+        assert session.get_historical_data_v2.call_count == 2
+
+    def test_fetch_chunk_treats_no_data_as_empty(self):
+        session = MagicMock()
+        session.get_historical_data_v2.return_value = {
+            "Status": 500,
+            "Error": "No Data Found",
+            "Success": None,
+        }
+        assert (
+            fetch_chunk(
+                session, self.PARAMS, datetime(2025, 7, 5), datetime(2025, 7, 6)
+            )
+            == []
+        )
+        session.get_historical_data_v2.assert_called_once()
+
+    @patch("apps.core.utils.time.sleep")
+    def test_fetches_all_chunks_and_skips_failed_ones(self, _mock_sleep):
+        def get_historical_data_v2(from_date, **_params):
+            if from_date.startswith("2025-07-03"):
+                raise ConnectionError("reset")
+            return {"Status": 200, "Success": [{"datetime": from_date}]}
+
+        session = MagicMock()
+        session.get_historical_data_v2.side_effect = get_historical_data_v2
+        batches = []
+
+        fetch_historical_data(
+            session,
+            datetime(2025, 7, 1),
+            datetime(2025, 7, 9),
+            "NIFTY",
+            None,
+            "4.1!NIFTY",
+            self.instrument(),
+            batch_callback=batches.append,
+            max_workers=2,
+        )
+
+        # 4 chunks, the one starting on the 3rd failing after 4 attempts
+        assert session.get_historical_data_v2.call_count == 7
+        assert sorted(batch[0]["datetime"][:10] for batch in batches) == [
+            "2025-07-01",
+            "2025-07-05",
+            "2025-07-07",
+        ]
+
+
+class TestTradingCalendar:
+
+    def at(self, month, day, hour=0, minute=0):
+        return india_tz.localize(datetime(2025, month, day, hour, minute))
+
+    def test_is_open_follows_sessions_and_holidays(self):
+        nse = get_calendar("nse")
+        assert nse.is_open(self.at(7, 7, 9, 15))
+        assert nse.is_open(self.at(7, 7, 15, 30))
+        assert not nse.is_open(self.at(7, 7, 15, 31))
+        assert not nse.is_open(self.at(7, 5, 10))  # Saturday
+        assert not nse.is_open(self.at(8, 15, 10))  # Independence Day
+        assert nse.is_open(self.at(2, 1, 10))  # Budget day Saturday session
+
+    def test_current_year_holidays_are_closed(self):
+        nse = get_calendar("NSE")
+        assert not nse.is_trading_day(datetime(2026, 10, 20).date())  # Dussehra
+        assert nse.is_trading_day(datetime(2026, 2, 1).date())  # Budget Sunday
+
+    def test_years_without_holidays_warn_once(self, caplog):
+        calendar = TradingCalendar("TEST", holiday_years=frozenset({2025}))
+
+        with patch("apps.core.trading_calendar._years_without_holidays", set()):
+            calendar.sessions(datetime(2025, 7, 7).date())
+            calendar.sessions(datetime(2031, 7, 7).date())
+            calendar.sessions(datetime(2031, 7, 8).date())
+            TradingCalendar("OTHER", holiday_years=frozenset()).sessions(
+                datetime(2031, 7, 7).date()
+            )
+
+        warnings = [r.message for r in caplog.records if r.levelname == "WARNING"]
+        assert warnings == [
+            "No holiday list for 2031; its holidays are taken as trading days. "
+            "Add them to NSE_HOLIDAYS."
+        ]
+
+    def test_unknown_exchanges_fall_back_to_nse_with_one_warning(self, caplog):
+        calendars = [get_calendar("NOPE") for _ in range(3)]
+
+        assert calendars == [get_calendar("NSE")] * 3
+        warnings = [r.message for r in caplog.records if r.levelname == "WARNING"]
+        assert warnings == ["No trading calendar for exchange NOPE; using NSE."]
+
+    def test_muhurat_session_replaces_regular_hours(self):
+        nfo = get_calendar("NFO")
+        assert not nfo.is_open(self.at(10, 21, 10))
+        assert nfo.is_open(self.at(10, 21, 14))
+        assert nfo.sessions(self.at(10, 21).date())[0].close == self.at(10, 21, 14, 45)
+
+    def test_next_session(self):
+        nse = get_calendar("NSE")
+        # In progress
+        assert nse.next_session(self.at(7, 7, 10)).open == self.at(7, 7, 9, 15)
+        # After Thursday's close, skipping the holiday and the weekend
+        assert nse.next_session(self.at(8, 14, 16)).open == self.at(8, 18, 9, 15)
+        # Across the year boundary
+        assert nse.next_session(self.at(12, 31, 16)).open == india_tz.localize(
+            datetime(2026, 1, 1, 9, 15)
+        )
+
+    def test_unknown_exchange_uses_nse(self):
+        assert get_calendar("XYZ") is get_calendar("NSE")
+        assert get_calendar(None) is get_calendar("NSE")
+
+    def test_sessions_between_are_clipped(self):
+        sessions = get_calendar().sessions_between(
+            self.at(8, 14, 12), self.at(8, 18, 10)
+        )
+        assert sessions == [
+            (self.at(8, 14, 12), self.at(8, 14, 15, 30)),
+            (self.at(8, 18, 9, 15), self.at(8, 18, 10)),
+        ]
+
+
+@pytest.mark.django_db
+class TestPlanBackfill:
+
+    @pytest.fixture(autouse=True)
+    def setup(self):
+        exchange = Exchanges.objects.create(title="NSE")
+        self.instrument = SubscribedInstruments.objects.create(exchange=exchange)
+
+    def store_session(self, day, start=(9, 15), end=(15, 30)):
+        first = india_tz.localize(datetime.combine(day, datetime.min.time())).replace(
+            hour=start[0], minute=start[1]
+        )
+        minutes = int(
+            (first.replace(hour=end[0], minute=end[1]) - first).total_seconds() // 60
+        )
+        Candle.objects.bulk_upsert(
+            [
+                (self.instrument.id, first + timedelta(minutes=i), 1, 1, 1, 1, 1)
+                for i in range(minutes + 1)
+            ]
+        )
+
+    def at(self, day, hour, minute):
+        return india_tz.localize(datetime(2025, 7, day, hour, minute))
+
+    def test_empty_history_skips_weekends_and_holidays(self):
+        # Fri 4th .. Wed 9th, with the 8th a holiday
+        calendar = TradingCalendar("TEST", holidays={datetime(2025, 7, 8).date()})
+        chunks = plan_backfill(
+            self.instrument.id, self.at(4, 0, 0), self.at(9, 23, 0), calendar
+        )
+        assert chunks == [
+            (self.at(4, 9, 15), self.at(7, 15, 30)),
+            (self.at(9, 9, 15), self.at(9, 15, 30)),
+        ]
+
+    def test_covered_sessions_are_skipped(self):
+        self.store_session(datetime(2025, 7, 7).date())
+        self.store_session(datetime(2025, 7, 8).date())
+        chunks = plan_backfill(self.instrument.id, self.at(7, 0, 0), self.at(9, 23, 0))
+        assert chunks == [(self.at(9, 9, 15), self.at(9, 15, 30))]
+
+    def test_internal_gap_is_requested(self):
+        self.store_session(datetime(2025, 7, 7).date(), end=(11, 0))
+        self.store_session(datetime(2025, 7, 7).date(), start=(13, 0))
+        assert coverage_index(
+            self.instrument.id, self.at(7, 0, 0), self.at(7, 23, 0)
+        ) == [
+            (self.at(7, 9, 15), self.at(7, 11, 0)),
+            (self.at(7, 13, 0), self.at(7, 15, 30)),
+        ]
+        assert plan_backfill(
+            self.instrument.id, self.at(7, 0, 0), self.at(7, 23, 0)
+        ) == [(self.at(7, 11, 0), self.at(7, 13, 0))]
+
+    def test_short_holes_are_tolerated(self):
+        self.store_session(datetime(2025, 7, 7).date(), end=(11, 0))
+        self.store_session(datetime(2025, 7, 7).date(), start=(11, 10))
+        assert (
+            plan_backfill(self.instrument.id, self.at(7, 0, 0), self.at(7, 23, 0)) == []
+        )
@@ -0,0 +1,256 @@
+from collections.abc import Callable
+from datetime import datetime
+import logging
+import threading
+import time as PythonTime
+
+from pytz import timezone
+
+from apps.core.models import SubscribedInstruments
+from apps.core.trading_calendar import get_calendar
+from main import const
+
+logger = logging.getLogger(__name__)
+
+india_tz = timezone("Asia/Kolkata")
+
+
+class TickBuffer:
+    """
+    Coalesces ticks coming from the Breeze socket callback into micro-batches.
+
+    ``add`` is cheap and safe to call from the socket thread; a background
+    flusher thread hands the accumulated ticks to ``flush_callback`` whenever
+    ``max_size`` ticks are pending or ``max_wait`` seconds have passed since the
+    first pending tick, whichever comes first.
+    """
+
+    def __init__(
+        self,
+        flush_callback: Callable[[list], object],
+        max_size: int = const.TICK_BATCH_MAX_SIZE,
+        max_wait: float = const.TICK_BATCH_MAX_WAIT,
+    ):
+        self.flush_callback = flush_callback
+        self.max_size = max_size
+        self.max_wait = max_wait
+        self._pending = []
+        self._first_tick_at = None
+        self._condition = threading.Condition()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def __len__(self):
+        with self._condition:
+            return len(self._pending)
+
+    def add(self, tick: dict):
+        """
+        Queues a single tick. Wakes the flusher to start the batch window on the
+        first pending tick and again once the batch is full.
+        """
+        with self._condition:
+            if not self._pending:
+                self._first_tick_at = PythonTime.monotonic()
+            self._pending.append(tick)
+            if len(self._pending) == 1 or len(self._pending) >= self.max_size:
+                self._condition.notify()
+
+    def start(self):
+        """
+        Starts the background flusher thread.
+        """
+        if self._thread and self._thread.is_alive():
+            return
+        self._stopped.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="tick-buffer-flusher", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self, flush: bool = True):
+        """
+        Stops the flusher thread, optionally flushing whatever is still pending.
+        """
+        self._stopped.set()
+        with self._condition:
+            self._condition.notify()
+        if self._thread:
+            self._thread.join(timeout=max(self.max_wait * 4, 1))
+            self._thread = None
+        if flush:
+            self.flush()
+
+    def flush(self) -> int:
+        """
+        Hands all pending ticks to the flush callback.
+
+        Returns:
+            int: The number of ticks handed over.
+        """
+        with self._condition:
+            batch = self._drain()
+        return self._deliver(batch)
+
+    def _drain(self) -> list:
+        batch, self._pending = self._pending, []
+        self._first_tick_at = None
+        return batch
+
+    def _deliver(self, batch: list) -> int:
+        if not batch:
+            return 0
+        try:
+            self.flush_callback(batch)
+        except Exception as e:
+            logger.error(
+                f"Error flushing batch of {len(batch)} ticks: {e}", exc_info=True
+            )
+        return len(batch)
+
+    def _run(self):
+        while not self._stopped.is_set():
+            with self._condition:
+                while not self._stopped.is_set():
+                    if len(self._pending) >= self.max_size:
+                        break
+                    if self._pending:
+                        remaining = self.max_wait - (
+                            PythonTime.monotonic() - self._first_tick_at
+                        )
+                        if remaining <= 0:
+                            break
+                        self._condition.wait(timeout=remaining)
+                    else:
+                        self._condition.wait(timeout=self.max_wait)
+                batch = self._drain()
+            self._deliver(batch)
+
+
+class InstrumentIndex:
+    """
+    In-process map of stock tokens to subscribed instrument IDs and calendars.
+
+    All subscribed instruments are loaded on first use, so resolving ticks
+    normally costs no query. Symbols missing from the map are looked up in one
+    query per batch and, when still unknown, not looked up again for
+    ``INSTRUMENT_MISS_TTL`` seconds. Call ``invalidate`` when subscriptions
+    change.
+    """
+
+    def __init__(self):
+        self._instruments = None
+        self._misses = {}
+        self._lock = threading.Lock()
+
+    def resolve(self, symbols: set) -> dict:
+        """
+        Maps the given stock tokens to ``(instrument_id, calendar)``; unknown
+        symbols are left out.
+        """
+        with self._lock:
+            if self._instruments is None:
+                self._instruments = self._load()
+            found = {
+                symbol: self._instruments[symbol]
+                for symbol in symbols
+                if symbol in self._instruments
+            }
+            now = PythonTime.monotonic()
+            missing = {
+                symbol
+                for symbol in symbols - found.keys()
+                if self._misses.get(symbol, 0) <= now
+            }
+            if missing:
+                loaded = self._load(missing)
+                self._instruments.update(loaded)
+                found.update(loaded)
+                for symbol in missing - loaded.keys():
+                    self._misses[symbol] = now + const.INSTRUMENT_MISS_TTL
+            return found
+
+    def invalidate(self, stock_token: str | None = None):
+        """
+        Forgets one stock token, or everything when none is given.
+        """
+        with self._lock:
+            if stock_token is None:
+                self._instruments = None
+                self._misses.clear()
+            else:
+                if self._instruments is not None:
+                    self._instruments.pop(stock_token, None)
+                self._misses.pop(stock_token, None)
+
+    def _load(self, symbols: set | None = None) -> dict:
+        qs = SubscribedInstruments.objects.exclude(stock_token=None)
+        if symbols is not None:
+            qs = qs.filter(stock_token__in=symbols)
+        return {
+            stock_token: (instrument_id, get_calendar(exchange))
+            for stock_token, instrument_id, exchange in qs.values_list(
+                "stock_token", "id", "exchange__exchange"
+            )
+        }
+
+
+instrument_index = InstrumentIndex()
+
+
+def parse_tick_batch(ticks: list) -> list:
+    """
+    Resolves a batch of raw Breeze ticks to instrument IDs through
+    ``instrument_index`` and parses their timestamps. Ticks stamped outside a
+    trading session of the instrument's exchange are dropped.
+
+    Args:
+        ticks (list): Tick dictionaries with keys 'ltt', 'symbol', 'last' and 'ltq'.
+
+    Returns:
+        list: ``(instrument_id, date, ltp, ltq)`` tuples with timezone-aware dates,
+        in arrival order. Ticks for unknown symbols, and ticks missing their
+        price or time or with an unreadable time, are dropped.
+    """
+    if not ticks:
+        return []
+
+    instruments = instrument_index.resolve({tick.get("symbol") for tick in ticks})
+
+    # Ticks of a batch share a handful of timestamps; parse and check each once
+    parsed_dates = {}
+    rows = []
+    missing = set()
+    malformed = []
+    closed = 0
+    for tick in ticks:
+        instrument = instruments.get(tick.get("symbol"))
+        if instrument is None:
+            missing.add(tick.get("symbol"))
+            continue
+        instrument_id, calendar = instrument
+        try:
+            ltt = tick["ltt"]
+            ltp = tick["last"]
+            parsed = parsed_dates.get((calendar, ltt))
+            if parsed is None:
+                date = india_tz.localize(datetime.strptime(ltt, "%a %b %d %H:%M:%S %Y"))
+                parsed = parsed_dates[(calendar, ltt)] = (date, calendar.is_open(date))
+        except (KeyError, TypeError, ValueError):
+            malformed.append(tick)
+            continue
+        date, is_open = parsed
+        if not is_open:
+            closed += 1
+            continue
+        rows.append((instrument_id, date, ltp, tick.get("ltq") or 0))
+
+    if malformed:
+        logger.warning(
+            f"Skipped {len(malformed)} malformed ticks, e.g. {malformed[0]!r}."
+        )
+    if missing:
+        logger.warning(f"No subscribed instrument found for symbols: {missing}")
+    if closed:
+        logger.info(f"{closed} ticks received outside of market hours. Ignored.")
+    return rows
@@ -0,0 +1,287 @@
+from datetime import date, datetime, time, timedelta
+from functools import cache
+import logging
+import threading
+from typing import NamedTuple
+
+from pytz import timezone
+
+logger = logging.getLogger(__name__)
+
+india_tz = timezone("Asia/Kolkata")
+
+EQUITY_HOURS = (time(9, 15), time(15, 30))
+COMMODITY_HOURS = (time(9, 0), time(23, 30))
+
+# Trading holidays published by NSE; BSE and the derivative segments follow the
+# same list. Extend this when the exchange circulates the next year's calendar.
+NSE_HOLIDAYS = frozenset(
+    {
+        # 2024
+        date(2024, 1, 22),
+        date(2024, 1, 26),
+        date(2024, 3, 8),
+        date(2024, 3, 25),
+        date(2024, 3, 29),
+        date(2024, 4, 11),
+        date(2024, 4, 17),
+        date(2024, 5, 1),
+        date(2024, 5, 20),
+        date(2024, 6, 17),
+        date(2024, 7, 17),
+        date(2024, 8, 15),
+        date(2024, 10, 2),
+        date(2024, 11, 1),
+        date(2024, 11, 15),
+        date(2024, 11, 20),
+        date(2024, 12, 25),
+        # 2025
+        date(2025, 2, 26),
+        date(2025, 3, 14),
+        date(2025, 3, 31),
+        date(2025, 4, 10),
+        date(2025, 4, 14),
+        date(2025, 4, 18),
+        date(2025, 5, 1),
+        date(2025, 8, 15),
+        date(2025, 8, 27),
+        date(2025, 10, 2),
+        date(2025, 10, 21),
+        date(2025, 10, 22),
+        date(2025, 11, 5),
+        date(2025, 12, 25),
+        # 2026
+        date(2026, 1, 26),
+        date(2026, 3, 3),
+        date(2026, 3, 26),
+        date(2026, 3, 31),
+        date(2026, 4, 3),
+        date(2026, 4, 14),
+        date(2026, 5, 1),
+        date(2026, 5, 28),
+        date(2026, 6, 26),
+        date(2026, 9, 14),
+        date(2026, 10, 2),
+        date(2026, 10, 20),
+        date(2026, 11, 10),
+        date(2026, 11, 24),
+        date(2026, 12, 25),
+        # 2027: fixed-date holidays only until the circular is out
+        date(2027, 1, 26),
+        date(2027, 4, 14),
+    }
+)
+# Years whose full holiday list is above; other years log a warning once
+NSE_HOLIDAY_YEARS = frozenset({2024, 2025, 2026})
+
+# Sessions that replace the regular hours of a day: muhurat trading on Diwali
+# and the Saturday sessions called for the budget or to make up for holidays.
+NSE_SPECIAL_SESSIONS = {
+    date(2024, 1, 20): (EQUITY_HOURS,),
+    date(2024, 11, 1): ((time(18, 0), time(19, 0)),),
+    date(2025, 2, 1): (EQUITY_HOURS,),
+    date(2025, 10, 21): ((time(13, 45), time(14, 45)),),
+    # Budget day; add the 2026 muhurat session once its hours are circulated
+    date(2026, 2, 1): (EQUITY_HOURS,),
+}
+
+# Years already warned about, so each is reported once per process
+_years_without_holidays = set()
+
+
+class Session(NamedTuple):
+    open: datetime
+    close: datetime
+
+
+class TradingCalendar:
+    """
+    Trading sessions of a single exchange.
+
+    Sessions are precomputed a year at a time on first use, after which
+    ``is_open``, ``sessions`` and ``next_session`` are dictionary lookups instead
+    of date arithmetic on every call.
+    """
+
+    def __init__(
+        self,
+        exchange: str,
+        hours: tuple = EQUITY_HOURS,
+        holidays=frozenset(),
+        special_sessions: dict | None = None,
+        holiday_years=None,
+    ):
+        self.exchange = exchange
+        self.open_time, self.close_time = hours
+        self.holidays = frozenset(holidays)
+        self.special_sessions = special_sessions or {}
+        # Years covered by ``holidays``; None when the calendar keeps none
+        self.holiday_years = holiday_years
+        self._years = {}
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return f"<TradingCalendar {self.exchange}>"
+
+    @property
+    def bucket_anchor(self) -> datetime:
+        """
+        Timestamp that aligns resampled buckets with the regular session open.
+        """
+        return india_tz.localize(datetime.combine(date(1970, 1, 1), self.open_time))
+
+    def sessions(self, day: date) -> tuple:
+        """
+        Returns the sessions held on ``day``; empty on weekends and holidays.
+        """
+        return self._year(day.year)[0].get(day, ())
+
+    def is_trading_day(self, day: date) -> bool:
+        return bool(self.sessions(day))
+
+    def is_open(self, at: datetime | None = None) -> bool:
+        """
+        Checks whether ``at`` (defaults to now) falls inside a session,
+        both ends included.
+        """
+        at = (at or datetime.now(india_tz)).astimezone(india_tz)
+        for session in self.sessions(at.date()):
+            if session.open <= at <= session.close:
+                return True
+        return False
+
+    def next_session(self, at: datetime | None = None) -> Session | None:
+        """
+        Returns the session in progress at ``at`` (defaults to now), or the next
+        one to open. ``None`` past the last precomputable year.
+        """
+        at = (at or datetime.now(india_tz)).astimezone(india_tz)
+        for session in self.sessions(at.date()):
+            if at <= session.close:
+                return session
+
+        day = at.date() + timedelta(days=1)
+        for year in range(day.year, day.year + 2):
+            _, ordered, first_index = self._year(year)
+            index = first_index.get(day, 0) if year == day.year else 0
+            if index < len(ordered):
+                return ordered[index]
+        return None
+
+    def sessions_between(self, start: datetime, end: datetime) -> list:
+        """
+        Lists the sessions overlapping ``[start, end]``, clipped to it.
+        """
+        start = start.astimezone(india_tz)
+        end = end.astimezone(india_tz)
+        clipped = []
+        day = start.date()
+        while day <= end.date():
+            for session in self.sessions(day):
+                if session.close <= start or session.open >= end:
+                    continue
+                clipped.append(
+                    Session(max(session.open, start), min(session.close, end))
+                )
+            day += timedelta(days=1)
+        return clipped
+
+    def trading_days(self, start: date, end: date) -> list:
+        """
+        Lists the days between ``start`` and ``end`` (inclusive) with a session.
+        """
+        days = []
+        day = start
+        while day <= end:
+            if self.sessions(day):
+                days.append(day)
+            day += timedelta(days=1)
+        return days
+
+    def _year(self, year: int) -> tuple:
+        cached = self._years.get(year)
+        if cached is None:
+            with self._lock:
+                cached = self._years.get(year)
+                if cached is None:
+                    cached = self._years[year] = self._build_year(year)
+        return cached
+
+    def _build_year(self, year: int) -> tuple:
+        if (
+            self.holiday_years is not None
+            and year not in self.holiday_years
+            and year not in _years_without_holidays
+        ):
+            _years_without_holidays.add(year)
+            logger.warning(
+                f"No holiday list for {year}; its holidays are taken as trading "
+                "days. Add them to NSE_HOLIDAYS."
+            )
+        by_day = {}
+        ordered = []
+        # Index of the first session on or after each calendar day
+        first_index = {}
+        day = date(year, 1, 1)
+        while day.year == year:
+            first_index[day] = len(ordered)
+            if day in self.special_sessions:
+                hours = self.special_sessions[day]
+            elif day.weekday() < 5 and day not in self.holidays:
+                hours = ((self.open_time, self.close_time),)
+            else:
+                hours = ()
+            if hours:
+                sessions = tuple(
+                    Session(
+                        india_tz.localize(datetime.combine(day, opens)),
+                        india_tz.localize(datetime.combine(day, closes)),
+                    )
+                    for opens, closes in hours
+                )
+                by_day[day] = sessions
+                ordered.extend(sessions)
+            day += timedelta(days=1)
+        return by_day, ordered, first_index
+
+
+NSE_CALENDAR = (EQUITY_HOURS, NSE_HOLIDAYS, NSE_SPECIAL_SESSIONS, NSE_HOLIDAY_YEARS)
+
+EXCHANGE_CALENDARS = {
+    "NSE": NSE_CALENDAR,
+    "BSE": NSE_CALENDAR,
+    "NFO": NSE_CALENDAR,
+    "BFO": NSE_CALENDAR,
+    # MCX keeps its own holiday list with evening sessions; only weekends for now
+    "MCX": (COMMODITY_HOURS, frozenset(), {}, None),
+}
+
+
+def get_calendar(exchange: str | None = "NSE") -> TradingCalendar:
+    """
+    Returns the shared calendar of an exchange code such as 'NSE' or 'NFO'.
+    Unknown codes fall back to the NSE calendar.
+    """
+    return _calendar(_calendar_code((exchange or "NSE").upper()))
+
+
+@cache
+def _calendar_code(code: str) -> str:
+    # Cached, so an unknown code is warned about once rather than on every batch
+    if code not in EXCHANGE_CALENDARS:
+        logger.warning(f"No trading calendar for exchange {code}; using NSE.")
+        return "NSE"
+    return code
+
+
+@cache
+def _calendar(code: str) -> TradingCalendar:
+    hours, holidays, special_sessions, holiday_years = EXCHANGE_CALENDARS[code]
+    return TradingCalendar(code, hours, holidays, special_sessions, holiday_years)
+
+
+def instrument_calendar(instrument) -> TradingCalendar:
+    """
+    Returns the calendar of a subscribed instrument's exchange.
+    """
+    return get_calendar(instrument.exchange.exchange)
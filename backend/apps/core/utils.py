@@ -1,4 +1,7 @@
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime, timedelta
+import logging
+import time
 
 from django.db import models
 from django.db.models import (
@@ -12,9 +15,116 @@ from django.db.models import (
 )
 from django.db.models.functions import Coalesce, FirstValue, RowNumber
 
-from apps.core.breeze import BreezeConnect
+from apps.core.breeze import BreezeConnect, RateLimiter
 from apps.core.helper import date_parser
-from apps.core.models import Candle, SubscribedInstruments
+from apps.core.models import Candle, CandleRollup, SubscribedInstruments
+from apps.core.progress import record_backfill_progress, start_backfill_progress
+from apps.core.trading_calendar import TradingCalendar, get_calendar
+from main import const
+
+logger = logging.getLogger(__name__)
+
+
+class ChunkFetchError(Exception):
+    """
+    Raised when Breeze keeps failing for a chunk after all retries.
+    """
+
+
+def build_date_ranges(start: datetime, end: datetime, chunk_size: timedelta) -> list:
+    """
+    Splits ``[start, end)`` into consecutive ranges of at most ``chunk_size``.
+    """
+    date_ranges = []
+    current_date = start
+    while current_date < end:
+        range_end = min(current_date + chunk_size, end)
+        date_ranges.append((current_date, range_end))
+        current_date = range_end
+    return date_ranges
+
+
+def fetch_chunk(
+    breeze_session: BreezeConnect,
+    params: dict,
+    current_start: datetime,
+    current_end: datetime,
+    rate_limiter: RateLimiter | None = None,
+    retries: int = const.BACKFILL_CHUNK_RETRIES,
+) -> list:
+    """
+    Fetches one chunk of 1-minute bars, waiting on the account's rate limiter
+    before every request and retrying failed requests with exponential backoff.
+
+    Returns:
+        list: The bars returned by Breeze (empty when the range has no data).
+
+    Raises:
+        ChunkFetchError: If every attempt failed.
+    """
+    backoff = const.BACKFILL_RETRY_BACKOFF
+    last_error = None
+    for attempt in range(retries + 1):
+        if attempt:
+            time.sleep(backoff)
+            backoff = min(backoff * 2, const.BACKFILL_RETRY_BACKOFF_MAX)
+        if rate_limiter:
+            rate_limiter.acquire()
+
+        request_start = time.monotonic()
+        try:
+            response = breeze_session.get_historical_data_v2(
+                interval="1minute",
+                from_date=date_parser(current_start),
+                to_date=date_parser(current_end),
+                **params,
+            )
+        except Exception as e:
+            last_error = e
+        else:
+            logger.debug(
+                f"API request for {params['stock_code']} {current_start} - {current_end} "
+                f"completed in {time.monotonic() - request_start:.2f}s"
+            )
+            if response.get("Status") in (200, None) or response.get("Success"):
+                return response.get("Success") or []
+            last_error = response.get("Error") or response
+            if "no data" in str(last_error).lower():
+                return []
+
+        logger.warning(
+            f"Attempt {attempt + 1}/{retries + 1} failed for {params['stock_code']} "
+            f"{current_start} - {current_end}: {last_error}"
+        )
+
+    raise ChunkFetchError(
+        f"Giving up on {params['stock_code']} {current_start} - {current_end}: {last_error}"
+    )
+
+
+def historical_data_params(
+    short_name: str, expiry: datetime, stock_token: str, instrument
+) -> dict:
+    """
+    Builds the instrument-specific arguments of ``get_historical_data_v2``.
+    """
+    if instrument.series.upper() == "OPTION":
+        return {
+            "stock_code": short_name,
+            "exchange_code": "NFO",
+            "product_type": "options",
+            "expiry_date": date_parser(expiry) if expiry else None,
+            "right": "call" if instrument.option_type.upper() == "CE" else "put",
+            "strike_price": str(instrument.strike_price),
+        }
+    return {
+        "stock_code": short_name,
+        "exchange_code": "NSE" if stock_token.startswith("4") else "BSE",
+        "product_type": "futures",
+        "expiry_date": None,
+        "right": None,
+        "strike_price": None,
+    }
 
 
 def fetch_historical_data(
@@ -27,10 +137,18 @@ def fetch_historical_data(
     instrument: SubscribedInstruments,
     batch_callback=None,
     reverse_order=True,
+    rate_limiter: RateLimiter | None = None,
+    max_workers: int = const.BACKFILL_MAX_WORKERS,
+    date_ranges: list | None = None,
 ) -> list:
     """
     Fetches historical data from the Breeze API for the given instrument within the specified date range.
 
+    The range is split into 2-day chunks which are requested concurrently. Every
+    request first takes a token from ``rate_limiter`` (share one per Breeze account
+    to stay within its API quota) and failed chunks are retried with backoff.
+    Batches are handed to ``batch_callback`` on the calling thread as they arrive.
+
     Args:
         breeze_session (BreezeConnect): The Breeze session for API communication.
         start (datetime): The start datetime for fetching data.
@@ -40,126 +158,79 @@ def fetch_historical_data(
         stock_token (str): The stock token identifier.
         instrument (SubscribedInstruments): The subscribed instrument instance.
         batch_callback (function, optional): Callback function to process data batches as they are fetched.
-        reverse_order (bool, optional): Whether to fetch data in reverse chronological order (newest first).
+        reverse_order (bool, optional): Whether to request newer chunks first.
+        rate_limiter (RateLimiter, optional): Limiter shared by all requests of the account.
+        max_workers (int, optional): Maximum number of concurrent requests.
+        date_ranges (list, optional): Explicit ``(start, end)`` requests, e.g. from
+            ``plan_backfill``, used instead of chunking ``start``-``end``.
 
     Returns:
         list: A list of historical data dictionaries if no callback is provided.
     """
     data = []
-    chunk_size = timedelta(days=2)  # Fetch data in 2-day chunks
-    diff: timedelta = end - start
-    total_days = diff.days + 1
-    _ = max((total_days + 1) // 2, 1)  # Calculate number of chunks
-
-    # Create a list of date ranges to process
-    date_ranges = []
-    current_date = start
-    while current_date < end:
-        range_end = min(current_date + chunk_size, end)
-        date_ranges.append((current_date, range_end))
-        current_date = range_end
+    if date_ranges is None:
+        # Fetch data in 2-day chunks
+        date_ranges = build_date_ranges(start, end, timedelta(days=2))
+    else:
+        date_ranges = list(date_ranges)
 
     # Reverse the date ranges if needed (process newest data first)
     if reverse_order:
         date_ranges.reverse()
 
     try:
-        # Initialize the progress
-        instrument.percentage.percentage = 5
-        instrument.percentage.save()
+        # Progress is counted in Redis; the database only sees the end of it
+        start_backfill_progress(instrument.id, len(date_ranges))
 
+        params = historical_data_params(short_name, expiry, stock_token, instrument)
         total_chunks = len(date_ranges)
-        completed_chunks = 0
-
-        for current_start, current_end in date_ranges:
-            fetch_start_time = datetime.now()
-
-            # Prepare API parameters
-            if instrument.series.upper() == "OPTION":
-                market = "NFO"
-                product_type = "options"
-                option_type = (
-                    "call" if instrument.option_type.upper() == "CE" else "put"
-                )
-                strike_price = str(instrument.strike_price)
-                expiry_date = date_parser(expiry) if expiry else None
-            else:
-                market = "NSE" if stock_token.startswith("4") else "BSE"
-                product_type = "futures"
-                option_type = None
-                strike_price = None
-                expiry_date = None
-
-            # Add a timeout to the API call
-            try:
-                # Log the API request
-                print(
-                    f"Requesting data for {short_name} from {current_start} to {current_end}..."
-                )
-
-                current_data = breeze_session.get_historical_data_v2(
-                    interval="1minute",
-                    from_date=date_parser(current_start),
-                    to_date=date_parser(current_end),
-                    stock_code=short_name,
-                    exchange_code=market,
-                    product_type=(
-                        product_type
-                        if instrument.series.upper() != "OPTION"
-                        else "options"
-                    ),
-                    expiry_date=expiry_date,
-                    right=option_type,
-                    strike_price=strike_price if strike_price else None,
-                )
-
-                # Calculate and log the API response time
-                api_time = datetime.now() - fetch_start_time
-                print(
-                    f"API request completed in {api_time.total_seconds():.2f} seconds"
-                )
-
-                fetched_data = current_data.get("Success", [])
+        failed_ranges = []
+
+        with ThreadPoolExecutor(
+            max_workers=max(1, min(max_workers, total_chunks or 1)),
+            thread_name_prefix=f"backfill-{instrument.id}",
+        ) as executor:
+            futures = {
+                executor.submit(
+                    fetch_chunk,
+                    breeze_session,
+                    params,
+                    current_start,
+                    current_end,
+                    rate_limiter,
+                ): (current_start, current_end)
+                for current_start, current_end in date_ranges
+            }
+            for future in as_completed(futures):
+                current_start, current_end = futures[future]
+                try:
+                    fetched_data = future.result()
+                except ChunkFetchError as e:
+                    logger.error(str(e))
+                    failed_ranges.append((current_start, current_end))
+                    record_backfill_progress(instrument.id, failed=1)
+                    continue
 
                 if fetched_data:
                     # If a callback is provided, process the batch immediately
                     if batch_callback and callable(batch_callback):
-                        process_start_time = datetime.now()
                         batch_callback(fetched_data)
-                        process_time = datetime.now() - process_start_time
-                        print(
-                            f"Batch processing completed in {process_time.total_seconds():.2f} seconds"
-                        )
                     # Otherwise collect data for the traditional return method
                     else:
                         data.extend(fetched_data)
-
-                    print(
+                    logger.info(
                         f"Fetched {len(fetched_data)} data points for instrument {short_name} from {current_start} to {current_end}."
                     )
-                else:
-                    print(
-                        f"No data returned for period {current_start} to {current_end}"
-                    )
 
-            except Exception as inner_e:
-                print(
-                    f"Error fetching chunk {current_start} to {current_end}: {inner_e}"
-                )
-                # Continue with next chunk despite errors
+                record_backfill_progress(instrument.id, chunks=1)
 
-            # Update progress
-            completed_chunks += 1
-            progress = 5 + (completed_chunks / total_chunks * 85)  # Scale to 5-90%
-            instrument.percentage.percentage = min(progress, 90)
-            instrument.percentage.save()
-
-        # Final update to set percentage to 90% before completion
-        instrument.percentage.percentage = 90
-        instrument.percentage.save()
+        if failed_ranges:
+            logger.error(
+                f"{len(failed_ranges)} of {total_chunks} chunks failed for instrument {short_name}: {failed_ranges}"
+            )
 
     except Exception as e:
-        print(
+        logger.error(
             f"Error in fetch_historical_data for instrument {short_name}: {e}",
             exc_info=True,
         )
@@ -168,8 +239,28 @@ def fetch_historical_data(
     return data
 
 
-def resample_qs(inst_id: int, minutes: int):
-    anchor = "1970-01-01 09:15:00+05:30"  # NSE session open
+def stored_candles_qs(inst_id: int, minutes: int):
+    """
+    Reads stored candles, 1-minute ones or a pre-aggregated rollup timeframe,
+    in the shape returned by ``resample_qs``.
+    """
+    if minutes == 1:
+        qs = Candle.objects.filter(instrument_id=inst_id)
+    else:
+        qs = CandleRollup.objects.filter(instrument_id=inst_id, timeframe=minutes)
+    return qs.order_by("-date").values(
+        bucket=F("date"),
+        o=F("open"),
+        h_=F("high"),
+        l_=F("low"),
+        c=F("close"),
+        v_=F("volume"),
+    )
+
+
+def resample_qs(inst_id: int, minutes: int, calendar: TradingCalendar | None = None):
+    # Buckets start at the session open of the instrument's exchange
+    anchor = (calendar or get_calendar()).bucket_anchor
     bucket = Func(
         Value(f"{minutes} minutes"),
         F("date"),
@@ -192,7 +283,7 @@ def resample_qs(inst_id: int, minutes: int):
             ),  # ← and here
             h_=Window(Max("high"), partition_by=[F("bucket")]),
             l_=Window(Min("low"), partition_by=[F("bucket")]),
-            v_=Window(Sum(Coalesce("volume", Value(0.0))), partition_by=[F("bucket")]),
+            v_=Window(Sum(Coalesce("volume", Value(0))), partition_by=[F("bucket")]),
             rn=Window(
                 RowNumber(), partition_by=[F("bucket")], order_by=F("date").asc()
             ),
@@ -5,7 +5,9 @@ import logging
 
 from django.core.cache import cache
 from django.db.models import Count
+from django.http import StreamingHttpResponse
 from django.shortcuts import get_object_or_404
+from django.utils import timezone
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import status, viewsets
 from rest_framework.decorators import action
@@ -13,31 +15,44 @@ from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 
 from apps.core.breeze import breeze_session_manager
+from apps.core.candle_cache import invalidate_hot_candles, latest_candles
+from apps.core.feed import cancel_feed
 from apps.core.filters import InstrumentFilter
+from apps.core.helper import parse_timestamp
 from apps.core.models import (
     BreezeAccount,
-    Candle,
     Exchanges,
     Instrument,
     PercentageInstrument,
     SubscribedInstruments,
 )
-from apps.core.pagination import CandleBucketPagination, OffsetPagination
+from apps.core.pagination import (
+    CandleBucketPagination,
+    CandleKeysetPagination,
+    OffsetPagination,
+)
+from apps.core.progress import backfill_progress
+from apps.core.renderers import (
+    CANDLE_COLUMN_FORMATS,
+    CANDLE_RENDERER_CLASSES,
+    candle_columns,
+    stream_candle_rows,
+)
 from apps.core.serializers import (
     AggregatedCandleSerializer,
     AllInstrumentSerializer,
     BreezeAccountSerializer,
-    CandleSerializer,
     InstrumentSerializer,
     SubscribedSerializer,
 )
 from apps.core.tasks import (
     load_instrument_candles,
     manual_start_websocket,
-    resample_candles,
     websocket_start,
 )
-from apps.core.utils import resample_qs
+from apps.core.ticks import instrument_index
+from apps.core.trading_calendar import instrument_calendar
+from apps.core.utils import resample_qs, stored_candles_qs
 from main import const, utils
 
 logger = logging.getLogger(__name__)
@@ -67,6 +82,8 @@ class BreezeAccountViewSet(viewsets.ModelViewSet):
         serializer = self.get_serializer(data=request.data)
         if serializer.is_valid():
             serializer.save(user=request.user)
+            # Drop any session or health verdict cached before the account existed
+            breeze_session_manager.clear_session(request.user.id)
             return Response(
                 {"msg": "Account created successfully", "data": serializer.data},
                 status=status.HTTP_201_CREATED,
@@ -98,6 +115,15 @@ class BreezeAccountViewSet(viewsets.ModelViewSet):
             )
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+    def perform_destroy(self, instance):
+        user_id = instance.user_id
+        instance.delete()
+        # Without an account the user's feed can only fail; stop it
+        breeze_session_manager.clear_session(user_id)
+        redis_client = utils.get_cache_client("default")
+        if redis_client is not None:
+            cancel_feed(redis_client, user_id)
+
     @action(detail=False, methods=["get"], url_path="breeze_status")
     def get_breeze_status(self, request):
         """
@@ -109,25 +135,13 @@ class BreezeAccountViewSet(viewsets.ModelViewSet):
         try:
             user_id = self.request.user.id
 
-            # Initialize BreezeSession (retrieves cached instance or creates a new one)
-            session = breeze_session_manager.initialize_session(user_id)
-
-            # Check session status by fetching funds
-            check_breeze_session = session.get_funds()
+            # Served from the verdict cached in Redis; Breeze is only called
+            # when there is none yet
+            session_status = breeze_session_manager.health(user_id)["healthy"]
+            status_code = status.HTTP_200_OK
             # Check if ticks have been received in the last 10 seconds
             websocket_status = bool(cache.get(const.WEBSOCKET_HEARTBEAT_KEY, False))
 
-            # Determine session status message
-            if check_breeze_session.get("Status") == 200:
-                session_status = True
-                status_code = status.HTTP_200_OK
-            else:
-                session_status = False
-                status_code = status.HTTP_200_OK
-                logger.error(
-                    f"Breeze session check failed for user {user_id}: {check_breeze_session}"
-                )
-
             # Construct response data
             response_data = {
                 "session_status": session_status,
@@ -203,8 +217,12 @@ class BreezeAccountViewSet(viewsets.ModelViewSet):
 
             # Test the new session
             check_session = session.get_funds()
+            healthy = check_session.get("Status") == 200
+            breeze_session_manager.store_health(
+                user_id, healthy, None if healthy else check_session.get("Error")
+            )
 
-            if check_session.get("Status") == 200:
+            if healthy:
                 logger.info(f"Session refreshed successfully for user {user_id}")
                 return Response(
                     {
@@ -311,6 +329,39 @@ class SubscribedInstrumentsViewSet(viewsets.ModelViewSet):
             {"msg": "success", "data": serializer.data}, status=status.HTTP_200_OK
         )
 
+    @action(detail=False, methods=["get"], url_path="progress")
+    def progress(self, request):
+        """
+        Returns the backfill progress of every instrument still loading, so
+        clients poll one cheap endpoint instead of the instrument list. Counters
+        come from Redis; instruments without any fall back to the stored
+        percentage.
+        """
+        loading = dict(
+            PercentageInstrument.objects.filter(is_loading=False).values_list(
+                "instrument_id", "percentage"
+            )
+        )
+        counters = backfill_progress(loading)
+        data = [
+            {
+                "id": instrument_id,
+                **counters.get(
+                    instrument_id,
+                    {
+                        "chunks_total": 0,
+                        "chunks_done": 0,
+                        "chunks_failed": 0,
+                        "rows": 0,
+                        "percentage": percentage,
+                        "eta": None,
+                    },
+                ),
+            }
+            for instrument_id, percentage in loading.items()
+        ]
+        return Response({"msg": "success", "data": data}, status=status.HTTP_200_OK)
+
     def destroy(self, request, pk=None):
         instrument = get_object_or_404(SubscribedInstruments, pk=pk)
         redis_client = utils.get_redis_client("default")
@@ -321,7 +372,10 @@ class SubscribedInstrumentsViewSet(viewsets.ModelViewSet):
             f"Enqueued unsubscription for instrument ID {pk} with stock token {instrument.stock_token}."
         )
 
+        instrument_id = instrument.id
         instrument.delete()
+        invalidate_hot_candles(instrument_id)
+        instrument_index.invalidate(instrument.stock_token)
         return Response({"msg": "success"}, status=status.HTTP_200_OK)
 
     @action(detail=True, methods=["post"], url_path="subscribe")
@@ -340,6 +394,7 @@ class SubscribedInstrumentsViewSet(viewsets.ModelViewSet):
 
         sub_ins = SubscribedInstruments.objects.create(exchange_id=exchange_id, **data)
         PercentageInstrument.objects.create(instrument=sub_ins)
+        instrument_index.invalidate(sub_ins.stock_token)
         load_instrument_candles.delay(sub_ins.id, request.user.id, duration=duration)
 
         serializer = self.get_serializer(sub_ins)
@@ -347,21 +402,55 @@ class SubscribedInstrumentsViewSet(viewsets.ModelViewSet):
             {"msg": "success", "data": serializer.data}, status=status.HTTP_201_CREATED
         )
 
-    @action(detail=True, methods=["get"], url_path="candles")
+    @action(
+        detail=True,
+        methods=["get"],
+        url_path="candles",
+        renderer_classes=CANDLE_RENDERER_CLASSES,
+    )
     def candles(self, request, pk=None):
         """
         Retrives paginated candles for a subscribed instrument.
-        The candles are ordered by date in descending order.
+        The candles are ordered by date in descending order. 1-minute and rollup
+        timeframes are read as stored; other timeframes are resampled.
+
+        Pages are addressed with a ``before`` cursor (see
+        ``CandleKeysetPagination``) unless an ``offset`` is given; the newest
+        page of stored timeframes comes from the hot candle cache. The results are
+        returned as columns with ``?format=columnar`` or ``?format=packed``.
         """
         instrument = self.get_object()
         tf = int(request.query_params.get("tf", 1))
 
-        qs = resample_qs(instrument.id, tf)  # as before
-        total = qs.aggregate(cnt=Count("bucket", distinct=True))["cnt"]
+        if tf == 1 or tf in const.CANDLE_ROLLUP_TIMEFRAMES:
+            # Stored rows: counted and sliced straight off the index
+            qs = stored_candles_qs(instrument.id, tf)
+        else:
+            qs = resample_qs(instrument.id, tf, instrument_calendar(instrument))
+
+        if "offset" not in request.query_params:
+            paginator = CandleKeysetPagination()
+            page = None
+            if paginator.is_first_page(request):
+                # Chart loads start here; served from Redis when possible
+                page = latest_candles(
+                    instrument.id, tf, paginator.get_limit(request) + 1
+                )
+            if page is not None:
+                page = paginator.paginate_rows(page, request)
+            else:
+                page = paginator.paginate_queryset(qs, request)
+        elif tf == 1 or tf in const.CANDLE_ROLLUP_TIMEFRAMES:
+            paginator = CandleBucketPagination()
+            page = paginator.paginate_queryset(qs, request)
+        else:
+            total = qs.aggregate(cnt=Count("bucket", distinct=True))["cnt"]
+            paginator = CandleBucketPagination()
+            page = paginator.paginate_queryset(qs, request)
+            paginator.count = total
 
-        paginator = CandleBucketPagination()
-        page = paginator.paginate_queryset(qs, request)
-        paginator.count = total
+        if request.accepted_renderer.format in CANDLE_COLUMN_FORMATS:
+            return paginator.get_paginated_response(candle_columns(page))
         serializer = AggregatedCandleSerializer(page, many=True)
         return paginator.get_paginated_response(serializer.data)
 
@@ -373,43 +462,64 @@ class CandleViewSet(viewsets.ViewSet):
 
     permission_classes = [IsAuthenticated]
 
-    def get_cached_candles(self, instrument_id):
-        cache_key = f"candles_{instrument_id}"
-        cached_data = cache.get(cache_key)
-        if cached_data:
-            return cached_data
-
-        instrument = get_object_or_404(SubscribedInstruments, id=instrument_id)
-        qs = Candle.objects.filter(instrument=instrument).order_by("date")
-        data = CandleSerializer(qs, many=True).data
-
-        # Cache for 5 minutes
-        cache.set(cache_key, data, 300)
-        return data
-
     @action(detail=False, methods=["get"], url_path="get_candles")
     def get_candles(self, request):
+        """
+        Streams the candles of an instrument between ``start`` and ``end``
+        (ISO 8601 or epoch seconds; the last ``CANDLE_STREAM_DEFAULT_SPAN`` up to
+        now by default), oldest first. ``tf`` selects the timeframe in minutes;
+        rollup timeframes are read as stored and others are resampled by the
+        database. Ranges longer than ``CANDLE_STREAM_MAX_SPAN`` are rejected.
+        """
         instrument_id = request.query_params.get("id")
-        tf = request.query_params.get("tf")
         if not instrument_id:
             return Response(
                 {"msg": "Missing instrument ID"}, status=status.HTTP_400_BAD_REQUEST
             )
+        try:
+            timeframe = int(request.query_params.get("tf") or 1)
+        except ValueError:
+            timeframe = 0
+        if timeframe < 1:
+            return Response(
+                {"msg": "Invalid timeframe"}, status=status.HTTP_400_BAD_REQUEST
+            )
 
-        instrument = get_object_or_404(SubscribedInstruments, id=instrument_id)
-        qs = Candle.objects.filter(instrument=instrument).order_by("date")
-
-        candles = CandleSerializer(qs, many=True).data
+        try:
+            end = request.query_params.get("end")
+            end = parse_timestamp(end) if end else timezone.now()
+            start = request.query_params.get("start")
+            start = (
+                parse_timestamp(start)
+                if start
+                else end - const.CANDLE_STREAM_DEFAULT_SPAN
+            )
+        except (ValueError, OverflowError):
+            return Response(
+                {"msg": "Invalid time range"}, status=status.HTTP_400_BAD_REQUEST
+            )
+        if start >= end or end - start > const.CANDLE_STREAM_MAX_SPAN:
+            return Response(
+                {
+                    "msg": "Time range must be positive and at most "
+                    f"{const.CANDLE_STREAM_MAX_SPAN.days} days"
+                },
+                status=status.HTTP_400_BAD_REQUEST,
+            )
 
-        if tf:
-            try:
-                timeframe = int(tf)
-                new_candles = resample_candles(candles, timeframe)
-            except ValueError:
-                return Response(
-                    {"msg": "Invalid timeframe"}, status=status.HTTP_400_BAD_REQUEST
-                )
+        instrument = get_object_or_404(
+            SubscribedInstruments.objects.select_related("exchange"), id=instrument_id
+        )
+        if timeframe == 1 or timeframe in const.CANDLE_ROLLUP_TIMEFRAMES:
+            qs = stored_candles_qs(instrument.id, timeframe)
         else:
-            new_candles = candles
-
-        return Response({"msg": "done", "data": new_candles}, status=status.HTTP_200_OK)
+            qs = resample_qs(instrument.id, timeframe, instrument_calendar(instrument))
+        rows = (
+            qs.filter(date__gte=start, date__lt=end)
+            .order_by("bucket")
+            .iterator(chunk_size=const.CANDLE_STREAM_CHUNK_SIZE)
+        )
+        return StreamingHttpResponse(
+            stream_candle_rows(rows, const.CANDLE_STREAM_CHUNK_SIZE),
+            content_type="application/json",
+        )
@@ -0,0 +1,269 @@
+from collections import defaultdict
+from datetime import datetime, timedelta
+import random
+import threading
+import time
+
+from django.core.management import BaseCommand, CommandError
+from django.db import connection
+import numpy as np
+
+from apps.core.candles import CandleBuilder, write_candle_bars
+from apps.core.models import Exchanges, SubscribedInstruments
+from apps.core.ticks import TickBuffer, india_tz, instrument_index, parse_tick_batch
+from apps.core.trading_calendar import get_calendar
+from main import const
+
+TOKEN_PREFIX = "4.1!BENCH"
+# Ticks pushed per step when no rate is set
+FLOOD_STEP = 1000
+
+
+class IngestRun:
+    """
+    One benchmark run: ticks shaped like ``BreezeConnect.on_ticks`` input go
+    through the feed's ``TickBuffer`` and ``CandleBuilder`` into ``Candle``,
+    with their send times, the statements run and the pipeline's CPU recorded.
+
+    Tick times follow a market clock starting at ``market_open`` rather than
+    the wall clock, so runs fall in a session whenever they happen.
+    """
+
+    def __init__(self, instruments: dict, market_open: datetime):
+        self.instruments = instruments
+        self.market_open = market_open
+        self.started = None
+        self.sent = 0
+        self.processed = 0
+        self.writes = 0
+        self.bars = 0
+        self.statements = 0
+        self.pipeline_cpu = 0.0
+        self.latencies = []
+        # Send times of the ticks folded into each bar since it was last written
+        self.unwritten = defaultdict(list)
+        self.builder = CandleBuilder(writer=self.write)
+        self.buffer = TickBuffer(self.deliver)
+
+    def market_now(self) -> datetime:
+        return self.market_open + timedelta(seconds=time.monotonic() - self.started)
+
+    def count_statement(self, execute, sql, params, many, context):
+        self.statements += 1
+        return execute(sql, params, many, context)
+
+    def deliver(self, ticks: list):
+        """
+        ``CandleBuilder.add_ticks`` on the market clock, as the flush callback.
+        """
+        cpu = time.thread_time()
+        with connection.execute_wrapper(self.count_statement):
+            for tick in ticks:
+                self.unwritten[tick["bench_bar"]].append(tick["bench_sent"])
+            self.builder.update(parse_tick_batch(ticks))
+            self.builder.flush(now=self.market_now())
+        self.processed += len(ticks)
+        self.pipeline_cpu += time.thread_time() - cpu
+
+    def write(self, rows: list) -> int:
+        written = write_candle_bars(rows)
+        now = time.monotonic()
+        for instrument_id, minute, *_ in rows:
+            self.latencies.extend(
+                now - sent for sent in self.unwritten.pop((instrument_id, minute), ())
+            )
+        self.writes += 1
+        self.bars += len(rows)
+        return written
+
+    def send(self, rate: float, duration: float, stopping: threading.Event):
+        """
+        Pushes ``rate`` ticks per second spread over the instruments for
+        ``duration`` seconds, in 10 ms steps; as fast as possible when ``rate``
+        is 0.
+        """
+        rng = random.Random(42)
+        tokens = list(self.instruments)
+        prices = {token: 100 + rng.random() * 2900 for token in tokens}
+        while not stopping.is_set():
+            elapsed = time.monotonic() - self.started
+            if elapsed >= duration:
+                break
+            due = int(elapsed * rate) - self.sent if rate else FLOOD_STEP
+            market_now = self.market_now()
+            ltt = market_now.replace(tzinfo=None).strftime("%c")
+            minute = market_now.replace(second=0, microsecond=0)
+            for index in range(self.sent, self.sent + due):
+                token = tokens[index % len(tokens)]
+                prices[token] *= 1 + rng.gauss(0, 0.0005)
+                self.buffer.add(
+                    {
+                        "symbol": token,
+                        "last": round(prices[token], 2),
+                        "ltq": rng.randint(1, 500),
+                        "ltt": ltt,
+                        "bench_bar": (self.instruments[token], minute),
+                        "bench_sent": time.monotonic(),
+                    }
+                )
+            self.sent += due
+            if rate:
+                time.sleep(0.01)
+
+    def run(self, rate: float, duration: float) -> float:
+        """
+        Runs the benchmark and drains the pipeline.
+
+        Returns:
+            float: Seconds from the first tick until every tick was written.
+        """
+        stopping = threading.Event()
+        self.started = time.monotonic()
+        self.buffer.start()
+        try:
+            self.send(rate, duration, stopping)
+        finally:
+            stopping.set()
+            self.buffer.stop()
+            cpu = time.thread_time()
+            with connection.execute_wrapper(self.count_statement):
+                self.builder.flush(force=True, now=self.market_now())
+            self.pipeline_cpu += time.thread_time() - cpu
+        return time.monotonic() - self.started
+
+
+class Command(BaseCommand):
+    help = (
+        "Measures the live ingest path end to end: ticks pushed at a fixed rate "
+        "across benchmark instruments through the tick buffer and candle builder "
+        "into Candle. Reports throughput, tick-to-bar latency percentiles, "
+        "statements per tick and CPU. To load the socket as well, run `run_feed` "
+        "against `breeze_standin` instead."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--instruments", type=int, default=50)
+        parser.add_argument(
+            "--rate",
+            type=float,
+            default=2000,
+            help="Ticks per second, overall; 0 pushes them as fast as possible.",
+        )
+        parser.add_argument("--duration", type=float, default=30, help="Seconds.")
+        parser.add_argument(
+            "--keep",
+            action="store_true",
+            help="Keep the benchmark instruments and their candles.",
+        )
+
+    def handle(self, *args, **options):
+        count = options["instruments"]
+        rate = options["rate"]
+        duration = options["duration"]
+        if count < 1 or rate < 0 or duration <= 0:
+            raise CommandError(
+                "--instruments and --duration must be positive, --rate not negative."
+            )
+
+        market_open = self.market_open(duration)
+        instruments = self.create_instruments(count)
+        instrument_index.invalidate()
+        self.stdout.write(
+            f"Pushing {f'{rate:,.0f}' if rate else 'unlimited'} ticks/s across {count} instruments for "
+            f"{duration:g}s, market clock at {market_open:%Y-%m-%d %H:%M}..."
+        )
+        try:
+            ingest = IngestRun(instruments, market_open)
+            cpu = time.process_time()
+            elapsed = ingest.run(rate, duration)
+            cpu = time.process_time() - cpu
+        finally:
+            if not options["keep"]:
+                SubscribedInstruments.objects.filter(
+                    stock_token__startswith=TOKEN_PREFIX
+                ).delete()
+            instrument_index.invalidate()
+
+        latencies = np.array(ingest.latencies) * 1000
+        rows = [
+            ("ticks sent", f"{ingest.sent:,}"),
+            ("ticks processed", f"{ingest.processed:,}"),
+            ("ticks written", f"{len(latencies):,}"),
+            ("throughput", f"{ingest.processed / elapsed:,.0f} ticks/s"),
+            ("bars written", f"{ingest.bars:,} in {ingest.writes:,} writes"),
+            ("statements", f"{ingest.statements:,}"),
+            (
+                "statements/1k ticks",
+                f"{ingest.statements / max(ingest.sent, 1) * 1000:.2f}",
+            ),
+            ("pipeline CPU", f"{ingest.pipeline_cpu:.2f}s"),
+            (
+                "CPU/1k ticks",
+                f"{ingest.pipeline_cpu / max(ingest.sent, 1) * 1e6:.1f}ms",
+            ),
+            ("process CPU", f"{cpu / elapsed * 100:.0f}% of one core"),
+        ]
+        # Open bars are written on an interval, which bounds the latency
+        rows.append(
+            ("open bar flush", f"every {const.CANDLE_OPEN_BAR_FLUSH_INTERVAL:g}s")
+        )
+        if len(latencies):
+            for name, value in zip(
+                ("p50", "p90", "p99", "max"),
+                np.percentile(latencies, [50, 90, 99, 100]),
+                strict=True,
+            ):
+                rows.append((f"latency {name}", f"{value:,.1f}ms"))
+        for name, value in rows:
+            self.stdout.write(f"{name:<20}{value:>24}")
+        if ingest.sent != len(latencies):
+            self.stdout.write(
+                self.style.WARNING(
+                    f"{ingest.sent - len(latencies):,} ticks never reached a candle."
+                )
+            )
+
+    def market_open(self, duration: float) -> datetime:
+        """
+        The open of the latest past session long enough for the run.
+        """
+        calendar = get_calendar()
+        day = datetime.now(india_tz).date() - timedelta(days=1)
+        for _ in range(30):
+            for session in calendar.sessions(day):
+                if (session.close - session.open).total_seconds() > duration:
+                    return session.open
+            day -= timedelta(days=1)
+        raise CommandError(f"No session of the last month lasts {duration:g}s.")
+
+    def create_instruments(self, count: int) -> dict:
+        """
+        Subscribes ``count`` NSE benchmark instruments.
+
+        Returns:
+            dict: Maps their stock tokens to instrument IDs.
+        """
+        exchange, _ = Exchanges.objects.get_or_create(exchange="NSE")
+        tokens = [f"{TOKEN_PREFIX}{index}" for index in range(count)]
+        existing = set(
+            SubscribedInstruments.objects.filter(stock_token__in=tokens).values_list(
+                "stock_token", flat=True
+            )
+        )
+        SubscribedInstruments.objects.bulk_create(
+            [
+                SubscribedInstruments(
+                    exchange=exchange,
+                    stock_token=token,
+                    short_name=token.removeprefix("4.1!"),
+                    series="EQ",
+                )
+                for token in tokens
+                if token not in existing
+            ]
+        )
+        return dict(
+            SubscribedInstruments.objects.filter(stock_token__in=tokens).values_list(
+                "stock_token", "id"
+            )
+        )
@@ -0,0 +1,173 @@
+from datetime import datetime, timedelta
+import time
+
+from django.core.management import BaseCommand
+import numpy as np
+from pytz import timezone
+
+from apps.core.resample import resample_arrays, resample_records
+from apps.core.trading_calendar import get_calendar
+
+india_tz = timezone("Asia/Kolkata")
+
+
+def legacy_resample(candles: list, timeframe: int) -> list:
+    """
+    The per-row loop ``resample_candles`` used before the NumPy engine, kept as
+    the benchmark baseline.
+    """
+    resampled_candles = []
+    current_time = datetime.fromisoformat(candles[0]["date"])
+    next_time = current_time + timedelta(minutes=timeframe)
+    current_open = candles[0]["open"]
+    current_high = float("-inf")
+    current_low = float("inf")
+    current_close = None
+    current_volume = 0
+    current_day = current_time.date()
+
+    for candle in candles:
+        candle_date = datetime.fromisoformat(candle["date"])
+        candle_day = candle_date.date()
+
+        if candle_day != current_day:
+            resampled_candles.append(
+                {
+                    "open": current_open,
+                    "high": current_high,
+                    "low": current_low,
+                    "close": current_close,
+                    "volume": current_volume,
+                    "date": current_time.isoformat(),
+                }
+            )
+            current_time = candle_date
+            next_time = current_time + timedelta(minutes=timeframe)
+            current_open = candle["open"]
+            current_high = candle["high"]
+            current_low = candle["low"]
+            current_volume = candle["volume"]
+            current_close = candle["close"]
+            current_day = candle_day
+            continue
+
+        if candle_date >= next_time:
+            resampled_candles.append(
+                {
+                    "open": current_open,
+                    "high": current_high,
+                    "low": current_low,
+                    "close": current_close,
+                    "volume": current_volume,
+                    "date": current_time.isoformat(),
+                }
+            )
+            current_time = next_time
+            next_time = current_time + timedelta(minutes=timeframe)
+            current_open = candle["open"]
+            current_high = candle["high"]
+            current_low = candle["low"]
+            current_volume = candle["volume"]
+        else:
+            current_high = max(current_high, candle["high"])
+            current_low = min(current_low, candle["low"])
+            current_volume += candle["volume"]
+
+        current_close = candle["close"]
+
+    resampled_candles.append(
+        {
+            "open": current_open,
+            "high": current_high,
+            "low": current_low,
+            "close": current_close,
+            "volume": current_volume,
+            "date": current_time.isoformat(),
+        }
+    )
+    return resampled_candles
+
+
+class Command(BaseCommand):
+    help = "Measures candle resampling throughput on synthetic 1-minute bars."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--bars", type=int, default=1_000_000)
+        parser.add_argument("--timeframe", type=int, default=5)
+        parser.add_argument(
+            "--skip-loop",
+            action="store_true",
+            help="Do not run the legacy per-row loop.",
+        )
+
+    def handle(self, *args, **options):
+        bars = options["bars"]
+        timeframe = options["timeframe"]
+
+        self.stdout.write(f"Generating {bars} 1-minute bars...")
+        times = self.session_minutes(bars)
+        rng = np.random.default_rng(42)
+        closes = 100 + np.cumsum(rng.normal(0, 0.05, bars))
+        opens = np.concatenate(([100.0], closes[:-1]))
+        highs = np.maximum(opens, closes) + rng.random(bars) * 0.1
+        lows = np.minimum(opens, closes) - rng.random(bars) * 0.1
+        volumes = rng.integers(1, 1000, bars).astype(np.float64)
+
+        results = []
+        start = time.perf_counter()
+        resampled = resample_arrays(
+            times, opens, highs, lows, closes, volumes, timeframe, get_calendar()
+        )
+        results.append(("numpy arrays", time.perf_counter() - start, len(resampled[0])))
+
+        records = [
+            {
+                "date": datetime.fromtimestamp(t, tz=india_tz).isoformat(),
+                "open": o,
+                "high": h,
+                "low": l_,
+                "close": c,
+                "volume": v,
+            }
+            for t, o, h, l_, c, v in zip(
+                times.tolist(),
+                opens.tolist(),
+                highs.tolist(),
+                lows.tolist(),
+                closes.tolist(),
+                volumes.tolist(),
+                strict=True,
+            )
+        ]
+
+        start = time.perf_counter()
+        resampled = resample_records(records, timeframe)
+        results.append(("numpy records", time.perf_counter() - start, len(resampled)))
+
+        if not options["skip_loop"]:
+            start = time.perf_counter()
+            resampled = legacy_resample(records, timeframe)
+            results.append(("legacy loop", time.perf_counter() - start, len(resampled)))
+
+        self.stdout.write(f"{'engine':<16}{'seconds':>10}{'bars/s':>16}{'output':>10}")
+        for name, elapsed, output in results:
+            self.stdout.write(
+                f"{name:<16}{elapsed:>10.3f}{bars / elapsed:>16,.0f}{output:>10}"
+            )
+
+    def session_minutes(self, bars: int) -> np.ndarray:
+        """
+        Epoch seconds of consecutive NSE session minutes, going back from today.
+        """
+        calendar = get_calendar()
+        minutes = []
+        total = 0
+        day = datetime.now(india_tz).date()
+        while total < bars:
+            for session_open, session_close in calendar.sessions(day):
+                first = int(session_open.timestamp())
+                count = int((session_close - session_open).total_seconds()) // 60
+                minutes.append(np.arange(first, first + count * 60, 60))
+                total += count
+            day -= timedelta(days=1)
+        return np.sort(np.concatenate(minutes))[-bars:]
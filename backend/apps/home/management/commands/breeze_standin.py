@@ -0,0 +1,104 @@
+from datetime import datetime
+import logging
+
+from daphne.endpoints import build_endpoint_description_strings
+from daphne.server import Server
+from django.core.management import BaseCommand, CommandError
+
+from apps.core.breeze_standin import BreezeStandin, StandinOptions
+from apps.core.trading_calendar import india_tz
+from main import const
+
+
+class Command(BaseCommand):
+    help = (
+        "Serves a local stand-in for Breeze: sessions, funds, 1-minute historical "
+        "charts and the socket.io tick stream, with configurable tick rates, "
+        "latency, rate limits and errors. Point the app at it with "
+        "BREEZE_STANDIN_URL=http://<host>:<port>."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--host", default="127.0.0.1")
+        parser.add_argument("--port", type=int, default=8765)
+        parser.add_argument(
+            "--tick-rate",
+            type=float,
+            default=1.0,
+            help="Ticks per second of every subscribed token.",
+        )
+        parser.add_argument(
+            "--symbol-rate",
+            action="append",
+            default=[],
+            metavar="TOKEN=RATE",
+            help="Ticks per second of one token, e.g. 4.1!2885=20. Repeatable.",
+        )
+        parser.add_argument(
+            "--latency", type=float, default=0, help="Milliseconds per REST call."
+        )
+        parser.add_argument(
+            "--jitter",
+            type=float,
+            default=0,
+            help="Up to this many random milliseconds added to the latency.",
+        )
+        parser.add_argument(
+            "--calls-per-minute",
+            type=int,
+            default=const.BREEZE_STANDIN_CALLS_PER_MINUTE,
+            help="REST calls allowed per API key and minute; 0 for no limit.",
+        )
+        parser.add_argument(
+            "--error-rate",
+            type=float,
+            default=0,
+            help="Share of REST calls answered with an error, from 0 to 1.",
+        )
+        parser.add_argument(
+            "--market-time",
+            help=(
+                "India time the tick clock starts at, e.g. 2025-01-06T09:15, "
+                "so ticks fall in market hours whenever the stand-in runs."
+            ),
+        )
+        parser.add_argument("--seed", type=int, help="Seed of latency and errors.")
+
+    def handle(self, *args, **options):
+        symbol_rates = {}
+        for value in options["symbol_rate"]:
+            symbol, _, rate = value.rpartition("=")
+            try:
+                symbol_rates[symbol] = float(rate)
+            except ValueError:
+                raise CommandError(f"Invalid --symbol-rate: {value}") from None
+        if not 0 <= options["error_rate"] <= 1:
+            raise CommandError("--error-rate must be between 0 and 1.")
+
+        clock_offset = 0.0
+        if options["market_time"]:
+            start = india_tz.localize(datetime.fromisoformat(options["market_time"]))
+            clock_offset = start.timestamp() - datetime.now(india_tz).timestamp()
+
+        standin = BreezeStandin(
+            StandinOptions(
+                tick_rate=options["tick_rate"],
+                symbol_rates=symbol_rates,
+                latency=options["latency"] / 1000,
+                jitter=options["jitter"] / 1000,
+                calls_per_minute=options["calls_per_minute"],
+                error_rate=options["error_rate"],
+                clock_offset=clock_offset,
+                seed=options["seed"],
+            )
+        )
+        logging.getLogger("daphne").setLevel(logging.WARNING)
+        url = f"http://{options['host']}:{options['port']}"
+        self.stdout.write(self.style.SUCCESS(f"Breeze stand-in listening on {url}."))
+        Server(
+            standin,
+            endpoints=build_endpoint_description_strings(
+                options["host"], options["port"]
+            ),
+            verbosity=0,
+        ).run()
@@ -0,0 +1,35 @@
+from django.core.management import BaseCommand
+
+from apps.core.models import Candle
+from apps.core.rollups import rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuilds the pre-aggregated candle rollups from the stored 1-minute "
+        "candles. Rollups older than the earliest stored candle are kept."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "instrument_ids",
+            nargs="*",
+            type=int,
+            help="Subscribed instrument IDs; all instruments with candles by default.",
+        )
+
+    def handle(self, *args, **options):
+        instrument_ids = options["instrument_ids"] or list(
+            Candle.objects.order_by().values_list("instrument_id", flat=True).distinct()
+        )
+        total = 0
+        for instrument_id in instrument_ids:
+            written = rebuild_rollups(instrument_id)
+            total += written
+            self.stdout.write(f"Instrument {instrument_id}: {written} rollup candles")
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Rebuilt {total} rollup candles for {len(instrument_ids)} instruments."
+            )
+        )
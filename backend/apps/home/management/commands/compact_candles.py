@@ -0,0 +1,72 @@
+from django.core.management import BaseCommand, CommandError, call_command
+from django.db import connection
+from django.db.migrations.recorder import MigrationRecorder
+
+from apps.core.models import Candle, CandleRollup
+
+MIGRATION = "0015_compact_candle_storage"
+
+
+def table_sizes() -> dict:
+    """
+    Maps the candle tables to their on-disk size in bytes, partitions, TOAST
+    and indexes included.
+    """
+    sizes = {}
+    with connection.cursor() as cursor:
+        for model in (Candle, CandleRollup):
+            table = model._meta.db_table
+            cursor.execute(
+                # The partition tree is empty for a plain table
+                "SELECT COALESCE(SUM(pg_total_relation_size(relid)), "
+                "pg_total_relation_size(%s::regclass)) FROM pg_partition_tree(%s)",
+                [table, table],
+            )
+            sizes[table] = cursor.fetchone()[0]
+    return sizes
+
+
+def megabytes(size: int) -> str:
+    return f"{size / 1024 / 1024:,.1f} MB"
+
+
+class Command(BaseCommand):
+    help = (
+        "Rewrites the candle tables in the compact layout (integer paise prices, "
+        "bigint volume, no per-row flags) and reports the on-disk size saved."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--report",
+            action="store_true",
+            help="Only report the current size of the candle tables.",
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor != "postgresql":
+            raise CommandError("Candle storage can only be measured on Postgres.")
+
+        before = table_sizes()
+        applied = MigrationRecorder(connection).migration_qs.filter(
+            app="core", name=MIGRATION
+        )
+        if options["report"] or applied.exists():
+            if not options["report"]:
+                self.stdout.write("The candle tables are compact already.")
+            for table, size in before.items():
+                self.stdout.write(f"{table}: {megabytes(size)}")
+            return
+
+        call_command("migrate", "core", MIGRATION, stdout=self.stdout)
+        after = table_sizes()
+        for table, size in before.items():
+            saved = size - after[table]
+            self.stdout.write(
+                f"{table}: {megabytes(size)} -> {megabytes(after[table])} "
+                f"({saved / size if size else 0:.0%} saved)"
+            )
+        saved = sum(before.values()) - sum(after.values())
+        self.stdout.write(
+            self.style.SUCCESS(f"Rewrote the candle tables, saving {megabytes(saved)}.")
+        )
@@ -0,0 +1,33 @@
+from django.core.management import BaseCommand
+
+from apps.core.retention import maintain_candle_storage
+from main import const
+
+
+class Command(BaseCommand):
+    help = (
+        "Creates upcoming monthly candle partitions and applies the candle retention "
+        "settings, downsampling 1-minute candles into rollups before dropping them."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--months-ahead",
+            type=int,
+            default=const.CANDLE_PARTITION_MONTHS_AHEAD,
+            help="Months after the current one to create partitions for.",
+        )
+
+    def handle(self, *args, **options):
+        report = maintain_candle_storage(options["months_ahead"])
+        for name in report["created"]:
+            self.stdout.write(f"Created partition {name}")
+        for instrument_id in report["expired"]:
+            self.stdout.write(f"Pruned expired instrument {instrument_id}")
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Created {len(report['created'])} partitions, pruned "
+                f"{len(report['expired'])} expired instruments and dropped "
+                f"{report['dropped']} old partitions or bars."
+            )
+        )
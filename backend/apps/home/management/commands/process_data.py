@@ -447,11 +447,6 @@ class Command(BaseCommand):
                                     ins_list, ignore_conflicts=True
                                 )
                                 ins_list.clear()
-                                # Update progress
-                                per.value = (
-                                    index / 100000
-                                ) * 100  # Adjust denominator as needed based on total lines
-                                per.save()
 
                         except Exception as e:
                             logger.error(
@@ -463,7 +458,7 @@ class Command(BaseCommand):
                 if ins_list:
                     Instrument.objects.bulk_create(ins_list, ignore_conflicts=True)
 
-                # Final progress update
+                # Progress is only recorded once the exchange is done
                 per.value = 100
                 per.save()
                 self.stdout.write(
@@ -0,0 +1,34 @@
+import signal
+import threading
+
+from django.core.management import BaseCommand
+
+from apps.core.feed import FeedService
+from main import utils
+
+
+class Command(BaseCommand):
+    help = (
+        "Runs the live Breeze feeds of the users who requested one. Several "
+        "processes may run side by side; each user is fed by exactly one of them."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--owner",
+            help="Name of this process in the feed leases; host and PID by default.",
+        )
+
+    def handle(self, *args, **options):
+        stopping = threading.Event()
+
+        def stop(*_):
+            self.stdout.write("Stopping feeds...")
+            stopping.set()
+
+        signal.signal(signal.SIGINT, stop)
+        signal.signal(signal.SIGTERM, stop)
+
+        service = FeedService(utils.get_redis_client("default"), options["owner"])
+        self.stdout.write(self.style.SUCCESS(f"Feed service {service.owner} running."))
+        service.run(stopping)
@@ -1,6 +1,9 @@
 import os
 
 from celery import Celery
+from celery.schedules import crontab
+
+from main import const
 
 # Set the default Django settings module for the 'celery' program.
 from main.settings.base import INSTALLED_APPS
@@ -9,15 +12,21 @@ os.environ.setdefault("DJANGO_SETTINGS_MODULE", "main.settings.local")
 
 app = Celery("main", include=[])
 
-# get schedule from CANDLE_MAKER_SCHEDULCING environment variable
-
-CANDLE_MAKER_SCHEDULE = int(os.getenv("CANDLE_MAKER_SCHEDULE", 1))
+# Live candles are built in-process by the feed service (see CandleBuilder), so
+# "candle_maker" is no longer scheduled; run it manually to drain leftover ticks.
+# Beat uses the DatabaseScheduler, which keeps PeriodicTask rows for entries
+# removed here: delete them as well (see core migration 0016).
 
 app.conf.beat_schedule = {
-    "candle_making_job": {
-        "task": "candle_maker",
-        "schedule": CANDLE_MAKER_SCHEDULE,
-        "relative": True,
+    # After the Indian market close (schedules are in UTC)
+    "maintain_candle_storage": {
+        "task": "maintain_candle_storage",
+        "schedule": crontab(hour=13, minute=0),
+    },
+    # Keeps the cached health of Breeze sessions in use fresh
+    "probe_breeze_sessions": {
+        "task": "probe_breeze_sessions",
+        "schedule": const.BREEZE_HEALTH_PROBE_INTERVAL,
     },
     # "websocket_connect": {
     #     "task": "websocket_start",
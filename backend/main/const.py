@@ -1,5 +1,89 @@
+from datetime import timedelta
+
 WEBSOCKET_HEARTBEAT_KEY = "ticks_received"
 WEBSOCKET_HEARTBEAT_TTL = 100
+WEBSOCKET_HEARTBEAT_INTERVAL = 30  # seconds between heartbeats
+
+# Live feeds run in `manage.py run_feed`; each user's feed is held under a lease
+FEED_USERS_KEY = "feed:users"  # Redis set of users who requested a feed
+FEED_LEASE_TTL = 30  # seconds a lease outlives its last renewal
+FEED_RENEW_INTERVAL = 5  # seconds between lease renewals and new-user checks
+FEED_STOP_TIMEOUT = 10  # seconds to wait for a feed to disconnect
+FEED_RETRY_BACKOFF = 5  # seconds before restarting a feed that ended, doubled
+FEED_RETRY_BACKOFF_MAX = 300  # seconds
+# Users whose feed cannot get a Breeze session this many times in a row are dropped
+FEED_MAX_SESSION_FAILURES = 5
+
+# Single-instance tasks hold a Redis lock from dispatch until they finish
+TASK_LOCK_TTL = 300  # seconds a task lock outlives its last renewal
+TASK_LOCK_RENEW_INTERVAL = 60  # seconds between renewals while the task runs
+
+# The feed loop waits this long for subscription requests before writing open
+# bars; requests arriving meanwhile are applied right away, up to a batch.
+SUBSCRIPTION_WAIT_TIMEOUT = 1  # seconds
+SUBSCRIPTION_BATCH_SIZE = 100  # requests drained per queue and wake-up
+
+# Ticks are coalesced in the websocket process and written once per batch.
+TICK_BATCH_MAX_SIZE = 500  # ticks
+TICK_BATCH_MAX_WAIT = 0.5  # seconds
+
+# Tick symbols with no subscribed instrument are looked up again after this
+INSTRUMENT_MISS_TTL = 60  # seconds
+
+# Open 1-minute bars are written this often; closed bars are written right away.
+CANDLE_OPEN_BAR_FLUSH_INTERVAL = 5  # seconds
+CANDLE_BAR_CLOSE_GRACE = 2  # seconds after the minute ends before a bar is closed
+CANDLE_UPSERT_BATCH_SIZE = 5000  # rows per INSERT ... ON CONFLICT statement
+PRICE_SCALE = 100  # candle prices are stored as integers in paise
+# Timeframes (minutes) pre-aggregated into CandleRollup; 1440 is the daily candle
+CANDLE_ROLLUP_TIMEFRAMES = (5, 15, 30, 60, 1440)
+# First key of the per-instrument advisory locks serialising rollup writes
+CANDLE_ROLLUP_LOCK_NAMESPACE = 7007
+
+# On Postgres candles are partitioned by month; `manage.py maintain_candles`
+# keeps this many months ahead of the current one created
+CANDLE_PARTITION_MONTHS_AHEAD = 2
+
+# Candle series requests: rows fetched per cursor round trip and the time range
+CANDLE_STREAM_CHUNK_SIZE = 2000
+CANDLE_STREAM_DEFAULT_SPAN = timedelta(days=30)
+CANDLE_STREAM_MAX_SPAN = timedelta(days=366)
+
+# Newest bars of every (instrument, timeframe) kept in Redis for first chart pages;
+# the window covers the largest page plus the look-ahead bar.
+CANDLE_HOT_WINDOW = 1500  # bars
+CANDLE_HOT_TTL = 24 * 60 * 60  # seconds
+# Bar updates pushed to a websocket client are coalesced over this window
+CANDLE_PUSH_INTERVAL = 0.25  # seconds
+
+# Breeze allows 100 API calls per minute per account; stay a little below it.
+# The token bucket is shared by all processes through Redis.
+BREEZE_API_CALLS_PER_MINUTE = 90
+# Breeze REST calls share a keep-alive connection pool per process
+BREEZE_HTTP_POOL_SIZE = 10  # connections kept alive per Breeze host
+BREEZE_HTTP_TIMEOUT = (5, 30)  # seconds to connect and to read a response
+BREEZE_MAX_CONCURRENT_REQUESTS = 4  # requests in flight per account and process
+
+# Generated Breeze sessions are shared through Redis; session tokens last a day
+BREEZE_SESSION_TTL = 24 * 60 * 60  # seconds
+# Session health verdicts are served from Redis and refreshed by a prober
+BREEZE_HEALTH_TTL = 180  # seconds a verdict is served
+BREEZE_HEALTH_PROBE_INTERVAL = 60  # seconds between probes
+BREEZE_HEALTH_WATCH_WINDOW = 600  # seconds a user is probed after last asking
+BREEZE_WATCHED_USERS_KEY = "breeze:watched"  # sorted set of users by last ask
+# Limits of the local Breeze stand-in (`manage.py breeze_standin`), as Breeze's
+BREEZE_STANDIN_CALLS_PER_MINUTE = 100  # REST calls per API key
+BREEZE_HISTORICAL_MAX_BARS = 1000  # bars per historical response
+
+# Historical backfill
+BACKFILL_MAX_WORKERS = 4  # concurrent chunk requests per instrument
+BACKFILL_CHUNK_RETRIES = 3  # attempts per chunk after the first one
+BACKFILL_RETRY_BACKOFF = 2  # seconds, doubled on every retry
+BACKFILL_RETRY_BACKOFF_MAX = 30  # seconds
+# Holes between stored candles shorter than this are not re-fetched
+BACKFILL_GAP_TOLERANCE = timedelta(minutes=15)
+# Progress counters of a backfill outlive its last update by this much
+BACKFILL_PROGRESS_TTL = 24 * 60 * 60  # seconds
 
 
 AUTH_PROVIDERS = {
@@ -17,6 +101,55 @@ def websocket_user_lock(user_id: int) -> str:
     return f"websocket_start-user-{user_id}"
 
 
+def task_lock(task_name: str, *args) -> str:
+    """
+    Generate the Redis lock key of a single-instance task run for the given arguments.
+    """
+    return ":".join(["task-lock", task_name, *map(str, args)])
+
+
+def candle_hot_key(instrument_id: int, timeframe: int) -> str:
+    """
+    Generate the Redis sorted set holding the hot window of an instrument's candles.
+    """
+    return f"candles:hot:{instrument_id}:{timeframe}"
+
+
+def candle_live_channel(instrument_id: int, timeframe: int) -> str:
+    """
+    Generate the Redis pub/sub channel carrying an instrument's bar updates.
+    """
+    return f"candles:live:{instrument_id}:{timeframe}"
+
+
+def breeze_session_key(user_id: int) -> str:
+    """
+    Generate the Redis key sharing a user's generated Breeze session.
+    """
+    return f"breeze:session:{user_id}"
+
+
+def breeze_rate_limit_key(user_id: int) -> str:
+    """
+    Generate the Redis hash holding the API token bucket of a user's Breeze account.
+    """
+    return f"breeze:ratelimit:{user_id}"
+
+
+def breeze_health_key(user_id: int) -> str:
+    """
+    Generate the Redis key caching the health verdict of a user's Breeze session.
+    """
+    return f"breeze:health:{user_id}"
+
+
+def backfill_progress_key(instrument_id: int) -> str:
+    """
+    Generate the Redis hash holding the progress counters of an instrument's backfill.
+    """
+    return f"backfill:progress:{instrument_id}"
+
+
 def websocket_subscription_queue(user_id: int) -> str:
     """
     Generate a unique Redis queue name for user subscriptions.
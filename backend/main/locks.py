@@ -0,0 +1,149 @@
+import logging
+import os
+import socket
+import threading
+import uuid
+
+import redis
+
+logger = logging.getLogger(__name__)
+
+# Only the owner may extend or drop a lease; compare and act atomically
+RENEW_SCRIPT = """
+if redis.call("GET", KEYS[1]) == ARGV[1] then
+    return redis.call("PEXPIRE", KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+RELEASE_SCRIPT = """
+if redis.call("GET", KEYS[1]) == ARGV[1] then
+    return redis.call("DEL", KEYS[1])
+end
+return 0
+"""
+
+# Takes the lock, or extends it for its current owner, in one round trip and
+# returns the fencing token of the holding; nil when someone else holds it.
+ACQUIRE_SCRIPT = """
+if redis.call("GET", KEYS[1]) == ARGV[1] then
+    redis.call("PEXPIRE", KEYS[1], ARGV[2])
+    return tonumber(redis.call("GET", KEYS[2]))
+end
+if redis.call("SET", KEYS[1], ARGV[1], "NX", "PX", ARGV[2]) then
+    return redis.call("INCR", KEYS[2])
+end
+return false
+"""
+
+
+def default_owner() -> str:
+    """
+    Identifies this process, e.g. ``worker-1:4242:9f1c2a``.
+    """
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+
+
+class RedisLease:
+    """
+    Time-bound exclusive ownership of a Redis key.
+
+    ``acquire`` is a single ``SET key owner NX PX ttl``; the holder keeps the
+    lease by calling ``renew`` well within ``ttl``. When the holder dies the key
+    expires and someone else may take over.
+    """
+
+    def __init__(
+        self,
+        redis_client: redis.Redis,
+        key: str,
+        ttl: float,
+        owner: str | None = None,
+    ):
+        self.redis_client = redis_client
+        self.key = key
+        self.ttl_ms = int(ttl * 1000)
+        self.owner = owner or default_owner()
+
+    def __repr__(self):
+        return f"<RedisLease {self.key} owner={self.owner}>"
+
+    def acquire(self) -> bool:
+        return bool(
+            self.redis_client.set(self.key, self.owner, nx=True, px=self.ttl_ms)
+        )
+
+    def renew(self) -> bool:
+        """
+        Extends the lease by ``ttl``. False when it was lost in the meantime.
+        """
+        return bool(
+            self.redis_client.eval(RENEW_SCRIPT, 1, self.key, self.owner, self.ttl_ms)
+        )
+
+    def release(self) -> bool:
+        return bool(self.redis_client.eval(RELEASE_SCRIPT, 1, self.key, self.owner))
+
+
+class RedisLock(RedisLease):
+    """
+    A lease that also hands out a fencing token.
+
+    Every new holding of the key increments ``<key>:fence``, so ``token`` grows
+    monotonically across holders; a holder that stalled past its ``ttl`` can
+    tell, or be told, that it is out of date. ``acquire`` is re-entrant for the
+    same owner, which lets the process that dispatched a task take the lock and
+    the worker that runs it pick it up under the task id.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fence_key = f"{self.key}:fence"
+        self.token = None
+
+    def acquire(self) -> bool:
+        token = self.redis_client.eval(
+            ACQUIRE_SCRIPT, 2, self.key, self.fence_key, self.owner, self.ttl_ms
+        )
+        if token is None:
+            return False
+        self.token = int(token)
+        return True
+
+    def keep_alive(self, interval: float) -> "LockKeeper":
+        """
+        Renews the lock every ``interval`` seconds on a background thread.
+        """
+        keeper = LockKeeper(self, interval)
+        keeper.start()
+        return keeper
+
+
+class LockKeeper(threading.Thread):
+    """
+    Renews a lock until ``stop`` is called. ``lost`` is set once a renewal
+    fails, so long-running holders can stop writing.
+    """
+
+    def __init__(self, lock: RedisLease, interval: float):
+        super().__init__(name=f"keeper-{lock.key}", daemon=True)
+        self.lock = lock
+        self.interval = interval
+        self.lost = threading.Event()
+        self._stopping = threading.Event()
+
+    def run(self):
+        while not self._stopping.wait(self.interval):
+            try:
+                renewed = self.lock.renew()
+            except redis.RedisError as e:
+                logger.warning(f"Could not renew {self.lock.key}: {e}")
+                continue
+            if not renewed:
+                logger.warning(f"Lost {self.lock.key} (token {self.lock.token}).")
+                self.lost.set()
+                return
+
+    def stop(self):
+        self._stopping.set()
+        self.join()
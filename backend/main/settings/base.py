@@ -64,6 +64,14 @@ TEMPLATES = [
 
 ASGI_APPLICATION = "main.asgi.application"
 
+# Groups only span one ASGI process; bar updates reach every process through
+# Redis pub/sub (see apps.core.candle_push).
+CHANNEL_LAYERS = {
+    "default": {
+        "BACKEND": "channels.layers.InMemoryChannelLayer",
+    }
+}
+
 # Database
 DATABASES = {
     "default": {
@@ -125,6 +133,20 @@ async_load = True
 AUTH_USER_MODEL = "account.User"
 mimetypes.add_type("text/css", ".css", True)
 
+# Candle retention, applied by `manage.py maintain_candles` (see apps.core.retention).
+# 1-minute candles older than this many months are dropped; 0 keeps them forever.
+CANDLE_MINUTE_RETENTION_MONTHS = int(
+    os.environ.get("CANDLE_MINUTE_RETENTION_MONTHS", "0")
+)
+# 1-minute candles of contracts expired for this many days are dropped.
+CANDLE_EXPIRED_RETENTION_DAYS = int(
+    os.environ.get("CANDLE_EXPIRED_RETENTION_DAYS", "30")
+)
+
+# Base URL of a local Breeze stand-in (`manage.py breeze_standin`) to send all
+# Breeze traffic to instead of ICICI's servers, e.g. http://localhost:8765.
+BREEZE_STANDIN_URL = os.environ.get("BREEZE_STANDIN_URL")
+
 # Celery settings
 BROKER_URL = os.environ.get("REDIS_URL")
 CELERY_ACCEPT_CONTENT = ["json"]
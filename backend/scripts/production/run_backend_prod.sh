@@ -1,4 +1,5 @@
 #!/bin/sh
 
-echo "STARTING GUNICORN SERVER..."
-gunicorn main.wsgi:application -t 1800 --bind :8000 --log-level=info
+# Served over ASGI so the /ws/ routes (live candle pushes) exist alongside HTTP
+echo "STARTING DAPHNE SERVER..."
+daphne main.asgi:application --bind 0.0.0.0 --port 8000 --http-timeout 1800 --proxy-headers
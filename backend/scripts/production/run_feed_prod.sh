@@ -0,0 +1,8 @@
+#!/bin/bash
+set -e
+
+echo "STARTING HTTP SERVER..."
+python3 http_server.py & # Run HTTP server in background
+
+echo "STARTING BREEZE FEED SERVICE..."
+python3 manage.py run_feed
@@ -0,0 +1,10 @@
+#!/bin/bash
+set -e
+
+echo "Starting Breeze Feed Service..."
+
+# Wait for database to be ready
+python3 manage.py wait_for_db
+
+# Owns the Breeze websockets; Celery workers stay free for backfills
+python3 manage.py run_feed
@@ -34,8 +34,8 @@ celery -A main beat --detach
 # Launch the Django development server, since there is only 1 instance the lru cache will work just fine
 python3 manage.py runserver 0.0.0.0:8000
 
-# Alternatively, use Gunicorn for production environments
-# echo "STARTING GUNICORN SERVER..."
-# gunicorn main.wsgi:application --bind 0.0.0.0:8000 -w 12
-# gunicorn main.wsgi:application -t 1800 --bind :8000
+# Alternatively, use Daphne for production environments
+# echo "STARTING DAPHNE SERVER..."
+# daphne main.asgi:application --bind 0.0.0.0 --port 8000 --http-timeout 1800
+# (ASGI is required for the /ws/ websocket routes; gunicorn main.wsgi serves HTTP only)
 # use this to get logs inside backend shell tail -f /var/log/celery/w*.log
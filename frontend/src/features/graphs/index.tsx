@@ -56,6 +56,7 @@ import GraphHeader from './components/GraphHeader';
 import { X } from 'lucide-react';
 import IndicatorChart from './components/IndicatorChart';
 import { useIsMobile } from '@/hooks/useMobile';
+import useCandleStream from '@/hooks/useCandleStream';
 import { Sheet, SheetContent } from '@/components/ui/sheet';
 
 interface LocationState {
@@ -81,7 +82,7 @@ const GraphsPage: React.FC = () => {
 
   // Pagination state
   const [allCandles, setAllCandles] = useState<Candle[]>([]);
-  const [currentOffset, setCurrentOffset] = useState(0);
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
   const [isLoadingMore, setIsLoadingMore] = useState(false);
   const [hasMoreData, setHasMoreData] = useState(true);
   const initialLimit = 500;
@@ -97,7 +98,6 @@ const GraphsPage: React.FC = () => {
     id: obj?.id,
     tf: timeframe,
     limit: initialLimit,
-    offset: 0,
   });
 
   // Lazy query for loading more data
@@ -107,7 +107,7 @@ const GraphsPage: React.FC = () => {
   useEffect(() => {
     if (initialData?.results) {
       setAllCandles(initialData.results);
-      setCurrentOffset(initialData.results.length);
+      setNextCursor(initialData.before ?? null);
       // Check if there's more data using the 'next' field from Django pagination
       setHasMoreData(!!initialData.next);
     }
@@ -117,14 +117,14 @@ const GraphsPage: React.FC = () => {
   useEffect(() => {
     // Reset pagination state when key dependencies change
     setAllCandles([]);
-    setCurrentOffset(0);
+    setNextCursor(null);
     setHasMoreData(true);
     setIsLoadingMore(false);
   }, [timeframe, obj?.id]);
 
   // Load more data function
   const loadMoreHistoricalData = useCallback(async () => {
-    if (!obj?.id || isLoadingMore || !hasMoreData || currentOffset === 0) {
+    if (!obj?.id || isLoadingMore || !hasMoreData || !nextCursor) {
       return;
     }
 
@@ -135,7 +135,7 @@ const GraphsPage: React.FC = () => {
         id: obj.id,
         tf: timeframe,
         limit: loadMoreLimit,
-        offset: currentOffset,
+        before: nextCursor,
       }).unwrap();
 
       if (response?.results && response.results.length > 0) {
@@ -145,16 +145,12 @@ const GraphsPage: React.FC = () => {
             (candle: Candle) => !existingDates.has(candle.date)
           );
 
-          // Only update the offset by the number of unique new candles
-          if (newCandles.length > 0) {
-            setCurrentOffset(currentOffset + newCandles.length);
-          }
-
           return [...prevCandles, ...newCandles].sort(
             (a, b) => new Date(b.date).getTime() - new Date(a.date).getTime()
           );
         });
 
+        setNextCursor(response.before ?? null);
         setHasMoreData(!!response.next);
       } else {
         setHasMoreData(false);
@@ -168,7 +164,7 @@ const GraphsPage: React.FC = () => {
   }, [
     obj?.id,
     timeframe,
-    currentOffset,
+    nextCursor,
     isLoadingMore,
     hasMoreData,
     fetchMoreData,
@@ -178,7 +174,7 @@ const GraphsPage: React.FC = () => {
   // Update refetch to reset pagination
   const handleRefetch = useCallback(() => {
     setAllCandles([]);
-    setCurrentOffset(0);
+    setNextCursor(null);
     setHasMoreData(true);
     refetch();
   }, [refetch]);
@@ -328,9 +324,35 @@ const GraphsPage: React.FC = () => {
     }[];
   }, [data, activeIndicators]);
 
+  // Live bars are pushed over a websocket; merge them by timestamp
+  const handleStreamedBars = useCallback(
+    (bars: Candle[]) => {
+      setAllCandles(prevCandles => {
+        const base =
+          prevCandles.length > 0 ? prevCandles : initialData?.results || [];
+        const byTime = new Map(
+          base.map(candle => [Date.parse(candle.date), candle])
+        );
+        bars.forEach(bar => byTime.set(Date.parse(bar.date), bar));
+        return [...byTime.values()].sort(
+          (a, b) => Date.parse(b.date) - Date.parse(a.date)
+        );
+      });
+    },
+    [initialData]
+  );
+
+  const isStreaming = useCandleStream(
+    obj?.id,
+    timeframe,
+    autoRefresh,
+    handleStreamedBars
+  );
+
+  // Timeframes that are not pushed fall back to polling
   useEffect(() => {
     let intervalId: number | null = null;
-    if (autoRefresh) {
+    if (autoRefresh && !isStreaming) {
       intervalId = window.setInterval(() => {
         refetch();
       }, 1000);
@@ -340,7 +362,7 @@ const GraphsPage: React.FC = () => {
         clearInterval(intervalId);
       }
     };
-  }, [autoRefresh, refetch]);
+  }, [autoRefresh, isStreaming, refetch]);
   const syncCharts = useCallback(() => {
     if (!mainChartRef.current) return;
 
@@ -28,7 +28,7 @@ import {
   DrawerHeader,
   DrawerTitle,
 } from '@/components/ui/drawer';
-import type { Instrument } from '@/types/common-types';
+import type { BackfillProgress, Instrument } from '@/types/common-types';
 import { useAppSelector } from 'src/app/hooks';
 import {
   getHasBreezeAccount,
@@ -38,12 +38,14 @@ import { useIsMobile } from '@/hooks/useMobile';
 
 interface InstrumentCardProps {
   instrument: Instrument;
+  progress?: BackfillProgress;
   onDelete: (id: number) => void;
   isDeleting: boolean;
 }
 
 export const InstrumentCard: React.FC<InstrumentCardProps> = ({
   instrument,
+  progress,
   onDelete,
   isDeleting,
 }) => {
@@ -53,6 +55,8 @@ export const InstrumentCard: React.FC<InstrumentCardProps> = ({
   const isMobile = useIsMobile();
 
   const isLoading = !instrument.percentage?.is_loading;
+  const percentage =
+    progress?.percentage ?? instrument.percentage?.percentage ?? 0;
 
   const handleDeleteClick = () => {
     if (!hasBreezeAccount && !isBreezeAccountLoading) {
@@ -184,11 +188,16 @@ export const InstrumentCard: React.FC<InstrumentCardProps> = ({
                   <div className="flex items-center justify-between text-sm">
                     <span className="text-muted-foreground">Progress</span>
                     <span className="font-medium">
-                      {instrument.percentage.percentage.toFixed(1)}%
+                      {percentage.toFixed(1)}%
+                      {isLoading && progress?.eta != null && (
+                        <span className="ml-2 text-muted-foreground">
+                          ~{Math.ceil(progress.eta / 60)} min left
+                        </span>
+                      )}
                     </span>
                   </div>
                   <Progress
-                    value={instrument.percentage.percentage}
+                    value={percentage}
                     className={`h-1.5 bg-muted`}
                   />
                 </div>
@@ -11,6 +11,7 @@ vi.mock('@/lib/environment', () => ({
 // Mock API hooks
 vi.mock('@/api/instrumentService', () => ({
   useDeleteInstrumentMutation: () => [vi.fn(), { isLoading: false }],
+  useGetBackfillProgressQuery: () => ({ data: undefined }),
   useGetSubscribedInstrumentsQuery: () => ({
     data: {
       data: [
@@ -24,12 +24,13 @@ import {
 import { Filter, Search, RefreshCw, Radio } from 'lucide-react';
 import {
   useDeleteInstrumentMutation,
+  useGetBackfillProgressQuery,
   useGetSubscribedInstrumentsQuery,
 } from '@/api/instrumentService';
 import { useStartWebsocketMutation } from '@/api/breezeServices';
 import BreezeStatusCard from '@/components/BreezeStatusCard';
 import InstrumentCard from './components/InstrumentCard';
-import { Instrument } from '@/types/common-types';
+import { BackfillProgress, Instrument } from '@/types/common-types';
 
 const containerVariants = {
   hidden: { opacity: 0 },
@@ -103,21 +104,34 @@ const HomePage: React.FC = () => {
     }
   };
 
-  useEffect(() => {
-    const interval = setInterval(() => {
-      if (
-        data?.data?.some(
-          (instrument: Instrument) => !instrument.percentage?.is_loading
-        )
-      ) {
-        refetch();
-      } else {
-        clearInterval(interval);
-      }
-    }, 2000);
+  const loadingIds = useMemo(
+    () =>
+      (data?.data ?? [])
+        .filter((instrument: Instrument) => !instrument.percentage?.is_loading)
+        .map((instrument: Instrument) => instrument.id),
+    [data]
+  );
+
+  // Only the progress of loading instruments is polled, not the whole list
+  const { data: progress } = useGetBackfillProgressQuery(undefined, {
+    skip: loadingIds.length === 0,
+    pollingInterval: 2000,
+  });
 
-    return () => clearInterval(interval);
-  }, [data, refetch]);
+  const progressById = useMemo(() => {
+    const byId: Record<number, BackfillProgress> = {};
+    progress?.data?.forEach(entry => {
+      byId[entry.id] = entry;
+    });
+    return byId;
+  }, [progress]);
+
+  useEffect(() => {
+    // Instruments missing from the progress have finished loading
+    if (progress?.data && loadingIds.some(id => !(id in progressById))) {
+      refetch();
+    }
+  }, [progress, progressById, loadingIds, refetch]);
 
   return (
     <PageLayout
@@ -286,6 +300,7 @@ const HomePage: React.FC = () => {
                     >
                       <InstrumentCard
                         instrument={instrument}
+                        progress={progressById[instrument.id]}
                         onDelete={handleDelete}
                         isDeleting={deletingRowIds.includes(instrument.id)}
                       />
@@ -1,5 +1,6 @@
 import { baseApi } from './baseApi';
 import {
+  BackfillProgress,
   Candle,
   GetCandlesParams,
   GetInstrumentsParams,
@@ -30,6 +31,17 @@ export const instrumentApi = baseApi.injectEndpoints({
       },
       providesTags: ['Instrument'],
     }),
+    getBackfillProgress: builder.query<ApiResponse<BackfillProgress[]>, void>({
+      query: () => {
+        return {
+          url: 'core/subscribed_instruments/progress/',
+          method: 'GET',
+          headers: {
+            'Content-type': 'application/json',
+          },
+        };
+      },
+    }),
     getCandles: builder.query<Candle[], GetCandlesParams>({
       query: ({ id, tf }) => {
         return {
@@ -46,13 +58,14 @@ export const instrumentApi = baseApi.injectEndpoints({
       PaginatedCandles,
       GetPaginatedCandlesParams
     >({
-      query: ({ id, tf, limit, offset }) => {
+      query: ({ id, tf, limit, offset, before }) => {
         const params = new URLSearchParams();
         params.append('tf', String(tf));
         if (limit !== undefined && limit !== null)
           params.append('limit', String(limit));
         if (offset !== undefined && offset !== null)
           params.append('offset', String(offset));
+        if (before) params.append('before', before);
 
         return {
           url: `core/subscribed_instruments/${id}/candles/?${params.toString()}`,
@@ -135,6 +148,7 @@ export const instrumentApi = baseApi.injectEndpoints({
 
 export const {
   useGetSubscribedInstrumentsQuery,
+  useGetBackfillProgressQuery,
   useGetCandlesQuery,
   useLazyGetCandlesQuery,
   useGetInstrumentsQuery,
@@ -0,0 +1,89 @@
+import { useEffect, useRef, useState } from 'react';
+import { getToken } from '@/api/auth';
+import { getApiBaseUrl } from '@/lib/environment';
+import type { Candle } from '@/types/common-types';
+
+// Timeframes (minutes) the backend stores and pushes; others are polled
+export const STREAMED_TIMEFRAMES = [1, 5, 15, 30, 60, 1440];
+
+const RECONNECT_DELAY = 2000;
+
+// [epoch seconds, open, high, low, close, volume]
+type StreamedBar = [number, number, number, number, number, number | null];
+
+const getCandleSocketUrl = (instrumentId: number, timeframe: number) => {
+  const url = new URL(getApiBaseUrl());
+  url.protocol = url.protocol === 'https:' ? 'wss:' : 'ws:';
+  url.pathname = `/ws/candles/${instrumentId}/${timeframe}/`;
+  url.search = `token=${encodeURIComponent(getToken() ?? '')}`;
+  return url.toString();
+};
+
+/**
+ * Receives bar updates of an instrument over a websocket while `enabled`.
+ * Returns whether the stream is connected, so callers can fall back to
+ * polling for timeframes the server does not push.
+ */
+const useCandleStream = (
+  instrumentId: number | undefined,
+  timeframe: number,
+  enabled: boolean,
+  onBars: (candles: Candle[]) => void
+): boolean => {
+  const [isStreaming, setIsStreaming] = useState(false);
+  const onBarsRef = useRef(onBars);
+  onBarsRef.current = onBars;
+
+  useEffect(() => {
+    if (!enabled || !instrumentId || !STREAMED_TIMEFRAMES.includes(timeframe)) {
+      return;
+    }
+
+    let socket: WebSocket | null = null;
+    let reconnectId: number | null = null;
+    let closed = false;
+
+    const connect = () => {
+      let opened = false;
+      socket = new WebSocket(getCandleSocketUrl(instrumentId, timeframe));
+      socket.onopen = () => {
+        opened = true;
+        setIsStreaming(true);
+      };
+      socket.onmessage = event => {
+        const { bars } = JSON.parse(event.data) as { bars: StreamedBar[] };
+        onBarsRef.current(
+          bars.map(([time, open, high, low, close, volume]) => ({
+            date: new Date(time * 1000).toISOString(),
+            open,
+            high,
+            low,
+            close,
+            volume: volume ?? 0,
+          }))
+        );
+      };
+      socket.onclose = () => {
+        setIsStreaming(false);
+        // A rejected handshake will not succeed on retry; leave it to polling
+        if (!closed && opened) {
+          reconnectId = window.setTimeout(connect, RECONNECT_DELAY);
+        }
+      };
+    };
+
+    connect();
+    return () => {
+      closed = true;
+      if (reconnectId !== null) {
+        clearTimeout(reconnectId);
+      }
+      socket?.close();
+      setIsStreaming(false);
+    };
+  }, [instrumentId, timeframe, enabled]);
+
+  return isStreaming;
+};
+
+export default useCandleStream;
@@ -47,6 +47,16 @@ export interface PercentageInstrument {
   is_loading: boolean;
 }
 
+export interface BackfillProgress {
+  id: number;
+  chunks_total: number;
+  chunks_done: number;
+  chunks_failed: number;
+  rows: number;
+  percentage: number;
+  eta: number | null;
+}
+
 export interface Instrument {
   id: number;
   percentage: PercentageInstrument;
@@ -135,6 +145,7 @@ export interface GetPaginatedCandlesParams {
   tf: number;
   limit?: number;
   offset?: number;
+  before?: string;
 }
 
 // Mutation parameter types
@@ -161,9 +172,10 @@ export interface GoogleLoginParams {
 
 // Response types
 export interface PaginatedCandles {
-  count: number;
+  count: number | null;
   next: string | null;
   previous: string | null;
+  before?: string | null;
   results: Candle[];
 }
 